@@ -31,6 +31,17 @@ ROOT_HELPER_OPTS = [
                 default=True,
                 help=_('Use the root helper to read the namespaces from '
                        'the operating system.')),
+    cfg.StrOpt('root_helper_daemon',
+               help=_('Root helper daemon application to use when possible. '
+                      'Commands run as root are then sent to this long '
+                      'running process instead of spawning root_helper for '
+                      'each of them.')),
+]
+
+EXECUTE_OPTS = [
+    cfg.IntOpt('execute_concurrency', default=4,
+               help=_('Maximum number of commands from a batch of '
+                      'independent commands which are run concurrently.')),
 ]
 
 AGENT_STATE_OPTS = [
@@ -98,6 +109,10 @@ def register_root_helper(conf):
     conf.register_opts(ROOT_HELPER_OPTS, 'AGENT')
 
 
+def register_execute_opts(conf):
+    conf.register_opts(EXECUTE_OPTS, 'AGENT')
+
+
 def register_agent_state_opts_helper(conf):
     conf.register_opts(AGENT_STATE_OPTS, 'AGENT')
 
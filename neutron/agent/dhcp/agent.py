@@ -15,16 +15,20 @@
 
 import collections
 import os
+import sys
 
 import eventlet
+from eventlet import event
 
 from oslo_config import cfg
 import oslo_messaging
 from oslo_utils import importutils
+import six
 
 from neutron.agent.common import config
 from neutron.agent.linux import dhcp
 from neutron.agent.linux import external_process
+from neutron.agent.linux import utils as linux_utils
 from neutron.agent import rpc as agent_rpc
 from neutron.common import constants
 from neutron.common import exceptions
@@ -54,8 +58,12 @@ class DhcpAgent(manager.Manager):
     def __init__(self, host=None):
         super(DhcpAgent, self).__init__(host=host)
         self.needs_resync_reasons = collections.defaultdict(list)
+        # Ids of the ports with changes not yet applied, by network id
+        self._pending_port_reloads = {}
         self.conf = cfg.CONF
         self.cache = NetworkCache()
+        self._use_change_feed = True
+        self._network_work = NetworkWorkQueue(self.conf.num_event_threads)
         self.root_helper = config.get_root_helper(self.conf)
         self.dhcp_driver_cls = importutils.import_class(self.conf.dhcp_driver)
         ctx = context.get_admin_context_without_session()
@@ -133,6 +141,15 @@ class DhcpAgent(manager.Manager):
                 LOG.exception(_LE('Unable to %(action)s dhcp for %(net_id)s.'),
                               {'net_id': network.id, 'action': action})
 
+    def _run_for_network(self, network_id, func, *args):
+        """Run func(*args) serialized with other work on the same network.
+
+        Work on different networks runs concurrently, limited by
+        num_event_threads.  The result of func is returned and exceptions
+        it raises are re-raised.
+        """
+        return self._network_work.add(network_id, func, *args).wait()
+
     def schedule_resync(self, reason, network=None):
         """Schedule a resync for a given network and reason. If no network is
         specified, resync all networks.
@@ -150,11 +167,13 @@ class DhcpAgent(manager.Manager):
         known_network_ids = set(self.cache.get_network_ids())
 
         try:
-            active_networks = self.plugin_rpc.get_active_networks_info()
-            active_network_ids = set(network.id for network in active_networks)
+            active_networks, active_network_ids, changed_only = (
+                self._get_networks_to_sync(only_nets))
             for deleted_id in known_network_ids - active_network_ids:
                 try:
-                    self.disable_dhcp_helper(deleted_id)
+                    self._run_for_network(deleted_id,
+                                          self.disable_dhcp_helper,
+                                          deleted_id)
                 except Exception as e:
                     self.schedule_resync(e, deleted_id)
                     LOG.exception(_LE('Unable to sync network state on '
@@ -163,8 +182,10 @@ class DhcpAgent(manager.Manager):
             for network in active_networks:
                 if (not only_nets or  # specifically resync all
                         network.id not in known_network_ids or  # missing net
-                        network.id in only_nets):  # specific network to sync
-                    pool.spawn(self.safe_configure_dhcp_for_network, network)
+                        network.id in only_nets or  # specific network to sync
+                        changed_only):  # changed since the last sync
+                    pool.spawn(self._run_for_network, network.id,
+                               self.safe_configure_dhcp_for_network, network)
             pool.waitall()
             LOG.info(_LI('Synchronizing state complete'))
 
@@ -172,6 +193,37 @@ class DhcpAgent(manager.Manager):
             self.schedule_resync(e)
             LOG.exception(_LE('Unable to sync network state.'))
 
+    def _get_networks_to_sync(self, only_nets):
+        """Return the networks to sync and the ids of the active networks.
+
+        Only the networks which changed on the server since the revisions
+        held by the cache are fetched, plus the networks without a revision
+        and those in only_nets, which are always fetched again, and the
+        returned flag is True.  Servers which do not support the change
+        feed send all the active networks.
+        """
+        revisions = self.cache.get_revisions()
+        for network_id in only_nets:
+            revisions.pop(network_id, None)
+        if self._use_change_feed:
+            try:
+                networks, active_network_ids = (
+                    self.plugin_rpc.get_active_networks_changed(revisions))
+                LOG.debug('%(changed)d of %(active)d active networks changed '
+                          'since the last sync',
+                          {'changed': len(networks),
+                           'active': len(active_network_ids)})
+                return networks, active_network_ids, True
+            except oslo_messaging.UnsupportedVersion:
+                LOG.warning(_LW('get_active_networks_changed rpc call not '
+                                'supported by the server, falling back to '
+                                'get_active_networks_info which fetches all '
+                                'the networks on every resync.'))
+                self._use_change_feed = False
+        active_networks = self.plugin_rpc.get_active_networks_info()
+        return (active_networks,
+                set(network.id for network in active_networks), False)
+
     @utils.exception_logger()
     def _periodic_resync_helper(self):
         """Resync the dhcp state at the configured interval."""
@@ -277,63 +329,108 @@ class DhcpAgent(manager.Manager):
         else:
             self.disable_dhcp_helper(network.id)
 
-    @utils.synchronized('dhcp-agent')
+    def _reload_port_allocations(self, network, port_id):
+        """Reload the DHCP allocations of a network after a port changed.
+
+        With dhcp_incremental_updates, the changes of the ports of a network
+        which arrive within port_event_coalesce_interval are applied to the
+        driver together.
+        """
+        if not self.conf.dhcp_incremental_updates:
+            self.call_driver('reload_allocations', network)
+            return
+
+        pending = self._pending_port_reloads.get(network.id)
+        if pending is not None:
+            pending.add(port_id)
+            return
+
+        self._pending_port_reloads[network.id] = set([port_id])
+        interval = self.conf.port_event_coalesce_interval
+        if interval > 0:
+            eventlet.spawn_after(interval, self._flush_port_reloads,
+                                 network.id)
+        else:
+            self._apply_port_reloads(network.id)
+
+    def _flush_port_reloads(self, network_id):
+        self._network_work.add(network_id, self._apply_port_reloads,
+                               network_id)
+
+    def _apply_port_reloads(self, network_id):
+        port_ids = self._pending_port_reloads.pop(network_id, None)
+        network = self.cache.get_network_by_id(network_id)
+        if port_ids and network:
+            self.call_driver('reload_port_allocations', network,
+                             port_ids=port_ids)
+
     def network_create_end(self, context, payload):
         """Handle the network.create.end notification event."""
         network_id = payload['network']['id']
-        self.enable_dhcp_helper(network_id)
+        self._run_for_network(network_id, self.enable_dhcp_helper, network_id)
 
-    @utils.synchronized('dhcp-agent')
     def network_update_end(self, context, payload):
         """Handle the network.update.end notification event."""
         network_id = payload['network']['id']
         if payload['network']['admin_state_up']:
-            self.enable_dhcp_helper(network_id)
+            self._run_for_network(network_id, self.enable_dhcp_helper,
+                                  network_id)
         else:
-            self.disable_dhcp_helper(network_id)
+            self._run_for_network(network_id, self.disable_dhcp_helper,
+                                  network_id)
 
-    @utils.synchronized('dhcp-agent')
     def network_delete_end(self, context, payload):
         """Handle the network.delete.end notification event."""
-        self.disable_dhcp_helper(payload['network_id'])
+        network_id = payload['network_id']
+        self._run_for_network(network_id, self.disable_dhcp_helper,
+                              network_id)
 
-    @utils.synchronized('dhcp-agent')
     def subnet_update_end(self, context, payload):
         """Handle the subnet.update.end notification event."""
         network_id = payload['subnet']['network_id']
-        self.refresh_dhcp_helper(network_id)
+        self._run_for_network(network_id, self.refresh_dhcp_helper,
+                              network_id)
 
     # Use the update handler for the subnet create event.
     subnet_create_end = subnet_update_end
 
-    @utils.synchronized('dhcp-agent')
     def subnet_delete_end(self, context, payload):
         """Handle the subnet.delete.end notification event."""
         subnet_id = payload['subnet_id']
         network = self.cache.get_network_by_subnet_id(subnet_id)
         if network:
-            self.refresh_dhcp_helper(network.id)
+            self._run_for_network(network.id, self.refresh_dhcp_helper,
+                                  network.id)
 
-    @utils.synchronized('dhcp-agent')
     def port_update_end(self, context, payload):
         """Handle the port.update.end notification event."""
         updated_port = dhcp.DictModel(payload['port'])
-        network = self.cache.get_network_by_id(updated_port.network_id)
-        if network:
-            self.cache.put_port(updated_port)
-            self.call_driver('reload_allocations', network)
+        self._run_for_network(updated_port.network_id,
+                              self._port_update, updated_port)
 
     # Use the update handler for the port create event.
     port_create_end = port_update_end
 
-    @utils.synchronized('dhcp-agent')
+    def _port_update(self, updated_port):
+        network = self.cache.get_network_by_id(updated_port.network_id)
+        if network:
+            self.cache.put_port(updated_port)
+            self._reload_port_allocations(network, updated_port.id)
+
     def port_delete_end(self, context, payload):
         """Handle the port.delete.end notification event."""
         port = self.cache.get_port_by_id(payload['port_id'])
+        if port:
+            self._run_for_network(port.network_id, self._port_delete,
+                                  payload['port_id'])
+
+    def _port_delete(self, port_id):
+        # The port may have gone while waiting for the network
+        port = self.cache.get_port_by_id(port_id)
         if port:
             network = self.cache.get_network_by_id(port.network_id)
             self.cache.remove_port(port)
-            self.call_driver('reload_allocations', network)
+            self._reload_port_allocations(network, port.id)
 
     def enable_isolated_metadata_proxy(self, network):
 
@@ -393,6 +490,7 @@ class DhcpPluginApi(object):
         1.0 - Initial version.
         1.1 - Added get_active_networks_info, create_dhcp_port,
               and update_dhcp_port methods.
+        1.2 - Added get_active_networks_changed method.
 
     """
 
@@ -413,6 +511,20 @@ class DhcpPluginApi(object):
                               host=self.host)
         return [dhcp.NetModel(self.use_namespaces, n) for n in networks]
 
+    def get_active_networks_changed(self, revisions):
+        """Make a remote process call to retrieve the changed networks.
+
+        revisions maps network ids to the revision last received for them.
+        Returns the networks whose revision changed and the set of the ids
+        of all the active networks.
+        """
+        cctxt = self.client.prepare(version='1.2')
+        result = cctxt.call(self.context, 'get_active_networks_changed',
+                            revisions=revisions, host=self.host)
+        return ([dhcp.NetModel(self.use_namespaces, n)
+                 for n in result['networks']],
+                set(result['active_network_ids']))
+
     def get_network_info(self, network_id):
         """Make a remote process call to retrieve network info."""
         cctxt = self.client.prepare()
@@ -461,12 +573,55 @@ class DhcpPluginApi(object):
                           device_id=device_id, host=self.host)
 
 
+class NetworkWorkQueue(object):
+    """Runs work items of different networks concurrently.
+
+    The items queued for one network run one at a time, in the order they
+    were queued.  At most pool_size items run at the same time.
+    """
+
+    def __init__(self, pool_size):
+        self._pool = eventlet.GreenPool(pool_size)
+        self._queues = {}
+
+    def add(self, network_id, func, *args):
+        """Queue func(*args) and return an event sent with its outcome."""
+        done = event.Event()
+        work = (func, args, done)
+        queue = self._queues.get(network_id)
+        if queue is not None:
+            # A worker is already processing the items of this network
+            queue.append(work)
+        else:
+            self._queues[network_id] = collections.deque([work])
+            self._pool.spawn_n(self._process, network_id)
+        return done
+
+    def _process(self, network_id):
+        queue = self._queues[network_id]
+        while queue:
+            func, args, done = queue.popleft()
+            try:
+                result = func(*args)
+            except Exception:
+                done.send_exception(*sys.exc_info())
+            else:
+                done.send(result)
+        del self._queues[network_id]
+
+
 class NetworkCache(object):
-    """Agent cache of the current network state."""
+    """Agent cache of the current network state.
+
+    Besides the network models, the cache keeps the position of every port
+    in the ports list of its network, so ports can be found, replaced and
+    removed without scanning the list.
+    """
     def __init__(self):
         self.cache = {}
         self.subnet_lookup = {}
         self.port_lookup = {}
+        self.port_index = {}
 
     def get_network_ids(self):
         return self.cache.keys()
@@ -489,8 +644,9 @@ class NetworkCache(object):
         for subnet in network.subnets:
             self.subnet_lookup[subnet.id] = network.id
 
-        for port in network.ports:
+        for index, port in enumerate(network.ports):
             self.port_lookup[port.id] = network.id
+            self.port_index[port.id] = index
 
     def remove(self, network):
         del self.cache[network.id]
@@ -500,46 +656,52 @@ class NetworkCache(object):
 
         for port in network.ports:
             del self.port_lookup[port.id]
+            self.port_index.pop(port.id, None)
+
+    def get_revisions(self):
+        """Return the server revision of the cached networks by id.
+
+        Networks which have been changed locally since they were received
+        have no revision, so the server sends them again on resync.
+        """
+        return dict((network_id, network['revision'])
+                    for network_id, network in six.iteritems(self.cache)
+                    if network.get('revision'))
 
     def put_port(self, port):
         network = self.get_network_by_id(port.network_id)
-        for index in range(len(network.ports)):
-            if network.ports[index].id == port.id:
-                network.ports[index] = port
-                break
+        network.pop('revision', None)
+        if self.port_lookup.get(port.id) == network.id:
+            network.ports[self.port_index[port.id]] = port
         else:
             network.ports.append(port)
-
-        self.port_lookup[port.id] = network.id
+            self.port_lookup[port.id] = network.id
+            self.port_index[port.id] = len(network.ports) - 1
 
     def remove_port(self, port):
         network = self.get_network_by_port_id(port.id)
+        if not network:
+            return
 
-        for index in range(len(network.ports)):
-            if network.ports[index] == port:
-                del network.ports[index]
-                del self.port_lookup[port.id]
-                break
+        network.pop('revision', None)
+        # Move the last port into the slot of the removed one instead of
+        # shifting every port behind it.
+        index = self.port_index.pop(port.id)
+        last_port = network.ports.pop()
+        if index < len(network.ports):
+            network.ports[index] = last_port
+            self.port_index[last_port.id] = index
+        del self.port_lookup[port.id]
 
     def get_port_by_id(self, port_id):
         network = self.get_network_by_port_id(port_id)
         if network:
-            for port in network.ports:
-                if port.id == port_id:
-                    return port
+            return network.ports[self.port_index[port_id]]
 
     def get_state(self):
-        net_ids = self.get_network_ids()
-        num_nets = len(net_ids)
-        num_subnets = 0
-        num_ports = 0
-        for net_id in net_ids:
-            network = self.get_network_by_id(net_id)
-            num_subnets += len(network.subnets)
-            num_ports += len(network.ports)
-        return {'networks': num_nets,
-                'subnets': num_subnets,
-                'ports': num_ports}
+        return {'networks': len(self.cache),
+                'subnets': len(self.subnet_lookup),
+                'ports': len(self.port_lookup)}
 
 
 class DhcpAgentWithStateReport(DhcpAgent):
@@ -565,8 +727,9 @@ class DhcpAgentWithStateReport(DhcpAgent):
 
     def _report_state(self):
         try:
-            self.agent_state.get('configurations').update(
-                self.cache.get_state())
+            configurations = self.agent_state.get('configurations')
+            configurations.update(self.cache.get_state())
+            configurations['command_stats'] = linux_utils.get_command_stats()
             ctx = context.get_admin_context_without_session()
             self.state_rpc.report_state(ctx, self.agent_state, self.use_call)
             self.use_call = False
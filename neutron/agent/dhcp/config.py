@@ -30,10 +30,24 @@ DHCP_AGENT_OPTS = [
                        "enable_isolated_metadata = True")),
     cfg.IntOpt('num_sync_threads', default=4,
                help=_('Number of threads to use during sync process.')),
+    cfg.IntOpt('num_event_threads', default=8,
+               help=_('Number of threads handling events of different '
+                      'networks concurrently. Events of the same network '
+                      'are always handled one at a time, in order.')),
     cfg.StrOpt('metadata_proxy_socket',
                default='$state_path/metadata_proxy',
                help=_('Location of Metadata Proxy UNIX domain '
                       'socket')),
+    cfg.BoolOpt('dhcp_incremental_updates', default=False,
+                help=_("Apply port create, update and delete events to the "
+                       "DHCP server configuration of the affected ports "
+                       "only, instead of regenerating it for the whole "
+                       "network.")),
+    cfg.FloatOpt('port_event_coalesce_interval', default=0.5,
+                 help=_("Number of seconds to collect port events of a "
+                        "network before applying them together, when "
+                        "dhcp_incremental_updates is enabled. 0 applies "
+                        "every event immediately.")),
 ]
 
 DHCP_OPTS = [
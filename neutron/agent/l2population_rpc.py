@@ -156,6 +156,43 @@ class L2populationRpcCallBackTunnelMixin(L2populationRpcCallBackMixin):
         '''
         pass
 
+    def add_fdb_flood_flows(self, br, lvm, remote_ofports):
+        '''Add flooding entries for fdb
+
+        This method is used by method fdb_add_tun with all the flooding
+        entries added to a network, so that the flooding flow of the network
+        can be computed once. By default, add_fdb_flow is called for each
+        flooding entry.
+
+        :param br: represent the bridge on which add_fdb_flood_flows should
+        be applied.
+        :param lvm: a local VLAN map of network.
+        :param remote_ofports: a dict mapping the remote ip addresses of the
+            added flooding entries to their ports.
+        '''
+        for remote_ip, ofport in remote_ofports.items():
+            self.add_fdb_flow(br, n_const.FLOODING_ENTRY, remote_ip, lvm,
+                              ofport)
+
+    def del_fdb_flood_flows(self, br, lvm, remote_ofports):
+        '''Delete flooding entries for fdb
+
+        This method is used by method fdb_remove_tun with all the flooding
+        entries removed from a network, so that the flooding flow of the
+        network can be computed once. By default, del_fdb_flow is called for
+        each flooding entry.
+
+        :param br: represent the bridge on which del_fdb_flood_flows should
+        be applied.
+        :param lvm: local VLAN map of a network. See add_fdb_flow for
+            more explanation.
+        :param remote_ofports: a dict mapping the remote ip addresses of the
+            removed flooding entries to their ports.
+        '''
+        for remote_ip, ofport in remote_ofports.items():
+            self.del_fdb_flow(br, n_const.FLOODING_ENTRY, remote_ip, lvm,
+                              ofport)
+
     @abc.abstractmethod
     def setup_tunnel_port(self, br, remote_ip, network_type):
         '''Setup an added tunnel port.
@@ -226,6 +263,7 @@ class L2populationRpcCallBackTunnelMixin(L2populationRpcCallBackMixin):
 
     @log.log
     def fdb_add_tun(self, context, br, lvm, agent_ports, ofports):
+        flood_ofports = {}
         for remote_ip, ports in agent_ports.items():
             # Ensure we have a tunnel port with this remote agent
             ofport = ofports[lvm.network_type].get(remote_ip)
@@ -235,19 +273,30 @@ class L2populationRpcCallBackTunnelMixin(L2populationRpcCallBackMixin):
                 if ofport == 0:
                     continue
             for port in ports:
-                self.add_fdb_flow(br, port, remote_ip, lvm, ofport)
+                if port == n_const.FLOODING_ENTRY:
+                    flood_ofports[remote_ip] = ofport
+                else:
+                    self.add_fdb_flow(br, port, remote_ip, lvm, ofport)
+        if flood_ofports:
+            self.add_fdb_flood_flows(br, lvm, flood_ofports)
 
     @log.log
     def fdb_remove_tun(self, context, br, lvm, agent_ports, ofports):
+        flood_ofports = {}
         for remote_ip, ports in agent_ports.items():
             ofport = ofports[lvm.network_type].get(remote_ip)
             if not ofport:
                 continue
             for port in ports:
-                self.del_fdb_flow(br, port, remote_ip, lvm, ofport)
                 if port == n_const.FLOODING_ENTRY:
-                    # Check if this tunnel port is still used
-                    self.cleanup_tunnel_port(br, ofport, lvm.network_type)
+                    flood_ofports[remote_ip] = ofport
+                else:
+                    self.del_fdb_flow(br, port, remote_ip, lvm, ofport)
+        if flood_ofports:
+            self.del_fdb_flood_flows(br, lvm, flood_ofports)
+            for ofport in flood_ofports.values():
+                # Check if this tunnel port is still used
+                self.cleanup_tunnel_port(br, ofport, lvm.network_type)
 
     @log.log
     def fdb_update(self, context, fdb_entries):
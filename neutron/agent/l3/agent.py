@@ -13,6 +13,8 @@
 #    under the License.
 #
 
+import time
+
 import eventlet
 import netaddr
 from oslo_config import cfg
@@ -33,6 +35,7 @@ from neutron.agent.l3 import router_processing_queue as queue
 from neutron.agent.linux import external_process
 from neutron.agent.linux import ip_lib
 from neutron.agent.linux import ra
+from neutron.agent.linux import utils as linux_utils
 from neutron.agent.metadata import driver as metadata_driver
 from neutron.agent import rpc as agent_rpc
 from neutron.common import constants as l3_constants
@@ -57,6 +60,8 @@ except Exception:
 
 LOG = logging.getLogger(__name__)
 NS_PREFIX = 'qrouter-'
+# Number of destroyed stale namespaces between two progress messages
+NS_CLEANUP_PROGRESS_INTERVAL = 100
 INTERNAL_DEV_PREFIX = 'qr-'
 EXTERNAL_DEV_PREFIX = 'qg-'
 
@@ -202,7 +207,9 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback,
 
         self._clean_stale_namespaces = self.conf.use_namespaces
 
-        self._queue = queue.RouterProcessingQueue()
+        self._queue = queue.RouterProcessingQueue(
+            low_priority_workers=self._get_low_priority_workers(
+                self.conf.router_processing_workers))
         self.event_observers = event_observers.L3EventObservers()
         super(L3NATAgent, self).__init__(conf=self.conf)
 
@@ -229,6 +236,16 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback,
             LOG.error(msg)
             raise SystemExit(1)
 
+        if self.conf.router_processing_workers < 1:
+            msg = _LE('router_processing_workers must be at least 1.')
+            LOG.error(msg)
+            raise SystemExit(1)
+
+        if self.conf.namespace_cleanup_workers < 1:
+            msg = _LE('namespace_cleanup_workers must be at least 1.')
+            LOG.error(msg)
+            raise SystemExit(1)
+
     def _list_namespaces(self):
         """Get a set of all router namespaces on host
 
@@ -264,14 +281,37 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback,
         ns_to_ignore = self._get_routers_namespaces(router_ids)
 
         ns_to_destroy = router_namespaces - ns_to_ignore
-        for ns in ns_to_destroy:
-            try:
-                self._destroy_namespace(ns)
-            except RuntimeError:
-                LOG.exception(_LE('Failed to destroy stale router namespace '
-                                  '%s'), ns)
+        if ns_to_destroy:
+            LOG.info(_LI('Destroying %d stale router namespaces'),
+                     len(ns_to_destroy))
+            start = time.time()
+            failed = 0
+            pool = eventlet.GreenPool(
+                size=self.conf.namespace_cleanup_workers)
+            results = pool.imap(self._destroy_stale_namespace, ns_to_destroy)
+            for count, destroyed in enumerate(results, 1):
+                if not destroyed:
+                    failed += 1
+                if count % NS_CLEANUP_PROGRESS_INTERVAL == 0:
+                    LOG.info(_LI('Destroyed %(count)d of %(total)d stale '
+                                 'router namespaces'),
+                             {'count': count, 'total': len(ns_to_destroy)})
+            LOG.info(_LI('Destroyed %(count)d stale router namespaces in '
+                         '%(elapsed).3f seconds, %(failed)d failed'),
+                     {'count': len(ns_to_destroy) - failed,
+                      'elapsed': time.time() - start,
+                      'failed': failed})
         self._clean_stale_namespaces = False
 
+    def _destroy_stale_namespace(self, ns):
+        try:
+            self._destroy_namespace(ns)
+            return True
+        except RuntimeError:
+            LOG.exception(_LE('Failed to destroy stale router namespace '
+                              '%s'), ns)
+            return False
+
     def _destroy_namespace(self, ns):
         if ns.startswith(NS_PREFIX):
             self._destroy_router_namespace(ns)
@@ -1138,10 +1178,33 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback,
             LOG.debug("Finished a router update for %s", update.id)
             rp.fetched_and_processed(update.timestamp)
 
+    def _get_low_priority_workers(self, pool_size):
+        reserved = self.conf.rpc_reserved_router_workers
+        return max(pool_size - reserved, 1)
+
+    def _tune_router_workers(self, pool):
+        """Sizes the pool of router workers according to the backlog
+
+        The pool grows from router_processing_workers up to
+        router_processing_max_workers while updates are waiting and shrinks
+        back once the backlog is gone.
+        """
+        min_size = self.conf.router_processing_workers
+        max_size = max(min_size, self.conf.router_processing_max_workers)
+        size = min(max(self._queue.depth(), min_size), max_size)
+        if size != pool.size:
+            LOG.debug("Resizing router processing pool from %(old)d to "
+                      "%(new)d workers",
+                      {'old': pool.size, 'new': size})
+            pool.resize(size)
+            self._queue.set_low_priority_workers(
+                self._get_low_priority_workers(size))
+
     def _process_routers_loop(self):
         LOG.debug("Starting _process_routers_loop")
-        pool = eventlet.GreenPool(size=8)
+        pool = eventlet.GreenPool(size=self.conf.router_processing_workers)
         while True:
+            self._tune_router_workers(pool)
             pool.spawn_n(self._process_router_update)
 
     @periodic_task.periodic_task
@@ -1258,6 +1321,8 @@ class L3NATAgentWithStateReport(L3NATAgent):
         configurations['ex_gw_ports'] = num_ex_gw_ports
         configurations['interfaces'] = num_interfaces
         configurations['floating_ips'] = num_floating_ips
+        configurations['router_processing'] = self._queue.get_stats()
+        configurations['command_stats'] = linux_utils.get_command_stats()
         try:
             self.state_rpc.report_state(self.context, self.agent_state,
                                         self.use_call)
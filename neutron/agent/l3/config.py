@@ -59,5 +59,20 @@ OPTS = [
     cfg.StrOpt('metadata_access_mark',
                default='0x1',
                help=_('Iptables mangle mark used to mark metadata valid '
-                      'requests'))
+                      'requests')),
+    cfg.IntOpt('router_processing_workers', default=8,
+               help=_("Minimum number of green threads processing router "
+                      "updates concurrently.")),
+    cfg.IntOpt('router_processing_max_workers', default=16,
+               help=_("Maximum number of green threads processing router "
+                      "updates concurrently. The pool grows towards this "
+                      "size while updates are waiting in the queue.")),
+    cfg.IntOpt('rpc_reserved_router_workers', default=2,
+               help=_("Number of router processing green threads that are "
+                      "never used for updates from the periodic router "
+                      "sync, so that RPC notifications are handled without "
+                      "waiting for a full resync to finish.")),
+    cfg.IntOpt('namespace_cleanup_workers', default=8,
+               help=_("Number of green threads destroying stale router "
+                      "namespaces concurrently when the agent starts.")),
 ]
@@ -14,7 +14,9 @@
 #
 
 import datetime
-import Queue
+import heapq
+import threading
+import time
 
 from oslo_utils import timeutils
 
@@ -23,6 +25,9 @@ PRIORITY_RPC = 0
 PRIORITY_SYNC_ROUTERS_TASK = 1
 DELETE_ROUTER = 1
 
+PRIORITY_NAMES = {PRIORITY_RPC: 'rpc',
+                  PRIORITY_SYNC_ROUTERS_TASK: 'sync_routers_task'}
+
 
 class RouterUpdate(object):
     """Encapsulates a router update
@@ -39,6 +44,8 @@ class RouterUpdate(object):
         self.id = router_id
         self.action = action
         self.router = router
+        # Monotonic time at which the update entered the processing queue
+        self.enqueued_at = None
 
     def __lt__(self, other):
         """Implements priority among updates
@@ -135,13 +142,114 @@ class ExclusiveRouterProcessor(object):
                     yield update
 
 
-class RouterProcessingQueue(object):
-    """Manager of the queue of routers to process."""
+class _PriorityStats(object):
+    """Latency and throughput counters for one update priority."""
     def __init__(self):
-        self._queue = Queue.PriorityQueue()
+        self.processed = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.processing_time = 0.0
+        self.max_processing_time = 0.0
+
+    def record_wait(self, seconds):
+        self.wait_time += seconds
+        self.max_wait_time = max(self.max_wait_time, seconds)
+
+    def record_processing(self, seconds):
+        self.processed += 1
+        self.processing_time += seconds
+        self.max_processing_time = max(self.max_processing_time, seconds)
+
+    def to_dict(self):
+        processed = self.processed or 1
+        return {'processed': self.processed,
+                'avg_wait_time': round(self.wait_time / processed, 3),
+                'max_wait_time': round(self.max_wait_time, 3),
+                'avg_processing_time': round(
+                    self.processing_time / processed, 3),
+                'max_processing_time': round(self.max_processing_time, 3)}
+
+
+class RouterProcessingQueue(object):
+    """Manager of the queue of routers to process.
+
+    Updates are always handed out in priority order.  In addition, the
+    number of workers concurrently processing updates with a priority lower
+    than PRIORITY_RPC can be limited.  This way a flood of updates from
+    periodic_sync_routers_task cannot occupy every worker and RPC
+    notifications are picked up as soon as they arrive.
+    """
+    def __init__(self, low_priority_workers=None):
+        self._queue = []
+        self._cond = threading.Condition()
+        self._low_priority_workers = low_priority_workers
+        self._low_priority_active = 0
+        self._depth = {}
+        self._stats = {}
+
+    def set_low_priority_workers(self, workers):
+        """Limits the workers concurrently busy with low priority updates
+
+        None means no limit.
+        """
+        with self._cond:
+            self._low_priority_workers = workers
+            self._cond.notify_all()
 
     def add(self, update):
-        self._queue.put(update)
+        update.enqueued_at = time.time()
+        with self._cond:
+            heapq.heappush(self._queue, update)
+            self._depth[update.priority] = (
+                self._depth.get(update.priority, 0) + 1)
+            self._cond.notify_all()
+
+    def depth(self):
+        return len(self._queue)
+
+    def _can_start(self, update):
+        return (update.priority <= PRIORITY_RPC or
+                self._low_priority_workers is None or
+                self._low_priority_active < self._low_priority_workers)
+
+    def _get(self):
+        with self._cond:
+            # The head of the heap is the most urgent update.  If it may not
+            # be started then there are no RPC updates queued either, so
+            # wait for a new update or for a low priority worker to finish.
+            while not self._queue or not self._can_start(self._queue[0]):
+                self._cond.wait()
+            update = heapq.heappop(self._queue)
+            self._depth[update.priority] -= 1
+            if update.priority > PRIORITY_RPC:
+                self._low_priority_active += 1
+            self._get_stats(update.priority).record_wait(
+                time.time() - update.enqueued_at)
+            return update
+
+    def _done(self, update, started_at):
+        with self._cond:
+            if update.priority > PRIORITY_RPC:
+                self._low_priority_active -= 1
+                self._cond.notify_all()
+            self._get_stats(update.priority).record_processing(
+                time.time() - started_at)
+
+    def _get_stats(self, priority):
+        return self._stats.setdefault(priority, _PriorityStats())
+
+    def get_stats(self):
+        """Returns queue depth and latency metrics keyed by priority name"""
+        with self._cond:
+            priorities = set(self._depth) | set(self._stats)
+            return {
+                'queue_depth': len(self._queue),
+                'low_priority_workers_busy': self._low_priority_active,
+                'priorities': dict(
+                    (PRIORITY_NAMES.get(p, str(p)),
+                     dict(self._get_stats(p).to_dict(),
+                          queue_depth=self._depth.get(p, 0)))
+                    for p in priorities)}
 
     def each_update_to_next_router(self):
         """Grabs the next router from the queue and processes
@@ -149,14 +257,18 @@ class RouterProcessingQueue(object):
         This method uses a for loop to process the router repeatedly until
         updates stop bubbling to the front of the queue.
         """
-        next_update = self._queue.get()
-
-        with ExclusiveRouterProcessor(next_update.id) as rp:
-            # Queue the update whether this worker is the master or not.
-            rp.queue_update(next_update)
-
-            # Here, if the current worker is not the master, the call to
-            # rp.updates() will not yield and so this will essentially be a
-            # noop.
-            for update in rp.updates():
-                yield (rp, update)
+        next_update = self._get()
+        started_at = time.time()
+
+        try:
+            with ExclusiveRouterProcessor(next_update.id) as rp:
+                # Queue the update whether this worker is the master or not.
+                rp.queue_update(next_update)
+
+                # Here, if the current worker is not the master, the call to
+                # rp.updates() will not yield and so this will essentially be
+                # a noop.
+                for update in rp.updates():
+                    yield (rp, update)
+        finally:
+            self._done(next_update, started_at)
@@ -51,41 +51,36 @@ WIN2k3_STATIC_DNS = 249
 NS_PREFIX = 'qdhcp-'
 DNSMASQ_SERVICE_NAME = 'dnsmasq'
 
+# The dnsmasq config lines and leases generated for a single port
+PortEntries = collections.namedtuple(
+    'PortEntries', ['device_owner', 'hosts', 'addn_hosts', 'opts', 'leases'])
 
-class DictModel(dict):
-    """Convert dict into an object that provides attribute access to values."""
 
-    def __init__(self, *args, **kwargs):
-        """Convert dict values to DictModel values."""
-        super(DictModel, self).__init__(*args, **kwargs)
+class DictModel(dict):
+    """Convert dict into an object that provides attribute access to values.
 
-        def needs_upgrade(item):
-            """Check if `item` is a dict and needs to be changed to DictModel.
-            """
-            return isinstance(item, dict) and not isinstance(item, DictModel)
+    Nested dicts, and the dicts in lists and tuples, are converted to
+    DictModel instances the first time they are accessed as attributes, so
+    a payload is converted only as deep as it is read.  The converted values
+    replace the original ones in the model, the payload is left unchanged.
+    """
 
-        def upgrade(item):
-            """Upgrade item if it needs to be upgraded."""
-            if needs_upgrade(item):
-                return DictModel(item)
-            else:
-                return item
-
-        for key, value in self.iteritems():
-            if isinstance(value, (list, tuple)):
-                # Keep the same type but convert dicts to DictModels
-                self[key] = type(value)(
-                    (upgrade(item) for item in value)
-                )
-            elif needs_upgrade(value):
-                # Change dict instance values to DictModel instance values
-                self[key] = DictModel(value)
+    __slots__ = ()
 
     def __getattr__(self, name):
         try:
-            return self[name]
+            value = self[name]
         except KeyError as e:
             raise AttributeError(e)
+        if isinstance(value, (DictModel, ModelList)):
+            return value
+        if isinstance(value, dict):
+            value = self[name] = DictModel(value)
+        elif isinstance(value, list):
+            value = self[name] = ModelList(_upgrade(item) for item in value)
+        elif isinstance(value, tuple):
+            value = self[name] = tuple(_upgrade(item) for item in value)
+        return value
 
     def __setattr__(self, name, value):
         self[name] = value
@@ -94,8 +89,26 @@ class DictModel(dict):
         del self[name]
 
 
+class ModelList(list):
+    """A list whose dict items were converted to DictModel instances.
+
+    Items added to the list are expected to be DictModel instances already.
+    """
+
+    __slots__ = ()
+
+
+def _upgrade(item):
+    """Return item as a DictModel if it is a plain dict."""
+    if isinstance(item, dict) and not isinstance(item, DictModel):
+        return DictModel(item)
+    return item
+
+
 class NetModel(DictModel):
 
+    __slots__ = ()
+
     def __init__(self, use_namespaces, d):
         super(NetModel, self).__init__(d)
 
@@ -107,6 +120,35 @@ class NetModel(DictModel):
         return self._ns_name
 
 
+class HostTable(object):
+    """The dnsmasq config entries of a network indexed by port id.
+
+    Keeping the rendered entries of every port allows a change to a single
+    port to be applied without generating the config files from scratch.
+    """
+
+    def __init__(self, opts_head, opts_tail):
+        self.ports = collections.OrderedDict()
+        # Options which do not belong to a single port: the options of every
+        # subnet come before the port options, the dns-server options built
+        # from the DHCP ports come after them.
+        self.opts_head = opts_head
+        self.opts_tail = opts_tail
+
+    def hosts_data(self):
+        return ''.join(line for entries in six.itervalues(self.ports)
+                       for line in entries.hosts)
+
+    def addn_hosts_data(self):
+        return ''.join(line for entries in six.itervalues(self.ports)
+                       for line in entries.addn_hosts)
+
+    def opts_data(self):
+        port_opts = [opt for entries in six.itervalues(self.ports)
+                     for opt in entries.opts]
+        return '\n'.join(self.opts_head + port_opts + self.opts_tail)
+
+
 @six.add_metaclass(abc.ABCMeta)
 class DhcpBase(object):
 
@@ -141,6 +183,13 @@ class DhcpBase(object):
     def reload_allocations(self):
         """Force the DHCP server to reload the assignment database."""
 
+    def reload_port_allocations(self, port_ids):
+        """Reload the assignment database after the given ports changed.
+
+        Drivers which cannot update single ports reload everything.
+        """
+        self.reload_allocations()
+
     @classmethod
     def existing_dhcp_networks(cls, conf, root_helper):
         """Return a list of existing networks ids that we have configs for."""
@@ -283,6 +332,10 @@ class Dnsmasq(DhcpLocalProcess):
 
     _TAG_PREFIX = 'tag%d'
 
+    # Host tables of the networks updated through reload_port_allocations,
+    # indexed by network id.
+    _host_tables = {}
+
     @classmethod
     def check_version(cls):
         pass
@@ -299,6 +352,10 @@ class Dnsmasq(DhcpLocalProcess):
         except OSError:
             return []
 
+    def disable(self, retain_port=False):
+        self._host_tables.pop(self.network.id, None)
+        super(Dnsmasq, self).disable(retain_port)
+
     def _build_cmdline_callback(self, pid_file):
         cmd = [
             'dnsmasq',
@@ -385,7 +442,9 @@ class Dnsmasq(DhcpLocalProcess):
         """
 
         self._output_config_files()
+        self._enable_process(reload_with_HUP)
 
+    def _enable_process(self, reload_with_HUP):
         pid_filename = self.get_conf_file_name('pid')
 
         self.process_monitor.enable(
@@ -404,6 +463,9 @@ class Dnsmasq(DhcpLocalProcess):
         ip_wrapper.netns.execute(cmd)
 
     def _output_config_files(self):
+        # The files are generated from scratch, so the host table of the
+        # network (if any) is outdated from now on.
+        self._host_tables.pop(self.network.id, None)
         self._output_hosts_file()
         self._output_addn_hosts_file()
         self._output_opts_file()
@@ -423,6 +485,124 @@ class Dnsmasq(DhcpLocalProcess):
         LOG.debug('Reloading allocations for network: %s', self.network.id)
         self.device_manager.update(self.network, self.interface_name)
 
+    def reload_port_allocations(self, port_ids):
+        """Apply changes of the given ports to the dnsmasq config.
+
+        Only the entries of these ports are regenerated, only the files they
+        appear in are rewritten and dnsmasq is only signalled if something
+        actually changed.  Router and DHCP ports influence the options of
+        whole subnets, so changes to them rebuild the complete config.
+        """
+        table = self._host_tables.get(self.network.id)
+        if table is None or not self._enable_dhcp():
+            self._rebuild_host_table()
+            return
+
+        ports = dict((port.id, port) for port in self.network.ports
+                     if port.id in port_ids)
+        subnet_owners = (constants.ROUTER_INTERFACE_OWNERS +
+                         (constants.DEVICE_OWNER_DHCP,))
+        for port_id in port_ids:
+            old = table.ports.get(port_id)
+            new = ports.get(port_id)
+            if (old and old.device_owner in subnet_owners or
+                    new and new.device_owner in subnet_owners):
+                self._rebuild_host_table()
+                return
+
+        v6_nets = self._get_v6_nets()
+        dhcp_enabled_subnet_ids = self._get_dhcp_enabled_subnet_ids()
+        changed = set()
+        for port_id in port_ids:
+            old = table.ports.get(port_id)
+            new = None
+            if port_id in ports:
+                new = self._build_port_entries(
+                    ports[port_id], v6_nets, dhcp_enabled_subnet_ids)
+            if old == new:
+                continue
+            for field in ('hosts', 'addn_hosts', 'opts'):
+                if getattr(old, field, []) != getattr(new, field, []):
+                    changed.add(field)
+            for ip, mac in (old.leases if old else set()) - (
+                    new.leases if new else set()):
+                self._release_lease(mac, ip)
+            if new:
+                table.ports[port_id] = new
+            else:
+                del table.ports[port_id]
+
+        if not changed:
+            LOG.debug('No dnsmasq config changes for ports %(ports)s on '
+                      'network %(net)s',
+                      {'ports': port_ids, 'net': self.network.id})
+            return
+
+        self._output_host_table(table, changed)
+        self._enable_process(reload_with_HUP=True)
+        LOG.debug('Reloaded allocations of %(num)d ports for network: '
+                  '%(net)s', {'num': len(port_ids), 'net': self.network.id})
+
+    def _rebuild_host_table(self):
+        """Reload all allocations and index the result by port."""
+        if not self._enable_dhcp():
+            self.reload_allocations()
+            return
+
+        self._release_unused_leases()
+        table = self._build_host_table()
+        self._output_host_table(table, ('hosts', 'addn_hosts', 'opts'))
+        self._host_tables[self.network.id] = table
+        self._enable_process(reload_with_HUP=True)
+        LOG.debug('Reloading allocations for network: %s', self.network.id)
+        self.device_manager.update(self.network, self.interface_name)
+
+    def _build_host_table(self):
+        options, subnet_index_map = self._generate_opts_per_subnet()
+        table = HostTable(options,
+                          self._generate_opts_per_dhcp_port(subnet_index_map))
+        v6_nets = self._get_v6_nets()
+        dhcp_enabled_subnet_ids = self._get_dhcp_enabled_subnet_ids()
+        for port in self.network.ports:
+            table.ports[port.id] = self._build_port_entries(
+                port, v6_nets, dhcp_enabled_subnet_ids)
+        return table
+
+    def _build_port_entries(self, port, v6_nets, dhcp_enabled_subnet_ids):
+        hosts = []
+        addn_hosts = []
+        for alloc, hostname, fqdn in self._iter_port_hosts(port, v6_nets):
+            entry = self._format_host_entry(port, alloc, fqdn,
+                                            dhcp_enabled_subnet_ids)
+            if entry:
+                hosts.append(entry)
+            if alloc:
+                addn_hosts.append(
+                    self._format_addn_host_entry(alloc, hostname, fqdn))
+        leases = set((alloc.ip_address, port.mac_address)
+                     for alloc in port.fixed_ips)
+        return PortEntries(port.device_owner, hosts, addn_hosts,
+                           self._generate_opts_for_port(port), leases)
+
+    def _output_host_table(self, table, kinds):
+        """Writes the given kinds of config files from a host table."""
+        if 'hosts' in kinds:
+            utils.replace_file(self.get_conf_file_name('host'),
+                               table.hosts_data())
+        if 'addn_hosts' in kinds:
+            utils.replace_file(self.get_conf_file_name('addn_hosts'),
+                               table.addn_hosts_data())
+        if 'opts' in kinds:
+            utils.replace_file(self.get_conf_file_name('opts'),
+                               table.opts_data())
+
+    def _get_v6_nets(self):
+        return dict((subnet.id, subnet) for subnet in
+                    self.network.subnets if subnet.ip_version == 6)
+
+    def _get_dhcp_enabled_subnet_ids(self):
+        return [s.id for s in self.network.subnets if s.enable_dhcp]
+
     def _iter_hosts(self):
         """Iterate over hosts.
 
@@ -436,29 +616,33 @@ class Dnsmasq(DhcpLocalProcess):
             name,  # Canonical hostname in the format 'hostname[.domain]'.
         )
         """
-        v6_nets = dict((subnet.id, subnet) for subnet in
-                       self.network.subnets if subnet.ip_version == 6)
+        v6_nets = self._get_v6_nets()
         for port in self.network.ports:
-            for alloc in port.fixed_ips:
-                # Note(scollins) Only create entries that are
-                # associated with the subnet being managed by this
-                # dhcp agent
-                if alloc.subnet_id in v6_nets:
-                    addr_mode = v6_nets[alloc.subnet_id].ipv6_address_mode
-                    if addr_mode == constants.IPV6_SLAAC:
-                        continue
-                    elif addr_mode == constants.DHCPV6_STATELESS:
-                        alloc = hostname = fqdn = None
-                        yield (port, alloc, hostname, fqdn)
-                        continue
-
-                hostname = 'host-%s' % alloc.ip_address.replace(
-                    '.', '-').replace(':', '-')
-                fqdn = hostname
-                if self.conf.dhcp_domain:
-                    fqdn = '%s.%s' % (fqdn, self.conf.dhcp_domain)
+            for alloc, hostname, fqdn in self._iter_port_hosts(port, v6_nets):
                 yield (port, alloc, hostname, fqdn)
 
+    def _iter_port_hosts(self, port, v6_nets):
+        """Iterate over the (alloc, host_name, name) tuples of a port."""
+        for alloc in port.fixed_ips:
+            # Note(scollins) Only create entries that are
+            # associated with the subnet being managed by this
+            # dhcp agent
+            if alloc.subnet_id in v6_nets:
+                addr_mode = v6_nets[alloc.subnet_id].ipv6_address_mode
+                if addr_mode == constants.IPV6_SLAAC:
+                    continue
+                elif addr_mode == constants.DHCPV6_STATELESS:
+                    alloc = hostname = fqdn = None
+                    yield (alloc, hostname, fqdn)
+                    continue
+
+            hostname = 'host-%s' % alloc.ip_address.replace(
+                '.', '-').replace(':', '-')
+            fqdn = hostname
+            if self.conf.dhcp_domain:
+                fqdn = '%s.%s' % (fqdn, self.conf.dhcp_domain)
+            yield (alloc, hostname, fqdn)
+
     def _output_hosts_file(self):
         """Writes a dnsmasq compatible dhcp hosts file.
 
@@ -479,39 +663,41 @@ class Dnsmasq(DhcpLocalProcess):
         filename = self.get_conf_file_name('host')
 
         LOG.debug('Building host file: %s', filename)
-        dhcp_enabled_subnet_ids = [s.id for s in self.network.subnets
-                                   if s.enable_dhcp]
+        dhcp_enabled_subnet_ids = self._get_dhcp_enabled_subnet_ids()
         for (port, alloc, hostname, name) in self._iter_hosts():
-            if not alloc:
-                if getattr(port, 'extra_dhcp_opts', False):
-                    buf.write('%s,%s%s\n' %
-                              (port.mac_address, 'set:', port.id))
-                continue
-
-            # don't write ip address which belongs to a dhcp disabled subnet.
-            if alloc.subnet_id not in dhcp_enabled_subnet_ids:
-                continue
-
-            # (dzyu) Check if it is legal ipv6 address, if so, need wrap
-            # it with '[]' to let dnsmasq to distinguish MAC address from
-            # IPv6 address.
-            ip_address = alloc.ip_address
-            if netaddr.valid_ipv6(ip_address):
-                ip_address = '[%s]' % ip_address
-
-            if getattr(port, 'extra_dhcp_opts', False):
-                buf.write('%s,%s,%s,%s%s\n' %
-                          (port.mac_address, name, ip_address,
-                           'set:', port.id))
-            else:
-                buf.write('%s,%s,%s\n' %
-                          (port.mac_address, name, ip_address))
+            entry = self._format_host_entry(port, alloc, name,
+                                            dhcp_enabled_subnet_ids)
+            if entry:
+                buf.write(entry)
 
         utils.replace_file(filename, buf.getvalue())
         LOG.debug('Done building host file %s with contents:\n%s', filename,
                   buf.getvalue())
         return filename
 
+    def _format_host_entry(self, port, alloc, name, dhcp_enabled_subnet_ids):
+        """Returns the hosts file line of an allocation, if any."""
+        if not alloc:
+            if getattr(port, 'extra_dhcp_opts', False):
+                return '%s,%s%s\n' % (port.mac_address, 'set:', port.id)
+            return
+
+        # don't write ip address which belongs to a dhcp disabled subnet.
+        if alloc.subnet_id not in dhcp_enabled_subnet_ids:
+            return
+
+        # (dzyu) Check if it is legal ipv6 address, if so, need wrap
+        # it with '[]' to let dnsmasq to distinguish MAC address from
+        # IPv6 address.
+        ip_address = alloc.ip_address
+        if netaddr.valid_ipv6(ip_address):
+            ip_address = '[%s]' % ip_address
+
+        if getattr(port, 'extra_dhcp_opts', False):
+            return '%s,%s,%s,%s%s\n' % (port.mac_address, name, ip_address,
+                                        'set:', port.id)
+        return '%s,%s,%s\n' % (port.mac_address, name, ip_address)
+
     def _read_hosts_file_leases(self, filename):
         leases = set()
         if os.path.exists(filename):
@@ -548,11 +734,15 @@ class Dnsmasq(DhcpLocalProcess):
             # It is compulsory to write the `fqdn` before the `hostname` in
             # order to obtain it in PTR responses.
             if alloc:
-                buf.write('%s\t%s %s\n' % (alloc.ip_address, fqdn, hostname))
+                buf.write(self._format_addn_host_entry(alloc, hostname, fqdn))
         addn_hosts = self.get_conf_file_name('addn_hosts')
         utils.replace_file(addn_hosts, buf.getvalue())
         return addn_hosts
 
+    @staticmethod
+    def _format_addn_host_entry(alloc, hostname, fqdn):
+        return '%s\t%s %s\n' % (alloc.ip_address, fqdn, hostname)
+
     def _output_opts_file(self):
         """Write a dnsmasq compatible options file."""
         options, subnet_index_map = self._generate_opts_per_subnet()
@@ -633,25 +823,35 @@ class Dnsmasq(DhcpLocalProcess):
 
     def _generate_opts_per_port(self, subnet_index_map):
         options = []
-        dhcp_ips = collections.defaultdict(list)
         for port in self.network.ports:
-            if getattr(port, 'extra_dhcp_opts', False):
-                port_ip_versions = set(
-                    [netaddr.IPAddress(ip.ip_address).version
-                     for ip in port.fixed_ips])
-                for opt in port.extra_dhcp_opts:
-                    opt_ip_version = opt.ip_version
-                    if opt_ip_version in port_ip_versions:
-                        options.append(
-                            self._format_option(opt_ip_version, port.id,
-                                                opt.opt_name, opt.opt_value))
-                    else:
-                        LOG.info(_LI("Cannot apply dhcp option %(opt)s "
-                                     "because it's ip_version %(version)d "
-                                     "is not in port's address IP versions"),
-                                 {'opt': opt.opt_name,
-                                  'version': opt_ip_version})
+            options.extend(self._generate_opts_for_port(port))
+        options.extend(self._generate_opts_per_dhcp_port(subnet_index_map))
+        return options
 
+    def _generate_opts_for_port(self, port):
+        options = []
+        if getattr(port, 'extra_dhcp_opts', False):
+            port_ip_versions = set(
+                [netaddr.IPAddress(ip.ip_address).version
+                 for ip in port.fixed_ips])
+            for opt in port.extra_dhcp_opts:
+                opt_ip_version = opt.ip_version
+                if opt_ip_version in port_ip_versions:
+                    options.append(
+                        self._format_option(opt_ip_version, port.id,
+                                            opt.opt_name, opt.opt_value))
+                else:
+                    LOG.info(_LI("Cannot apply dhcp option %(opt)s "
+                                 "because it's ip_version %(version)d "
+                                 "is not in port's address IP versions"),
+                             {'opt': opt.opt_name,
+                              'version': opt_ip_version})
+        return options
+
+    def _generate_opts_per_dhcp_port(self, subnet_index_map):
+        options = []
+        dhcp_ips = collections.defaultdict(list)
+        for port in self.network.ports:
             # provides all dnsmasq ip as dns-server if there is more than
             # one dnsmasq for a subnet and there is no dns-server submitted
             # by the server
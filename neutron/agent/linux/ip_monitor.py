@@ -0,0 +1,85 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import itertools
+
+import eventlet.queue
+
+from neutron.agent.linux import async_process
+from neutron.i18n import _LE
+from neutron.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+DELETED_PREFIX = 'Deleted '
+
+
+def _parse_link_event(line):
+    """Parse a line of 'ip -o monitor link' output.
+
+    Lines look like '5: tap1234: <BROADCAST,MULTICAST> mtu 1500 ...', and
+    are prefixed by 'Deleted ' when the link has been deleted.
+
+    :returns: a (device name, deleted) tuple, or None if the line does not
+              describe a link.
+    """
+    deleted = line.startswith(DELETED_PREFIX)
+    if deleted:
+        line = line[len(DELETED_PREFIX):]
+    fields = line.split(':', 2)
+    if len(fields) < 3 or not fields[0].strip().isdigit():
+        return
+    # Names of links with a peer look like 'name@peer'
+    name = fields[1].strip().split('@')[0]
+    if name:
+        return name, deleted
+
+
+class IpLinkMonitor(async_process.AsyncProcess):
+    """Manages an invocation of 'ip monitor link'.
+
+    The monitor receives the rtnetlink messages sent when links are added,
+    changed or deleted, which get_events() returns as they come.
+    """
+
+    def __init__(self, respawn_interval=None):
+        super(IpLinkMonitor, self).__init__(['ip', '-o', 'monitor', 'link'],
+                                            respawn_interval=respawn_interval)
+
+    def _read_stderr(self):
+        data = super(IpLinkMonitor, self)._read_stderr()
+        if data:
+            LOG.error(_LE('Error received from ip monitor: %s'), data)
+            # Do not return value to ensure that stderr output will
+            # stop the monitor.
+
+    def get_events(self, timeout=None):
+        """Return the link events received so far.
+
+        If there is none, wait up to timeout seconds for one.
+
+        :returns: a list of (device name, deleted) tuples, in the order the
+                  events were received.
+        """
+        try:
+            first = self._stdout_lines.get(timeout=timeout)
+        except eventlet.queue.Empty:
+            return []
+        events = []
+        for line in itertools.chain([first], self.iter_stdout()):
+            event = _parse_link_event(line)
+            if event:
+                events.append(event)
+        return events
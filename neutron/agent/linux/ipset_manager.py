@@ -78,11 +78,6 @@ class IpsetManager(object):
         set_name = self.get_name(id, ethertype)
         self._destroy(set_name, forced)
 
-    def _add_member_to_set(self, set_name, member_ip):
-        cmd = ['ipset', 'add', '-exist', set_name, member_ip]
-        self._apply(cmd)
-        self.ipset_sets[set_name].append(member_ip)
-
     def _refresh_set(self, set_name, member_ips, ethertype):
         new_set_name = set_name + SWAP_SUFFIX
         set_type = self._get_ipset_set_type(ethertype)
@@ -96,27 +91,40 @@ class IpsetManager(object):
         self._destroy(new_set_name, True)
         self.ipset_sets[set_name] = member_ips
 
-    def _del_member_from_set(self, set_name, member_ip):
-        cmd = ['ipset', 'del', set_name, member_ip]
-        self._apply(cmd)
-        self.ipset_sets[set_name].remove(member_ip)
-
     def _create_set(self, set_name, ethertype):
         cmd = ['ipset', 'create', '-exist', set_name, 'hash:ip', 'family',
                self._get_ipset_set_type(ethertype)]
         self._apply(cmd)
         self.ipset_sets[set_name] = []
 
-    def _apply(self, cmd, input=None):
-        input = '\n'.join(input) if input else None
+    def _get_ns_cmd(self, cmd):
         cmd_ns = []
         if self.namespace:
             cmd_ns.extend(['ip', 'netns', 'exec', self.namespace])
         cmd_ns.extend(cmd)
-        self.execute(cmd_ns,
+        return cmd_ns
+
+    def _apply(self, cmd, input=None):
+        input = '\n'.join(input) if input else None
+        self.execute(self._get_ns_cmd(cmd),
                      root_helper=self.root_helper,
                      process_input=input)
 
+    def _apply_many(self, cmds, applied):
+        """Run independent ipset commands concurrently.
+
+        applied is called with each command as soon as it succeeded, so
+        the caller can track the commands that went through even if
+        another one of the batch fails.
+        """
+        def execute(cmd, **kwargs):
+            self.execute(self._get_ns_cmd(cmd), **kwargs)
+            applied(cmd)
+
+        linux_utils.execute_many(cmds, execute_func=execute,
+                                 root_helper=self.root_helper,
+                                 process_input=None)
+
     def _get_new_set_ips(self, set_name, expected_ips):
         new_member_ips = (set(expected_ips) -
                           set(self.ipset_sets.get(set_name, [])))
@@ -128,14 +136,18 @@ class IpsetManager(object):
         return list(deleted_member_ips)
 
     def _add_members_to_set(self, set_name, add_ips):
-        for ip in add_ips:
-            if ip not in self.ipset_sets[set_name]:
-                self._add_member_to_set(set_name, ip)
+        members = self.ipset_sets[set_name]
+        add_ips = [ip for ip in add_ips if ip not in members]
+        self._apply_many([['ipset', 'add', '-exist', set_name, ip]
+                          for ip in add_ips],
+                         lambda cmd: members.append(cmd[-1]))
 
     def _del_members_from_set(self, set_name, del_ips):
-        for ip in del_ips:
-            if ip in self.ipset_sets[set_name]:
-                self._del_member_from_set(set_name, ip)
+        members = self.ipset_sets[set_name]
+        del_ips = [ip for ip in del_ips if ip in members]
+        self._apply_many([['ipset', 'del', '-exist', set_name, ip]
+                          for ip in del_ips],
+                         lambda cmd: members.remove(cmd[-1]))
 
     def _get_ipset_set_type(self, ethertype):
         return 'inet6' if ethertype == 'IPv6' else 'inet'
@@ -20,11 +20,17 @@ import shlex
 import socket
 import struct
 import tempfile
+import threading
+import time
 
+import eventlet
 from eventlet.green import subprocess
 from eventlet import greenthread
+from oslo_config import cfg
+from oslo_rootwrap import client
 from oslo_utils import excutils
 
+from neutron.agent.common import config
 from neutron.common import constants
 from neutron.common import utils
 from neutron.i18n import _LE
@@ -32,6 +38,84 @@ from neutron.openstack.common import log as logging
 
 
 LOG = logging.getLogger(__name__)
+config.register_root_helper(cfg.CONF)
+config.register_execute_opts(cfg.CONF)
+
+# Upper bounds, in seconds, of the buckets of the command latency histograms.
+# The last bucket of a histogram counts the commands slower than all bounds.
+COMMAND_LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5)
+# Number of binaries, the slowest in total, included in the state report.
+COMMAND_STATS_REPORTED = 10
+
+
+class CommandStats(object):
+    """Latency histograms of the commands run by the agent, by binary."""
+
+    def __init__(self):
+        self.stats = {}
+
+    @staticmethod
+    def get_binary(cmd):
+        """Return the name of the binary actually run by cmd."""
+        if cmd[:3] == ['ip', 'netns', 'exec'] and len(cmd) > 4:
+            cmd = cmd[4:]
+        return os.path.basename(str(cmd[0]))
+
+    def record(self, cmd, duration):
+        binary = self.get_binary(cmd)
+        stat = self.stats.get(binary)
+        if stat is None:
+            stat = self.stats[binary] = {
+                'count': 0, 'total': 0.0, 'max': 0.0,
+                'hist': [0] * (len(COMMAND_LATENCY_BUCKETS) + 1)}
+        stat['count'] += 1
+        stat['total'] += duration
+        stat['max'] = max(stat['max'], duration)
+        for index, bound in enumerate(COMMAND_LATENCY_BUCKETS):
+            if duration <= bound:
+                break
+        else:
+            index = len(COMMAND_LATENCY_BUCKETS)
+        stat['hist'][index] += 1
+
+    def get_report(self, limit=COMMAND_STATS_REPORTED):
+        """Return the stats of the binaries with the largest total time."""
+        slowest = sorted(self.stats.items(),
+                         key=lambda item: item[1]['total'],
+                         reverse=True)[:limit]
+        return {'buckets': list(COMMAND_LATENCY_BUCKETS),
+                'commands': dict(
+                    (binary, dict(stat, total=round(stat['total'], 3),
+                                  max=round(stat['max'], 3),
+                                  hist=list(stat['hist'])))
+                    for binary, stat in slowest)}
+
+
+command_stats = CommandStats()
+
+
+def get_command_stats():
+    """Return the command latency histograms for the agent state report."""
+    return command_stats.get_report()
+
+
+class RootwrapDaemonHelper(object):
+    """Keeps one rootwrap daemon client per daemon command.
+
+    The daemon loads the command filters once when it is spawned and then
+    runs every command sent to it over its socket, which saves starting
+    the root helper for each command.
+    """
+    _clients = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_client(cls, root_helper_daemon):
+        with cls._lock:
+            if root_helper_daemon not in cls._clients:
+                cls._clients[root_helper_daemon] = client.Client(
+                    shlex.split(root_helper_daemon))
+            return cls._clients[root_helper_daemon]
 
 
 def create_process(cmd, root_helper=None, addl_env=None):
@@ -58,30 +142,53 @@ def create_process(cmd, root_helper=None, addl_env=None):
     return obj, cmd
 
 
+def execute_rootwrap_daemon(cmd, root_helper_daemon, process_input=None):
+    """Run cmd as root through the rootwrap daemon.
+
+    The return value will be a tuple of the exit code, stdout and stderr
+    of the command.
+    """
+    cmd = map(str, cmd)
+    LOG.debug("Running command (rootwrap daemon): %s", cmd)
+    rootwrap_client = RootwrapDaemonHelper.get_client(root_helper_daemon)
+    return rootwrap_client.execute(cmd, process_input)
+
+
 def execute(cmd, root_helper=None, process_input=None, addl_env=None,
             check_exit_code=True, return_stderr=False, log_fail_as_error=True,
             extra_ok_codes=None):
+    start = time.time()
+    binary_cmd = cmd
     try:
-        obj, cmd = create_process(cmd, root_helper=root_helper,
-                                  addl_env=addl_env)
-        _stdout, _stderr = obj.communicate(process_input)
-        obj.stdin.close()
+        # NOTE: the daemon runs commands with its own environment, so
+        # commands needing additional variables still spawn the root helper.
+        root_helper_daemon = cfg.CONF.AGENT.root_helper_daemon
+        if root_helper and root_helper_daemon and not addl_env:
+            returncode, _stdout, _stderr = execute_rootwrap_daemon(
+                cmd, root_helper_daemon, process_input)
+        else:
+            obj, cmd = create_process(cmd, root_helper=root_helper,
+                                      addl_env=addl_env)
+            _stdout, _stderr = obj.communicate(process_input)
+            returncode = obj.returncode
+            obj.stdin.close()
         m = _("\nCommand: %(cmd)s\nExit code: %(code)s\nStdout: %(stdout)s\n"
-              "Stderr: %(stderr)s") % {'cmd': cmd, 'code': obj.returncode,
+              "Stderr: %(stderr)s") % {'cmd': cmd, 'code': returncode,
                                        'stdout': _stdout, 'stderr': _stderr}
 
         extra_ok_codes = extra_ok_codes or []
-        if obj.returncode and obj.returncode in extra_ok_codes:
-            obj.returncode = None
+        if returncode and returncode in extra_ok_codes:
+            returncode = None
 
-        if obj.returncode and log_fail_as_error:
+        if returncode and log_fail_as_error:
             LOG.error(m)
         else:
             LOG.debug(m)
 
-        if obj.returncode and check_exit_code:
+        if returncode and check_exit_code:
             raise RuntimeError(m)
     finally:
+        command_stats.record(binary_cmd, time.time() - start)
         # NOTE(termie): this appears to be necessary to let the subprocess
         #               call clean something up in between calls, without
         #               it two execute calls in a row hangs the second one
@@ -90,6 +197,23 @@ def execute(cmd, root_helper=None, process_input=None, addl_env=None,
     return (_stdout, _stderr) if return_stderr else _stdout
 
 
+def execute_many(cmds, execute_func=None, **kwargs):
+    """Run a batch of independent commands concurrently.
+
+    At most AGENT.execute_concurrency commands run at the same time and
+    each command is run with execute_func, execute by default, and kwargs.
+    The outputs are returned in the order of cmds; if a command fails, its
+    exception is raised once the commands before it have completed.
+    """
+    if execute_func is None:
+        execute_func = execute
+    if len(cmds) < 2:
+        return [execute_func(cmd, **kwargs) for cmd in cmds]
+    pool = eventlet.GreenPool(min(len(cmds),
+                                  max(1, cfg.CONF.AGENT.execute_concurrency)))
+    return list(pool.imap(lambda cmd: execute_func(cmd, **kwargs), cmds))
+
+
 def get_interface_mac(interface):
     MAC_START = 18
     MAC_END = 24
@@ -12,17 +12,21 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import hashlib
 import hmac
 import os
 import socket
 
 import eventlet
+from eventlet import pools
 import httplib2
 from neutronclient.v2_0 import client
 from oslo_config import cfg
 import oslo_messaging
 from oslo_utils import excutils
+from oslo_utils import timeutils
+import six
 import six.moves.urllib.parse as urlparse
 import webob
 
@@ -67,21 +71,176 @@ class MetadataPluginAPI(object):
         return cctxt.call(context, 'get_ports', filters=filters)
 
 
+class MetadataCache(object):
+    """Bounded LRU cache of the port lookups of the metadata proxy.
+
+    Entries expire after ttl seconds, or never if ttl is 0, and lookups
+    which found nothing after negative_ttl seconds.  The least recently used
+    entries are evicted when there are more than max_entries of them or
+    when their estimated size exceeds max_memory bytes.  Entries are indexed
+    by the ids and addresses they depend on, so that port and network
+    notifications can invalidate them.
+
+    It provides the get and set methods used by
+    neutron.common.utils.cache_method_results.
+    """
+
+    def __init__(self, ttl, negative_ttl, max_entries, max_memory):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.max_memory = max_memory
+        self.memory = 0
+        # key -> (value, expiration time, size, tags)
+        self._entries = collections.OrderedDict()
+        # tag -> keys of the entries depending on it
+        self._tags = collections.defaultdict(set)
+
+    def get(self, key, default=None):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return default
+        expires_at = entry[1]
+        if expires_at and expires_at <= timeutils.utcnow_ts():
+            self._drop(key, entry)
+            return default
+        # Reinserting the entry makes it the most recently used one
+        self._entries[key] = entry
+        return entry[0]
+
+    def set(self, key, value, ttl=None):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._drop(key, entry)
+
+        if not value:
+            if not self.negative_ttl:
+                return
+            ttl = self.negative_ttl
+        elif ttl is None:
+            ttl = self.ttl
+        expires_at = timeutils.utcnow_ts() + ttl if ttl else None
+        size = len(repr(key)) + len(repr(value))
+        tags = self._get_tags(key, value)
+        self._entries[key] = (value, expires_at, size, tags)
+        self.memory += size
+        for tag in tags:
+            self._tags[tag].add(key)
+
+        while self._entries and (len(self._entries) > self.max_entries or
+                                 self.memory > self.max_memory):
+            old_key, old_entry = self._entries.popitem(last=False)
+            self._drop(old_key, old_entry)
+
+    def invalidate(self, tags):
+        """Remove the entries depending on any of the given tags."""
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._drop(key, entry)
+
+    def _drop(self, key, entry):
+        """Account for the removal of an entry already popped."""
+        self.memory -= entry[2]
+        for tag in entry[3]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    @staticmethod
+    def _get_tags(key, value):
+        # The first item of keys built by cache_method_results is the name
+        # of the cached method, the other ones are its arguments.
+        tags = set()
+        for arg in key[1:]:
+            if isinstance(arg, (tuple, list)):
+                tags.update(arg)
+            else:
+                tags.add(arg)
+        for item in value:
+            if isinstance(item, dict):
+                tags.add(item.get('id'))
+                tags.update(fixed_ip.get('ip_address')
+                            for fixed_ip in item.get('fixed_ips', []))
+            elif isinstance(item, six.string_types):
+                tags.add(item)
+        tags.discard(None)
+        return tags
+
+
+class MetadataCacheInvalidator(object):
+    """Drops cached port lookups made stale by notifications.
+
+    The server notifies port updates and network deletions, but not port
+    deletions: the lookups of a deleted port expire with the cache TTL.
+    """
+
+    target = oslo_messaging.Target(version='1.0')
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def port_update(self, context, **kwargs):
+        port = kwargs.get('port', {})
+        tags = [port.get('id'), port.get('device_id')]
+        tags.extend(fixed_ip.get('ip_address')
+                    for fixed_ip in port.get('fixed_ips', []))
+        self.cache.invalidate([tag for tag in tags if tag])
+
+    def network_delete(self, context, **kwargs):
+        self.cache.invalidate([kwargs.get('network_id')])
+
+
 class MetadataProxyHandler(object):
 
     def __init__(self, conf):
         self.conf = conf
         self.auth_info = {}
-        if self.conf.cache_url:
-            self._cache = cache.get_cache(self.conf.cache_url)
-        else:
-            self._cache = False
+        self._cache = self._create_cache()
+        # Pid of the process consuming the notifications invalidating the
+        # cache, which is created lazily in each worker process.
+        self._invalidation_pid = None
+        # Pool of the connections to the Nova metadata API, which is created
+        # lazily in each worker process.
+        self._http_pool = None
+        self._http_pool_pid = None
 
         self.plugin_rpc = MetadataPluginAPI(topics.PLUGIN)
         self.context = context.get_admin_context_without_session()
         # Use RPC by default
         self.use_rpc = True
 
+    def _create_cache(self):
+        if not self.conf.cache_url:
+            return False
+        parsed = urlparse.urlparse(self.conf.cache_url)
+        if parsed.scheme != 'memory':
+            return cache.get_cache(self.conf.cache_url)
+        query = urlparse.parse_qs(parsed.query)
+        return MetadataCache(
+            ttl=int(query.get('default_ttl', [0])[0]),
+            negative_ttl=self.conf.cache_negative_ttl,
+            max_entries=self.conf.cache_max_entries,
+            max_memory=self.conf.cache_max_memory * 1024 * 1024)
+
+    def _ensure_cache_invalidation(self):
+        """Invalidate the cache on port notifications in this process."""
+        if (not isinstance(self._cache, MetadataCache) or
+                self._invalidation_pid == os.getpid()):
+            return
+        self._invalidation_pid = os.getpid()
+        try:
+            self._invalidation_connection = agent_rpc.create_consumers(
+                [MetadataCacheInvalidator(self._cache)], topics.AGENT,
+                [[topics.PORT, topics.UPDATE],
+                 [topics.NETWORK, topics.DELETE]])
+        except Exception:
+            LOG.exception(_LE("Unable to consume port notifications, cached "
+                              "port lookups will only expire."))
+
     def _get_neutron_client(self):
         qclient = client.Client(
             username=self.conf.admin_user,
@@ -102,6 +261,7 @@ class MetadataProxyHandler(object):
     def __call__(self, req):
         try:
             LOG.debug("Request: %s", req)
+            self._ensure_cache_invalidation()
 
             instance_id, tenant_id = self._get_instance_and_tenant_id(req)
             if instance_id:
@@ -221,16 +381,14 @@ class MetadataProxyHandler(object):
             req.query_string,
             ''))
 
-        h = httplib2.Http(
-            ca_certs=self.conf.auth_ca_cert,
-            disable_ssl_certificate_validation=self.conf.nova_metadata_insecure
-        )
-        if self.conf.nova_client_cert and self.conf.nova_client_priv_key:
-            h.add_certificate(self.conf.nova_client_priv_key,
-                              self.conf.nova_client_cert,
-                              nova_ip_port)
-        resp, content = h.request(url, method=req.method, headers=headers,
-                                  body=req.body)
+        with self._get_http_pool().item() as h:
+            try:
+                resp, content = h.request(url, method=req.method,
+                                          headers=headers, body=req.body)
+            except Exception:
+                with excutils.save_and_reraise_exception():
+                    # Do not reuse connections left in an unknown state
+                    self._close_connections(h)
 
         if resp.status == 200:
             LOG.debug(str(resp))
@@ -258,6 +416,38 @@ class MetadataProxyHandler(object):
         else:
             raise Exception(_('Unexpected response code: %s') % resp.status)
 
+    def _get_http_pool(self):
+        """Return the pool of Nova connections of the current process.
+
+        The Http objects keep their connections to the Nova metadata API
+        alive between requests, but cannot be used concurrently, so each
+        request takes one from the pool.
+        """
+        if self._http_pool_pid != os.getpid():
+            self._http_pool = pools.Pool(
+                max_size=self.conf.nova_metadata_pool_size,
+                create=self._create_http)
+            self._http_pool_pid = os.getpid()
+        return self._http_pool
+
+    def _create_http(self):
+        h = httplib2.Http(
+            ca_certs=self.conf.auth_ca_cert,
+            disable_ssl_certificate_validation=self.conf.nova_metadata_insecure
+        )
+        if self.conf.nova_client_cert and self.conf.nova_client_priv_key:
+            h.add_certificate(self.conf.nova_client_priv_key,
+                              self.conf.nova_client_cert,
+                              '%s:%s' % (self.conf.nova_metadata_ip,
+                                         self.conf.nova_metadata_port))
+        return h
+
+    @staticmethod
+    def _close_connections(h):
+        for conn in h.connections.values():
+            conn.close()
+        h.connections.clear()
+
     def _sign_instance_id(self, instance_id):
         return hmac.new(self.conf.metadata_proxy_shared_secret,
                         instance_id,
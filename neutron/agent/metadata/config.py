@@ -63,7 +63,24 @@ METADATA_PROXY_HANDLER_OPTS = [
                 help=_("Client certificate for nova metadata api server.")),
      cfg.StrOpt('nova_client_priv_key',
                 default='',
-                help=_("Private key of client certificate."))
+                help=_("Private key of client certificate.")),
+     cfg.IntOpt('nova_metadata_pool_size',
+                default=50,
+                help=_("Maximum number of connections to the Nova metadata "
+                       "server kept open by each metadata proxy worker.")),
+     cfg.IntOpt('cache_max_entries',
+                default=10000,
+                help=_("Maximum number of port lookups kept by the memory "
+                       "cache of the metadata proxy.")),
+     cfg.IntOpt('cache_max_memory',
+                default=32,
+                help=_("Maximum size, in megabytes, of the port lookups kept "
+                       "by the memory cache of the metadata proxy.")),
+     cfg.IntOpt('cache_negative_ttl',
+                default=2,
+                help=_("Time in seconds the memory cache of the metadata "
+                       "proxy remembers that no port matched a lookup. Use "
+                       "0 to not cache failed lookups.")),
 ]
 
 
@@ -156,6 +156,18 @@ class DhcpAgentNotifyAPI(object):
         self._cast_message(context, 'network_create_end',
                            {'network': {'id': network_id}}, host)
 
+    def networks_added_to_agent(self, context, network_ids, host):
+        """Notify an agent of many networks to serve at once.
+
+        A single network is notified as usual, while many networks are
+        picked up by asking the agent to resync rather than sending one
+        message per network.
+        """
+        if len(network_ids) == 1:
+            self.network_added_to_agent(context, network_ids[0], host)
+        else:
+            self.agent_updated(context, True, host)
+
     def agent_updated(self, context, admin_state_up, host):
         self._cast_message(context, 'agent_updated',
                            {'admin_state_up': admin_state_up}, host)
@@ -13,12 +13,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
 import itertools
 import operator
 
 from oslo_config import cfg
 from oslo_db import exception as db_exc
 import oslo_messaging
+from oslo_serialization import jsonutils
 from oslo_utils import excutils
 
 from neutron.api.v2 import attributes
@@ -47,9 +49,12 @@ class DhcpRpcCallback(object):
     #     1.0 - Initial version.
     #     1.1 - Added get_active_networks_info, create_dhcp_port,
     #           and update_dhcp_port methods.
+    #     1.2 - Added get_active_networks_changed and the revision of
+    #           each network returned by get_active_networks_info and
+    #           get_network_info.
     target = oslo_messaging.Target(
         namespace=constants.RPC_NAMESPACE_DHCP_PLUGIN,
-        version='1.1')
+        version='1.2')
 
     def _get_active_networks(self, context, **kwargs):
         """Retrieve and return a list of the active networks."""
@@ -113,10 +118,27 @@ class DhcpRpcCallback(object):
             grouped[net_id] = list(values)
         return grouped
 
+    def _set_revision(self, network):
+        """Set the revision of a network built for a DHCP agent.
+
+        The revision is a digest of the network together with its subnets
+        and ports, so it changes whenever anything the agent configures
+        for the network changes.
+        """
+        keyfunc = operator.itemgetter('id')
+        canonical = dict(network,
+                         subnets=sorted(network['subnets'], key=keyfunc),
+                         ports=sorted(network['ports'], key=keyfunc))
+        network['revision'] = hashlib.sha1(
+            jsonutils.dumps(canonical, sort_keys=True)).hexdigest()
+
     def get_active_networks_info(self, context, **kwargs):
         """Returns all the networks/subnets/ports in system."""
         host = kwargs.get('host')
         LOG.debug('get_active_networks_info from %s', host)
+        return self._get_active_networks_info(context, **kwargs)
+
+    def _get_active_networks_info(self, context, revision=False, **kwargs):
         networks = self._get_active_networks(context, **kwargs)
         plugin = manager.NeutronManager.get_plugin()
         filters = {'network_id': [network['id'] for network in networks]}
@@ -129,9 +151,35 @@ class DhcpRpcCallback(object):
         for network in networks:
             network['subnets'] = grouped_subnets.get(network['id'], [])
             network['ports'] = grouped_ports.get(network['id'], [])
+            if revision:
+                self._set_revision(network)
 
         return networks
 
+    def get_active_networks_changed(self, context, **kwargs):
+        """Returns the active networks which changed since given revisions.
+
+        revisions maps the ids of the networks known by the agent to the
+        revision it last received for them.  Only networks whose current
+        revision differs are returned in full, together with the ids of
+        all the active networks so the agent can drop the other ones.
+
+        There is no revision stored with the networks: the revisions are
+        digests computed from all the active networks, loaded in full.
+        """
+        host = kwargs.get('host')
+        revisions = kwargs.get('revisions') or {}
+        LOG.debug('get_active_networks_changed from %(host)s for '
+                  '%(count)d known networks',
+                  {'host': host, 'count': len(revisions)})
+        networks = self._get_active_networks_info(context, revision=True,
+                                                  **kwargs)
+        return {'networks': [network for network in networks
+                             if network['revision'] !=
+                             revisions.get(network['id'])],
+                'active_network_ids': [network['id']
+                                       for network in networks]}
+
     def get_network_info(self, context, **kwargs):
         """Retrieve and return a extended information about a network."""
         network_id = kwargs.get('network_id')
@@ -149,6 +197,7 @@ class DhcpRpcCallback(object):
         filters = dict(network_id=[network_id])
         network['subnets'] = plugin.get_subnets(context, filters=filters)
         network['ports'] = plugin.get_ports(context, filters=filters)
+        self._set_revision(network)
         return network
 
     def get_dhcp_port(self, context, **kwargs):
@@ -13,7 +13,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import itertools
 import re
+import time
 
 import eventlet
 eventlet.monkey_patch()
@@ -31,13 +33,15 @@ from neutron.agent.linux import ip_lib
 from neutron.agent.linux import ovs_lib
 from neutron.api.v2 import attributes
 from neutron.common import config
-from neutron.i18n import _LE
+from neutron.i18n import _LE, _LI
 from neutron.openstack.common import log as logging
 
 
 LOG = logging.getLogger(__name__)
 NS_MANGLING_PATTERN = ('(%s|%s)' % (dhcp.NS_PREFIX, l3_agent.NS_PREFIX) +
                        attributes.UUID_PATTERN)
+# Number of destroyed namespaces between two progress messages
+PROGRESS_INTERVAL = 100
 
 
 class FakeDhcpPlugin(object):
@@ -59,6 +63,10 @@ def setup_conf():
         cfg.BoolOpt('force',
                     default=False,
                     help=_('Delete the namespace by removing all devices.')),
+        cfg.IntOpt('workers',
+                   default=16,
+                   help=_('Number of namespaces checked and destroyed '
+                          'concurrently.')),
     ]
 
     conf = cfg.CONF
@@ -133,6 +141,8 @@ def destroy_namespace(conf, namespace, force=False):
 
     If force is True, then dhcp (if it exists) will be disabled and all
     devices will be forcibly removed.
+
+    :returns: False if an error prevented the destruction.
     """
 
     try:
@@ -148,8 +158,30 @@ def destroy_namespace(conf, namespace, force=False):
                     unplug_device(conf, device)
 
         ip.garbage_collect_namespace()
+        return True
     except Exception:
         LOG.exception(_LE('Error unable to destroy namespace: %s'), namespace)
+        return False
+
+
+def destroy_namespaces(conf, pool, namespaces, force=False):
+    """Destroy namespaces concurrently with the green threads of pool."""
+    LOG.info(_LI('Destroying %d namespaces'), len(namespaces))
+    start = time.time()
+    failed = 0
+    results = pool.imap(destroy_namespace, itertools.repeat(conf),
+                        namespaces, itertools.repeat(force))
+    for count, destroyed in enumerate(results, 1):
+        if not destroyed:
+            failed += 1
+        if count % PROGRESS_INTERVAL == 0:
+            LOG.info(_LI('Destroyed %(count)d of %(total)d namespaces'),
+                     {'count': count, 'total': len(namespaces)})
+    LOG.info(_LI('Destroyed %(count)d namespaces in %(elapsed).3f seconds, '
+                 '%(failed)d failed'),
+             {'count': len(namespaces) - failed,
+              'elapsed': time.time() - start,
+              'failed': failed})
 
 
 def main():
@@ -168,19 +200,28 @@ def main():
     The --force flag should only be used as part of the cleanup of a devstack
     installation as it will blindly purge namespaces and their devices. This
     option also kills any lingering DHCP instances.
+
+    Namespaces are checked and destroyed by up to --workers green threads at
+    once.
     """
     conf = setup_conf()
     conf()
     config.setup_logging()
 
+    if conf.workers < 1:
+        LOG.error(_LE('workers must be at least 1.'))
+        raise SystemExit(1)
+    pool = eventlet.GreenPool(size=conf.workers)
+
     root_helper = agent_config.get_root_helper(conf)
     # Identify namespaces that are candidates for deletion.
-    candidates = [ns for ns in
-                  ip_lib.IPWrapper.get_namespaces(root_helper)
-                  if eligible_for_deletion(conf, ns, conf.force)]
+    namespaces = ip_lib.IPWrapper.get_namespaces(root_helper)
+    eligible = pool.imap(eligible_for_deletion, itertools.repeat(conf),
+                         namespaces, itertools.repeat(conf.force))
+    candidates = [ns for ns, is_eligible in zip(namespaces, eligible)
+                  if is_eligible]
 
     if candidates:
         eventlet.sleep(2)
 
-        for namespace in candidates:
-            destroy_namespace(conf, namespace, conf.force)
+        destroy_namespaces(conf, pool, candidates, conf.force)
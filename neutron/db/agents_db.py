@@ -13,6 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import copy
+
 from eventlet import greenthread
 
 from oslo_config import cfg
@@ -20,15 +22,17 @@ from oslo_db import exception as db_exc
 import oslo_messaging
 from oslo_serialization import jsonutils
 from oslo_utils import timeutils
+from oslo_utils import uuidutils
 import sqlalchemy as sa
 from sqlalchemy.orm import exc
 from sqlalchemy import sql
 
 from neutron.api.v2 import attributes
+from neutron import context as n_context
 from neutron.db import model_base
 from neutron.db import models_v2
 from neutron.extensions import agent as ext_agent
-from neutron.i18n import _LW
+from neutron.i18n import _LE, _LW
 from neutron import manager
 from neutron.openstack.common import log as logging
 
@@ -38,6 +42,35 @@ cfg.CONF.register_opt(
                help=_("Seconds to regard the agent is down; should be at "
                       "least twice report_interval, to be sure the "
                       "agent is down for good.")))
+cfg.CONF.register_opt(
+    cfg.FloatOpt('agent_heartbeat_flush_interval', default=5,
+                 help=_("Seconds during which heartbeats of known agents "
+                        "reporting unchanged configurations are buffered "
+                        "before being written in a single update; 0 writes "
+                        "each report immediately. Should be much lower "
+                        "than agent_down_time.")))
+cfg.CONF.register_opt(
+    cfg.FloatOpt('agent_stats_write_interval', default=60,
+                 help=_("Seconds between writes of the statistics agents "
+                        "report in their configurations when nothing else "
+                        "changed. Heartbeats reporting only new statistics "
+                        "are buffered in between.")))
+cfg.CONF.register_opt(
+    cfg.FloatOpt('agent_registry_refresh_interval', default=5,
+                 help=_("Seconds during which the schedulers of a worker "
+                        "rely on its in-memory view of the agents before "
+                        "reloading it from the database; 0 reloads it for "
+                        "each scheduling decision.")))
+
+
+# Keys of the agent configurations holding statistics, which change on
+# almost every report
+STATS_CONFIGURATIONS = ('command_stats', 'router_processing')
+
+
+def _without_stats(configurations):
+    return dict((key, value) for key, value in configurations.items()
+                if key not in STATS_CONFIGURATIONS)
 
 
 class Agent(model_base.BASEV2, models_v2.HasId):
@@ -74,6 +107,119 @@ class Agent(model_base.BASEV2, models_v2.HasId):
         return not AgentDbMixin.is_agent_down(self.heartbeat_timestamp)
 
 
+class AgentRegistry(object):
+    """Per-worker index of the agents with their parsed configurations.
+
+    Schedulers look up candidate agents here instead of loading and parsing
+    every agent row for each network or router. Entries are updated in
+    place when this worker processes agent reports or updates, and the whole
+    index is reloaded from the database, without building ORM objects and
+    parsing only the configurations which changed, at most every
+    agent_registry_refresh_interval seconds to catch the changes made by
+    other workers.
+
+    Entries are dicts which must not be modified by callers.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._agents = {}
+        self._refreshed_at = None
+
+    def _make_entry(self, agent_id, agent_type, host, admin_state_up,
+                    heartbeat_timestamp, configurations):
+        entry = self._agents.get(agent_id)
+        if entry and entry['raw_configurations'] == configurations:
+            parsed = entry['configurations']
+        else:
+            try:
+                parsed = jsonutils.loads(configurations)
+            except Exception:
+                msg = _LW('Configuration for agent %(agent_type)s on host '
+                          '%(host)s is invalid.')
+                LOG.warn(msg, {'agent_type': agent_type, 'host': host})
+                parsed = {}
+        if entry and heartbeat_timestamp < entry['heartbeat_timestamp']:
+            # a heartbeat buffered by this worker is not written yet
+            heartbeat_timestamp = entry['heartbeat_timestamp']
+        return {'id': agent_id,
+                'agent_type': agent_type,
+                'host': host,
+                'admin_state_up': admin_state_up,
+                'heartbeat_timestamp': heartbeat_timestamp,
+                'raw_configurations': configurations,
+                'configurations': parsed}
+
+    def update(self, agent_db):
+        """Record the current state of an agent and return its entry."""
+        entry = self._make_entry(
+            agent_db.id, agent_db.agent_type, agent_db.host,
+            agent_db.admin_state_up, agent_db.heartbeat_timestamp,
+            agent_db.configurations)
+        if agent_db.id:
+            self._agents[agent_db.id] = entry
+        return entry
+
+    def heartbeat(self, agent_id, heartbeat_timestamp):
+        entry = self._agents.get(agent_id)
+        if entry:
+            entry['heartbeat_timestamp'] = heartbeat_timestamp
+
+    def remove(self, agent_id):
+        self._agents.pop(agent_id, None)
+
+    def get_configuration(self, agent_db):
+        entry = self._agents.get(agent_db.id)
+        if (not entry or
+                entry['raw_configurations'] != agent_db.configurations):
+            entry = self.update(agent_db)
+        return entry['configurations']
+
+    def refresh(self, context):
+        """Reload the index from the database."""
+        query = context.session.query(
+            Agent.id, Agent.agent_type, Agent.host, Agent.admin_state_up,
+            Agent.heartbeat_timestamp, Agent.configurations)
+        self._agents = dict((row[0], self._make_entry(*row))
+                            for row in query)
+        self._refreshed_at = timeutils.utcnow()
+
+    def _is_stale(self):
+        interval = cfg.CONF.agent_registry_refresh_interval
+        return (interval <= 0 or self._refreshed_at is None or
+                timeutils.is_older_than(self._refreshed_at, interval))
+
+    def get_agents(self, context, agent_type, host=None,
+                   admin_state_up=True, alive=True):
+        """Return the entries of the agents of a type.
+
+        Filtering on host, admin_state_up or liveness is disabled by
+        passing None. The index is reloaded once if no agent matches, so
+        that agents just registered by other workers are not missed.
+        """
+        refreshed = self._is_stale()
+        if refreshed:
+            self.refresh(context)
+        while True:
+            entries = [
+                entry for entry in self._agents.values()
+                if entry['agent_type'] == agent_type and
+                (host is None or entry['host'] == host) and
+                (admin_state_up is None or
+                 entry['admin_state_up'] == admin_state_up) and
+                (alive is None or alive != AgentDbMixin.is_agent_down(
+                    entry['heartbeat_timestamp']))]
+            if entries or refreshed:
+                return entries
+            self.refresh(context)
+            refreshed = True
+
+
+agent_registry = AgentRegistry()
+
+
 class AgentDbMixin(ext_agent.AgentPluginBase):
     """Mixin class to add agent extension to db_base_plugin_v2."""
 
@@ -107,15 +253,12 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
                                        cfg.CONF.agent_down_time)
 
     def get_configuration_dict(self, agent_db):
-        try:
-            conf = jsonutils.loads(agent_db.configurations)
-        except Exception:
-            msg = _LW('Configuration for agent %(agent_type)s on host %(host)s'
-                      ' is invalid.')
-            LOG.warn(msg, {'agent_type': agent_db.agent_type,
-                           'host': agent_db.host})
-            conf = {}
-        return conf
+        """Return the parsed configurations of an agent.
+
+        The dict is shared through the agent registry and must not be
+        modified.
+        """
+        return agent_registry.get_configuration(agent_db)
 
     def _make_agent_dict(self, agent, fields=None):
         attr = ext_agent.RESOURCE_ATTRIBUTE_MAP.get(
@@ -131,12 +274,14 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
         with context.session.begin(subtransactions=True):
             agent = self._get_agent(context, id)
             context.session.delete(agent)
+        agent_registry.remove(id)
 
     def update_agent(self, context, id, agent):
         agent_data = agent['agent']
         with context.session.begin(subtransactions=True):
             agent = self._get_agent(context, id)
             agent.update(agent_data)
+        agent_registry.update(agent)
         return self._make_agent_dict(agent)
 
     def get_agents_db(self, context, filters=None):
@@ -193,13 +338,18 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
                 res['started_at'] = current_time
                 res['heartbeat_timestamp'] = current_time
                 res['admin_state_up'] = True
-                agent_db = Agent(**res)
+                agent_db = Agent(id=uuidutils.generate_uuid(), **res)
                 greenthread.sleep(0)
                 context.session.add(agent_db)
             greenthread.sleep(0)
+        agent_registry.update(agent_db)
+        return agent_db.id
 
     def create_or_update_agent(self, context, agent):
-        """Create or update agent according to report."""
+        """Create or update agent according to report.
+
+        Returns the id of the agent.
+        """
 
         try:
             return self._create_or_update_agent(context, agent)
@@ -218,6 +368,24 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
             # agent entry, which will be updated multiple times
             return self._create_or_update_agent(context, agent)
 
+    def update_agents_heartbeat(self, context, heartbeats):
+        """Update the heartbeat timestamp of many agents at once.
+
+        :param heartbeats: maps agent ids to their last heartbeat time.
+        :returns: the set of the ids of the agents which do not exist.
+        """
+        with context.session.begin(subtransactions=True):
+            query = context.session.query(Agent).filter(
+                Agent.id.in_(heartbeats.keys()))
+            updated = query.update(
+                {'heartbeat_timestamp': sa.case(heartbeats, value=Agent.id)},
+                synchronize_session=False)
+            if updated == len(heartbeats):
+                return set()
+            existing = context.session.query(Agent.id).filter(
+                Agent.id.in_(heartbeats.keys()))
+            return set(heartbeats) - set(agent.id for agent in existing)
+
 
 class AgentExtRpcCallback(object):
     """Processes the rpc report in plugin implementations."""
@@ -228,6 +396,12 @@ class AgentExtRpcCallback(object):
     def __init__(self, plugin=None):
         super(AgentExtRpcCallback, self).__init__()
         self.plugin = plugin
+        # (agent_type, host) -> (agent id, configurations last written,
+        #                        time they were written)
+        self._agents = {}
+        # agent id -> time of its last heartbeat not written yet
+        self._heartbeats = {}
+        self._flush_timer = None
 
     def report_state(self, context, **kwargs):
         """Report state from agent to server."""
@@ -239,4 +413,61 @@ class AgentExtRpcCallback(object):
         agent_state = kwargs['agent_state']['agent_state']
         if not self.plugin:
             self.plugin = manager.NeutronManager.get_plugin()
-        self.plugin.create_or_update_agent(context, agent_state)
+        interval = cfg.CONF.agent_heartbeat_flush_interval
+        key = (agent_state['agent_type'], agent_state['host'])
+        configurations = agent_state.get('configurations', {})
+        known = self._agents.get(key)
+        if (interval > 0 and known and not agent_state.get('start_flag') and
+                self._is_unchanged(known, configurations)):
+            heartbeat = timeutils.utcnow()
+            self._heartbeats[known[0]] = heartbeat
+            agent_registry.heartbeat(known[0], heartbeat)
+            if self._flush_timer is None:
+                self._flush_timer = greenthread.spawn_after(
+                    interval, self._flush_heartbeats)
+            return
+
+        agent_id = self.plugin.create_or_update_agent(context, agent_state)
+        self._heartbeats.pop(agent_id, None)
+        if interval > 0 and agent_id:
+            self._agents[key] = (agent_id, copy.deepcopy(configurations),
+                                 timeutils.utcnow())
+
+    @staticmethod
+    def _is_unchanged(known, configurations):
+        """Whether reported configurations need not be written yet."""
+        written, written_at = known[1:]
+        if written == configurations:
+            return True
+        # Statistics alone are written every agent_stats_write_interval
+        return (_without_stats(written) == _without_stats(configurations) and
+                not timeutils.is_older_than(
+                    written_at, cfg.CONF.agent_stats_write_interval))
+
+    def _flush_heartbeats(self):
+        """Write the buffered heartbeats in a single update."""
+        self._flush_timer = None
+        heartbeats, self._heartbeats = self._heartbeats, {}
+        if not heartbeats:
+            return
+        try:
+            missing = self.plugin.update_agents_heartbeat(
+                n_context.get_admin_context(), heartbeats)
+        except Exception:
+            LOG.exception(_LE("Failed to update the heartbeat of %d agents"),
+                          len(heartbeats))
+            # Heartbeats received in the meantime are more recent
+            for agent_id, heartbeat in heartbeats.items():
+                self._heartbeats.setdefault(agent_id, heartbeat)
+            self._flush_timer = greenthread.spawn_after(
+                cfg.CONF.agent_heartbeat_flush_interval,
+                self._flush_heartbeats)
+            return
+        LOG.debug("Updated the heartbeat of %d agents", len(heartbeats))
+        if missing:
+            # Deleted agents are created again by their next report
+            for agent_id in missing:
+                agent_registry.remove(agent_id)
+            self._agents = dict(
+                (key, value) for key, value in self._agents.items()
+                if value[0] not in missing)
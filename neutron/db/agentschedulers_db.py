@@ -13,11 +13,13 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import datetime
 import random
 import time
 
 from oslo_config import cfg
+from oslo_db import exception as db_exc
 from oslo_utils import timeutils
 import sqlalchemy as sa
 from sqlalchemy import orm
@@ -50,10 +52,23 @@ AGENTS_SCHEDULER_OPTS = [
                        'agents.')),
     cfg.IntOpt('dhcp_agents_per_network', default=1,
                help=_('Number of DHCP agents scheduled to host a network.')),
+    cfg.ListOpt('dhcp_agent_weighers', default=['networks', 'ports'],
+                help=_("Weighers rating the DHCP agents on their load, "
+                       "used by the WeightedScheduler, as "
+                       "<weigher>[:<multiplier>] where <weigher> is the name "
+                       "of the reported counter or the import path of a "
+                       "weigher class. The networks and ports counters are "
+                       "counted from the networks bound to the agents. "
+                       "Negative multipliers prefer the most loaded "
+                       "agents.")),
 ]
 
 cfg.CONF.register_opts(AGENTS_SCHEDULER_OPTS)
 
+# Number of routers or networks whose bindings are written in a single
+# transaction when many of them are rescheduled at once
+RESCHEDULE_BATCH_SIZE = 100
+
 
 class NetworkDhcpAgentBinding(model_base.BASEV2):
     """Represents binding between neutron networks and DHCP agents."""
@@ -208,6 +223,57 @@ class DhcpAgentSchedulerDbMixin(dhcpagentscheduler
             # continue in any case
             LOG.exception(_LE("Failed to schedule network %s"), network_id)
 
+    def _schedule_networks(self, context, network_ids, dhcp_notifier):
+        """Schedule many unhosted networks at once.
+
+        The placement of all the networks is computed in a single pass,
+        their bindings are written in batches and each agent receiving
+        networks is notified once. The networks of a batch which could not
+        be written are scheduled one at a time.
+        """
+        LOG.info(_LI("Scheduling %d unhosted networks"), len(network_ids))
+        placement = {}
+        if self.network_scheduler:
+            placement = self.network_scheduler.get_networks_placement(
+                self, context, network_ids)
+        placed = []
+        for network_id in network_ids:
+            if network_id in placement:
+                placed.append((network_id, placement[network_id]))
+            else:
+                LOG.info(_LI("Failed to schedule network %s, "
+                             "no eligible agents or it might be "
+                             "already scheduled by another server"),
+                         network_id)
+
+        added = collections.defaultdict(list)
+        for i in range(0, len(placed), RESCHEDULE_BATCH_SIZE):
+            batch = placed[i:i + RESCHEDULE_BATCH_SIZE]
+            try:
+                with context.session.begin(subtransactions=True):
+                    for network_id, agents in batch:
+                        for agent in agents:
+                            context.session.add(NetworkDhcpAgentBinding(
+                                network_id=network_id,
+                                dhcp_agent_id=agent.id))
+            except db_exc.DBError:
+                LOG.exception(_LE("Failed to schedule %d networks at once, "
+                                  "scheduling them one by one"), len(batch))
+                for network_id, agents in batch:
+                    self._schedule_network(context, network_id,
+                                           dhcp_notifier)
+                continue
+            for network_id, agents in batch:
+                for agent in agents:
+                    added[agent.host].append(network_id)
+        if dhcp_notifier:
+            for host, host_network_ids in added.items():
+                LOG.info(_LI("Adding %(count)d networks to the DHCP agent "
+                             "on host %(host)s"),
+                         {'count': len(host_network_ids), 'host': host})
+                dhcp_notifier.networks_added_to_agent(
+                    context, host_network_ids, host)
+
     def _filter_bindings(self, context, bindings):
         """Skip bindings for which the agent is dead, but starting up."""
 
@@ -247,6 +313,7 @@ class DhcpAgentSchedulerDbMixin(dhcpagentscheduler
                    agents_db.Agent.admin_state_up))
         dhcp_notifier = self.agent_notifiers.get(constants.AGENT_TYPE_DHCP)
 
+        network_ids = []
         for binding in self._filter_bindings(context, down_bindings):
             LOG.warn(_LW("Removing network %(network)s from agent %(agent)s "
                          "because the agent did not report to the server in "
@@ -265,10 +332,11 @@ class DhcpAgentSchedulerDbMixin(dhcpagentscheduler
                           {'net': binding.network_id,
                            'agent': binding.dhcp_agent_id})
                 # still continue and allow concurrent scheduling attempt
+            if binding.network_id not in network_ids:
+                network_ids.append(binding.network_id)
 
-            if cfg.CONF.network_auto_schedule:
-                self._schedule_network(
-                    context, binding.network_id, dhcp_notifier)
+        if network_ids and cfg.CONF.network_auto_schedule:
+            self._schedule_networks(context, network_ids, dhcp_notifier)
 
     def get_dhcp_agents_hosting_networks(
             self, context, network_ids, active=None):
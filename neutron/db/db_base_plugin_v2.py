@@ -894,10 +894,13 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
         with context.session.begin(subtransactions=True):
             network = self._get_network(context, id)
 
-            context.session.query(models_v2.Port).filter_by(
-                network_id=id).filter(
-                models_v2.Port.device_owner.
-                in_(AUTO_DELETE_PORT_OWNERS)).delete(synchronize_session=False)
+            # Delete through the ORM so that the quota usage of ports is
+            # kept up to date
+            auto_delete_ports = context.session.query(
+                models_v2.Port).filter_by(network_id=id).filter(
+                models_v2.Port.device_owner.in_(AUTO_DELETE_PORT_OWNERS))
+            for port in auto_delete_ports:
+                context.session.delete(port)
 
             port_in_use = context.session.query(models_v2.Port).filter_by(
                 network_id=id).first()
@@ -1428,11 +1431,14 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                           port_id)
 
     def _delete_port(self, context, id):
-        query = (context.session.query(models_v2.Port).
-                 enable_eagerloads(False).filter_by(id=id))
+        query = context.session.query(models_v2.Port).filter_by(id=id)
         if not context.is_admin:
             query = query.filter_by(tenant_id=context.tenant_id)
-        query.delete()
+        # Delete through the ORM so that the quota usage of ports is kept up
+        # to date, eager loading what the delete cascades to
+        port = query.first()
+        if port:
+            context.session.delete(port)
 
     def get_port(self, context, id, fields=None):
         port = self._get_port(context, id)
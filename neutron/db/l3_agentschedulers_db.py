@@ -12,6 +12,9 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+
+import collections
+
 from oslo_config import cfg
 from oslo_db import exception as db_exc
 import oslo_messaging
@@ -48,6 +51,14 @@ L3_AGENTS_SCHEDULER_OPTS = [
     cfg.BoolOpt('allow_automatic_l3agent_failover', default=False,
                 help=_('Automatically reschedule routers from offline L3 '
                        'agents to online L3 agents.')),
+    cfg.ListOpt('l3_agent_weighers',
+                default=['routers', 'floating_ips', 'interfaces'],
+                help=_("Weighers rating the L3 agents on the load they "
+                       "report, used by the WeightedScheduler, as "
+                       "<weigher>[:<multiplier>] where <weigher> is the name "
+                       "of the reported counter or the import path of a "
+                       "weigher class. Negative multipliers prefer the most "
+                       "loaded agents.")),
 ]
 
 cfg.CONF.register_opts(L3_AGENTS_SCHEDULER_OPTS)
@@ -100,6 +111,7 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
             filter(sa.or_(l3_attrs_db.RouterExtraAttributes.ha == sql.false(),
                           l3_attrs_db.RouterExtraAttributes.ha == sql.null())))
         try:
+            router_ids = []
             for binding in down_bindings:
                 LOG.warn(_LW(
                     "Rescheduling router %(router)s from agent %(agent)s "
@@ -108,14 +120,9 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
                     {'router': binding.router_id,
                      'agent': binding.l3_agent_id,
                      'dead_time': agent_dead_limit})
-                try:
-                    self.reschedule_router(context, binding.router_id)
-                except (l3agentscheduler.RouterReschedulingFailed,
-                        oslo_messaging.RemoteError):
-                    # Catch individual router rescheduling errors here
-                    # so one broken one doesn't stop the iteration.
-                    LOG.exception(_LE("Failed to reschedule router %s"),
-                                  binding.router_id)
+                if binding.router_id not in router_ids:
+                    router_ids.append(binding.router_id)
+            self.reschedule_routers(context, router_ids)
         except db_exc.DBError:
             # Catch DB errors here so a transient DB connectivity issue
             # doesn't stop the loopingcall.
@@ -261,6 +268,83 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
             l3_notifier.router_added_to_agent(
                 context, [router_id], new_agent.host)
 
+    def reschedule_routers(self, context, router_ids):
+        """Reschedule many routers to new l3 agents.
+
+        Centralized, non HA routers are placed in a single pass by the
+        scheduler, their bindings are replaced in batches and each agent
+        receiving routers is notified once. The other routers, and those
+        of a batch which could not be applied, are rescheduled one at a
+        time.
+        """
+        if not router_ids:
+            return
+        routers = self.get_routers(context, filters={'id': router_ids})
+        centralized = [router for router in routers
+                       if not router.get('distributed') and
+                       not router.get('ha')]
+        placement = {}
+        if self.router_scheduler and centralized:
+            placement = self.router_scheduler.get_routers_placement(
+                self, context, centralized)
+        placed = [(router_id, placement[router_id])
+                  for router_id in router_ids if router_id in placement]
+        one_by_one = [router_id for router_id in router_ids
+                      if router_id not in placement]
+
+        l3_notifier = self.agent_notifiers.get(constants.AGENT_TYPE_L3)
+        added = collections.defaultdict(list)
+        batch_size = agentschedulers_db.RESCHEDULE_BATCH_SIZE
+        for i in range(0, len(placed), batch_size):
+            batch = placed[i:i + batch_size]
+            try:
+                removed = self._replace_router_bindings(context, batch)
+            except db_exc.DBError:
+                LOG.exception(_LE("Failed to reschedule %d routers at once, "
+                                  "rescheduling them one by one"),
+                              len(batch))
+                one_by_one.extend(router_id for router_id, agent in batch)
+                continue
+            for router_id, agent in batch:
+                added[agent.host].append(router_id)
+            if l3_notifier:
+                for router_id, host in removed:
+                    l3_notifier.router_removed_from_agent(
+                        context, router_id, host)
+        if l3_notifier:
+            for host, host_router_ids in added.items():
+                l3_notifier.router_added_to_agent(
+                    context, host_router_ids, host)
+
+        for router_id in one_by_one:
+            try:
+                self.reschedule_router(context, router_id)
+            except (l3agentscheduler.RouterReschedulingFailed,
+                    oslo_messaging.RemoteError):
+                # Catch individual router rescheduling errors here
+                # so one broken one doesn't stop the iteration.
+                LOG.exception(_LE("Failed to reschedule router %s"),
+                              router_id)
+
+    def _replace_router_bindings(self, context, placement):
+        """Bind routers to the agents chosen for them, in one transaction.
+
+        :param placement: (router id, new l3 agent) pairs.
+        :returns: (router id, host) pairs of the bindings removed.
+        """
+        router_ids = [router_id for router_id, agent in placement]
+        with context.session.begin(subtransactions=True):
+            query = context.session.query(RouterL3AgentBinding).options(
+                joinedload('l3_agent')).filter(
+                RouterL3AgentBinding.router_id.in_(router_ids))
+            removed = [(binding.router_id, binding.l3_agent.host)
+                       for binding in query]
+            query.delete(synchronize_session=False)
+            for router_id, agent in placement:
+                context.session.add(RouterL3AgentBinding(
+                    router_id=router_id, l3_agent_id=agent.id))
+        return removed
+
     def list_routers_on_l3_agent(self, context, agent_id):
         query = context.session.query(RouterL3AgentBinding.router_id)
         query = query.filter(RouterL3AgentBinding.l3_agent_id == agent_id)
@@ -351,7 +435,13 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
         query = query.filter(
             agents_db.Agent.agent_type == constants.AGENT_TYPE_L3)
         if active is not None:
-            query = (query.filter(agents_db.Agent.admin_state_up == active))
+            agent_ids = [
+                entry['id'] for entry in agents_db.agent_registry.get_agents(
+                    context, constants.AGENT_TYPE_L3, admin_state_up=active,
+                    alive=None)]
+            if not agent_ids:
+                return []
+            query = query.filter(agents_db.Agent.id.in_(agent_ids))
         if filters:
             for key, value in filters.iteritems():
                 column = getattr(agents_db.Agent, key, None)
@@ -470,6 +560,18 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
         for router in routers:
             self.schedule_router(context, router, candidates=None)
 
+    def get_l3_agents_router_count(self, context, agent_ids):
+        """Return the number of routers hosted by each of the l3 agents."""
+        counts = dict.fromkeys(agent_ids, 0)
+        if agent_ids:
+            query = context.session.query(
+                RouterL3AgentBinding.l3_agent_id,
+                func.count(RouterL3AgentBinding.router_id)).filter(
+                RouterL3AgentBinding.l3_agent_id.in_(agent_ids)).group_by(
+                RouterL3AgentBinding.l3_agent_id)
+            counts.update(query)
+        return counts
+
     def get_l3_agent_with_min_routers(self, context, agent_ids):
         """Return l3 agent with the least number of routers."""
         query = context.session.query(
@@ -0,0 +1,51 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""Add quota usages
+
+Revision ID: 8ccf6075494b
+Revises: bebba223288
+Create Date: 2015-03-02 11:24:51.172369
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '8ccf6075494b'
+down_revision = 'bebba223288'
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import sql
+
+
+def upgrade():
+    op.create_table(
+        'quotausages',
+        sa.Column('resource', sa.String(length=255), nullable=False),
+        sa.Column('tenant_id', sa.String(length=255), nullable=False),
+        sa.Column('dirty', sa.Boolean(), nullable=False,
+                  server_default=sql.false()),
+        sa.Column('in_use', sa.Integer(), nullable=False,
+                  server_default='0'),
+        sa.Column('generation', sa.Integer(), nullable=False,
+                  server_default='0'),
+        sa.PrimaryKeyConstraint('resource', 'tenant_id'))
+    op.create_index(op.f('ix_quotausages_tenant_id'), 'quotausages',
+                    ['tenant_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_quotausages_tenant_id'), table_name='quotausages')
+    op.drop_table('quotausages')
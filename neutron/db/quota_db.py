@@ -13,11 +13,18 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+
+from oslo_db import exception as db_exc
 import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy import orm
+from sqlalchemy import sql
 
 from neutron.common import exceptions
 from neutron.db import model_base
 from neutron.db import models_v2
+from neutron import quota as n_quota
 
 
 class Quota(model_base.BASEV2, models_v2.HasId):
@@ -31,6 +38,116 @@ class Quota(model_base.BASEV2, models_v2.HasId):
     limit = sa.Column(sa.Integer)
 
 
+class QuotaUsage(model_base.BASEV2):
+    """Represent the usage of a tracked resource by a tenant.
+
+    The usage is updated once the transactions creating and deleting the
+    resource commit. A missing or dirty record is resynced by counting, and
+    each resync increments the generation of the record.
+    """
+    resource = sa.Column(sa.String(255), primary_key=True)
+    tenant_id = sa.Column(sa.String(255), primary_key=True, index=True)
+    dirty = sa.Column(sa.Boolean, nullable=False,
+                      server_default=sql.false())
+    in_use = sa.Column(sa.Integer, nullable=False, server_default='0')
+    generation = sa.Column(sa.Integer, nullable=False, server_default='0')
+
+
+# Key of the session info holding the usage changes to apply on commit
+_PENDING_USAGES = 'quota_pending_usages'
+
+
+def _update_usages(session, flush_context, instances):
+    """Record the creation and deletion of tracked resources.
+
+    The usage records are not written in the transaction, which would lock
+    them until it ends and serialize the transactions of a tenant. Only
+    their generation is read, the first time a transaction changes them.
+    """
+    tracked = n_quota.QUOTAS.get_tracked_models()
+    if not tracked:
+        return
+    deltas = collections.Counter()
+    for obj in session.new:
+        resource = tracked.get(type(obj))
+        if resource:
+            deltas[resource, obj.tenant_id] += 1
+    for obj in session.deleted:
+        resource = tracked.get(type(obj))
+        if resource:
+            deltas[resource, obj.tenant_id] -= 1
+    pending = session.info.setdefault(_PENDING_USAGES, {})
+    usages = QuotaUsage.__table__
+    for (resource, tenant_id), delta in deltas.items():
+        if not delta or tenant_id is None:
+            continue
+        if (resource, tenant_id) not in pending:
+            generation = session.execute(
+                sa.select([usages.c.generation]).where(
+                    sa.and_(usages.c.resource == resource,
+                            usages.c.tenant_id == tenant_id))).scalar()
+            pending[resource, tenant_id] = [generation, 0]
+        pending[resource, tenant_id][1] += delta
+
+
+def _apply_pending_usages(session):
+    """Apply the usage changes of a committed transaction.
+
+    A change is applied only if the record was not resynced since the
+    transaction read its generation: a resync which counted after the
+    commit already accounts for it. Otherwise, or if there was no record,
+    the record is marked dirty to be resynced by the next quota check.
+    """
+    if session.transaction is not None and session.transaction.nested:
+        return
+    pending = session.info.pop(_PENDING_USAGES, None)
+    if not pending:
+        return
+    # The transaction of the session is over, use a new one
+    usages = QuotaUsage.__table__
+    with session.get_bind().begin() as conn:
+        # Sorted to lock the records in the same order in every worker
+        for (resource, tenant_id), (generation, delta) in sorted(
+                pending.items()):
+            if not delta:
+                continue
+            match = sa.and_(usages.c.resource == resource,
+                            usages.c.tenant_id == tenant_id)
+            if generation is not None and conn.execute(
+                    usages.update().where(
+                        sa.and_(match, usages.c.generation == generation)
+                    ).values(in_use=usages.c.in_use + delta)).rowcount:
+                continue
+            conn.execute(usages.update().where(match).values(dirty=True))
+
+
+def _forget_pending_usages(session):
+    session.info.pop(_PENDING_USAGES, None)
+
+
+def _mark_usages_dirty(delete_context):
+    """Mark the usages of a resource deleted in bulk as dirty.
+
+    The tenants of the deleted rows are not known here.
+    """
+    model_class = delete_context.query.column_descriptions[0]['type']
+    resource = n_quota.QUOTAS.get_tracked_models().get(model_class)
+    if resource and delete_context.result.rowcount:
+        delete_context.session.query(QuotaUsage).filter_by(
+            resource=resource).update({'dirty': True},
+                                      synchronize_session=False)
+
+
+def register_usage_tracking():
+    """Keep the usages of tracked resources up to date in all sessions."""
+    if event.contains(orm.Session, 'before_flush', _update_usages):
+        return
+    event.listen(orm.Session, 'before_flush', _update_usages)
+    event.listen(orm.Session, 'after_bulk_delete', _mark_usages_dirty)
+    event.listen(orm.Session, 'after_commit', _apply_pending_usages)
+    event.listen(orm.Session, 'after_rollback', _forget_pending_usages)
+
+
 class DbQuotaDriver(object):
     """Driver to perform necessary checks to enforce quotas and obtain quota
     information.
@@ -38,6 +155,11 @@ class DbQuotaDriver(object):
     The default driver utilizes the local database.
     """
 
+    @staticmethod
+    def track_usages():
+        """Start keeping the usage records of tracked resources."""
+        register_usage_tracking()
+
     @staticmethod
     def get_tenant_quotas(context, resources, tenant_id):
         """Given a list of resources, retrieve the quotas for the given
@@ -64,11 +186,15 @@ class DbQuotaDriver(object):
         """Delete the quota entries for a given tenant_id.
 
         Atfer deletion, this tenant will use default quota values in conf.
+        The usages of the tenant are resynced on the next quota check.
         """
         with context.session.begin():
             tenant_quotas = context.session.query(Quota)
             tenant_quotas = tenant_quotas.filter_by(tenant_id=tenant_id)
             tenant_quotas.delete()
+            context.session.query(QuotaUsage).filter_by(
+                tenant_id=tenant_id).update({'dirty': True},
+                                            synchronize_session=False)
 
     @staticmethod
     def get_all_quotas(context, resources):
@@ -112,6 +238,53 @@ class DbQuotaDriver(object):
                                      limit=limit)
                 context.session.add(tenant_quota)
 
+    @staticmethod
+    def get_resource_usage(context, resource, plugin, collection, tenant_id):
+        """Return the usage of a tracked resource by a tenant.
+
+        The usage record is read, and resynced with the counting function
+        of the resource only when it is missing or dirty.
+
+        :param context: The request context, for access checks.
+        :param resource: The TrackedResource to return the usage of.
+        :param plugin: The plugin of the resource, to count it.
+        :param collection: The name of the resource collection.
+        :param tenant_id: The ID of the tenant to return the usage for.
+        """
+        query = context.session.query(QuotaUsage).filter_by(
+            resource=resource.name, tenant_id=tenant_id)
+        usage = query.first()
+        if usage and not usage.dirty:
+            return usage.in_use
+        if not usage:
+            # Create the record first, so that the transactions creating
+            # or deleting the resource from now on update it
+            DbQuotaDriver._create_dirty_usage(context, resource.name,
+                                              tenant_id)
+        with context.session.begin(subtransactions=True):
+            # Concurrent resyncs are serialized by the lock of the record.
+            # The transactions which read the previous generation may have
+            # been counted already, they mark the record dirty instead of
+            # updating it.
+            usage = query.with_lockmode('update').one()
+            in_use = resource.count(context, plugin, collection, tenant_id)
+            usage.update({'in_use': in_use, 'dirty': False,
+                          'generation': usage.generation + 1})
+        return in_use
+
+    @staticmethod
+    def _create_dirty_usage(context, resource, tenant_id):
+        # The record is created in its own transaction
+        usages = QuotaUsage.__table__
+        try:
+            with context.session.get_bind().begin() as conn:
+                conn.execute(usages.insert().values(
+                    resource=resource, tenant_id=tenant_id,
+                    dirty=True, in_use=0))
+        except db_exc.DBDuplicateEntry:
+            # Concurrently created
+            pass
+
     def _get_quotas(self, context, tenant_id, resources, keys):
         """Retrieves the quotas for specific resources.
 
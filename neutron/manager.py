@@ -24,6 +24,7 @@ from neutron.i18n import _LE, _LI
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import periodic_task
 from neutron.plugins.common import constants
+from neutron import quota
 
 from stevedore import driver
 
@@ -119,6 +120,9 @@ class NeutronManager(object):
         if msg:
             LOG.critical(msg)
             raise Exception(msg)
+        # The quota driver depends on the plugin. Load it now so that a
+        # driver tracking resource usages does so in every worker.
+        quota.QUOTAS.get_driver()
 
         # core plugin as a part of plugin collection simplifies
         # checking extensions
@@ -56,12 +56,27 @@ restproxy_opts = [
                        "the backend controller doesn't know of a dependency, "
                        "the plugin automatically triggers a full data "
                        "synchronization to the controller.")),
+    cfg.BoolOpt('incremental_sync', default=True,
+                help=_("When the plugin synchronizes the backend controller "
+                       "after an inconsistency, only send the resources "
+                       "that changed since the last synchronization. The "
+                       "full topology is sent if there is no previous "
+                       "synchronization to compare with or if the "
+                       "incremental one fails.")),
+    cfg.IntOpt('sync_page_size', default=500,
+               help=_("Number of networks or routers read from the database "
+                      "at once when building a synchronization.")),
     cfg.IntOpt('consistency_interval', default=60,
                help=_("Time between verifications that the backend controller "
                       "database is consistent with Neutron. (0 to disable)")),
     cfg.IntOpt('server_timeout', default=10,
                help=_("Maximum number of seconds to wait for proxy request "
                       "to connect and complete.")),
+    cfg.IntOpt('server_connection_pool_size', default=16,
+               help=_("Maximum number of connections open at the same time "
+                      "to each controller. Idle connections are kept for "
+                      "re-use when cache_connections is enabled and the "
+                      "controller supports keep-alive.")),
     cfg.IntOpt('thread_pool_size', default=4,
                help=_("Maximum number of threads to spawn to handle large "
                       "volumes of port creations.")),
@@ -40,6 +40,7 @@ subset) with some additional parameters (gateway on network-create and macaddr
 on port-attach) on an additional PUT to do a bulk dump of all persistent data.
 """
 
+import collections
 import copy
 import functools
 import httplib
@@ -167,27 +168,13 @@ class NeutronRestProxyV2Base(db_base_plugin_v2.NeutronDbPluginV2,
         plugin = manager.NeutronManager.get_plugin()
         all_networks = plugin.get_networks(admin_context) or []
         for net in all_networks:
-            mapped_network = self._get_mapped_network_with_subnets(net)
-            flips_n_ports = mapped_network
-            if get_floating_ips:
-                flips_n_ports = self._get_network_with_floatingips(
-                    mapped_network)
-
+            net_ports = None
             if get_ports:
-                ports = []
                 net_filter = {'network_id': [net.get('id')]}
                 net_ports = plugin.get_ports(admin_context,
                                              filters=net_filter) or []
-                for port in net_ports:
-                    mapped_port = self._map_state_and_status(port)
-                    mapped_port['attachment'] = {
-                        'id': port.get('device_id'),
-                        'mac': port.get('mac_address'),
-                    }
-                    mapped_port = self._extend_port_dict_binding(admin_context,
-                                                                 mapped_port)
-                    ports.append(mapped_port)
-                flips_n_ports['ports'] = ports
+            flips_n_ports = self._get_topology_network(
+                admin_context, net, net_ports, get_floating_ips)
 
             if flips_n_ports:
                 networks.append(flips_n_ports)
@@ -198,28 +185,58 @@ class NeutronRestProxyV2Base(db_base_plugin_v2.NeutronDbPluginV2,
             routers = []
             all_routers = self.l3_plugin.get_routers(admin_context) or []
             for router in all_routers:
-                interfaces = []
-                mapped_router = self._map_state_and_status(router)
                 router_filter = {
                     'device_owner': [const.DEVICE_OWNER_ROUTER_INTF],
                     'device_id': [router.get('id')]
                 }
                 router_ports = self.get_ports(admin_context,
                                               filters=router_filter) or []
-                for port in router_ports:
-                    net_id = port.get('network_id')
-                    subnet_id = port['fixed_ips'][0]['subnet_id']
-                    intf_details = self._get_router_intf_details(admin_context,
-                                                                 net_id,
-                                                                 subnet_id)
-                    interfaces.append(intf_details)
-                mapped_router['interfaces'] = interfaces
-
-                routers.append(mapped_router)
+                routers.append(self._get_topology_router(
+                    admin_context, router, router_ports))
 
             data.update({'routers': routers})
         return data
 
+    def _get_topology_network(self, admin_context, net, ports=None,
+                              get_floating_ips=True):
+        """Return a network as sent in a topology sync.
+
+        Ports are left out when ports is None.
+        """
+        mapped_network = self._get_mapped_network_with_subnets(net)
+        flips_n_ports = mapped_network
+        if get_floating_ips:
+            flips_n_ports = self._get_network_with_floatingips(
+                mapped_network)
+
+        if ports is not None:
+            mapped_ports = []
+            for port in ports:
+                mapped_port = self._map_state_and_status(port)
+                mapped_port['attachment'] = {
+                    'id': port.get('device_id'),
+                    'mac': port.get('mac_address'),
+                }
+                mapped_port = self._extend_port_dict_binding(admin_context,
+                                                             mapped_port)
+                mapped_ports.append(mapped_port)
+            flips_n_ports['ports'] = mapped_ports
+        return flips_n_ports
+
+    def _get_topology_router(self, admin_context, router, router_ports):
+        """Return a router and its interfaces as sent in a topology sync."""
+        interfaces = []
+        mapped_router = self._map_state_and_status(router)
+        for port in router_ports:
+            net_id = port.get('network_id')
+            subnet_id = port['fixed_ips'][0]['subnet_id']
+            intf_details = self._get_router_intf_details(admin_context,
+                                                         net_id,
+                                                         subnet_id)
+            interfaces.append(intf_details)
+        mapped_router['interfaces'] = interfaces
+        return mapped_router
+
     def _send_all_data(self, send_ports=True, send_floating_ips=True,
                        send_routers=True, timeout=None,
                        triggered_by_tenant=None):
@@ -231,8 +248,105 @@ class NeutronRestProxyV2Base(db_base_plugin_v2.NeutronDbPluginV2,
         data = self._get_all_data(send_ports, send_floating_ips, send_routers)
         data['triggered_by_tenant'] = triggered_by_tenant
         errstr = _("Unable to update remote topology: %s")
-        return self.servers.rest_action('PUT', servermanager.TOPOLOGY_PATH,
+        resp = self.servers.rest_action('PUT', servermanager.TOPOLOGY_PATH,
                                         data, errstr, timeout=timeout)
+        self.servers.synced_resources = self.servers.get_topo_baseline(data)
+        return resp
+
+    def _sync_topology(self, triggered_by_tenant=None, stale_path=None):
+        """Bring the backend controller back in sync with neutron.
+
+        Only the resources that changed since the last synchronization are
+        sent. The full topology is sent as a last resort, when there is no
+        previous synchronization or when the delta one fails.
+
+        The record of the last synchronization is kept in memory by each
+        neutron server process. With several API workers, a worker only
+        sends deltas once it has pushed the full topology itself.
+
+        :param stale_path: path of a resource the backend reported missing.
+            It is sent again along with its children.
+        """
+        topoargs = self.servers.get_topo_function_args
+        if (cfg.CONF.RESTPROXY.incremental_sync and
+                self.servers.synced_resources is not None):
+            if stale_path:
+                self.servers.forget_synced_resources(stale_path)
+            try:
+                sent = self.servers.sync_topology_delta(
+                    self._get_topology_resources(**topoargs))
+                LOG.info(_LI("Incremental topology sync sent %d resources"),
+                         sent)
+                return
+            except servermanager.RemoteRestError:
+                LOG.exception(_LE("Incremental topology sync failed, "
+                                  "sending the full topology."))
+        self._send_all_data(
+            send_ports=topoargs['get_ports'],
+            send_floating_ips=topoargs['get_floating_ips'],
+            send_routers=topoargs['get_routers'],
+            triggered_by_tenant=triggered_by_tenant
+        )
+
+    def _get_pages(self, get_resources, context, **kwargs):
+        page_size = cfg.CONF.RESTPROXY.sync_page_size
+        marker = None
+        while True:
+            page = get_resources(context, sorts=[('id', True)],
+                                 limit=page_size, marker=marker,
+                                 **kwargs) or []
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            marker = page[-1]['id']
+
+    def _get_topology_resources(self, get_ports=True, get_floating_ips=True,
+                                get_routers=True):
+        """Yield the TopologyResources of the topology sent to the backend.
+
+        This is the data of _get_all_data read from the database page by
+        page, split into the resources of the per-object REST calls.
+        Parents are yielded before their children.
+        """
+        admin_context = qcontext.get_admin_context()
+        # this method is used by the ML2 driver so it can't directly invoke
+        # the self.get_(ports|networks) methods
+        plugin = manager.NeutronManager.get_plugin()
+        for networks in self._get_pages(plugin.get_networks, admin_context):
+            net_ports = collections.defaultdict(list)
+            if get_ports:
+                net_filter = {'network_id': [net['id'] for net in networks]}
+                for port in plugin.get_ports(admin_context,
+                                             filters=net_filter) or []:
+                    net_ports[port['network_id']].append(port)
+            page = [self._get_topology_network(
+                        admin_context, net,
+                        net_ports[net['id']] if get_ports else None,
+                        get_floating_ips)
+                    for net in networks]
+            for resource in servermanager.get_topology_resources(
+                    {'networks': page}):
+                yield resource
+
+        if not get_routers or not self.l3_plugin:
+            return
+        for routers in self._get_pages(self.l3_plugin.get_routers,
+                                       admin_context):
+            router_filter = {
+                'device_owner': [const.DEVICE_OWNER_ROUTER_INTF],
+                'device_id': [router['id'] for router in routers]
+            }
+            router_ports = collections.defaultdict(list)
+            for port in plugin.get_ports(admin_context,
+                                         filters=router_filter) or []:
+                router_ports[port['device_id']].append(port)
+            page = [self._get_topology_router(admin_context, router,
+                                              router_ports[router['id']])
+                    for router in routers]
+            for resource in servermanager.get_topology_resources(
+                    {'routers': page}):
+                yield resource
 
     def _get_network_with_floatingips(self, network, context=None):
         if context is None:
@@ -396,17 +510,12 @@ class NeutronRestProxyV2Base(db_base_plugin_v2.NeutronDbPluginV2,
                 e.status == httplib.NOT_FOUND and
                 servermanager.NXNETWORK in e.reason):
                 LOG.error(_LE("Iconsistency with backend controller "
-                              "triggering full synchronization."))
-                # args depend on if we are operating in ML2 driver
-                # or as the full plugin
-                topoargs = self.servers.get_topo_function_args
-                self._send_all_data(
-                    send_ports=topoargs['get_ports'],
-                    send_floating_ips=topoargs['get_floating_ips'],
-                    send_routers=topoargs['get_routers'],
-                    triggered_by_tenant=tenant_id
-                )
-                # If the full sync worked, the port will be created
+                              "triggering synchronization."))
+                self._sync_topology(
+                    triggered_by_tenant=tenant_id,
+                    stale_path=servermanager.NETWORKS_PATH % (tenant_id,
+                                                              net_id))
+                # If the sync worked, the port will be created
                 # on the controller so it can be safely marked as active
             else:
                 # Any errors that don't result in a successful auto-sync
@@ -486,6 +595,8 @@ class NeutronRestProxyV2(NeutronRestProxyV2Base,
         # init network ctrl connections
         self.servers = servermanager.ServerPool()
         self.servers.get_topo_function = self._get_all_data
+        self.servers.get_topo_resources_function = (
+            self._get_topology_resources)
         self.servers.get_topo_function_args = {'get_ports': True,
                                                'get_floating_ips': True,
                                                'get_routers': True}
@@ -27,6 +27,8 @@ The following functionality is handled by this module:
 
 """
 import base64
+import collections
+import hashlib
 import httplib
 import os
 import socket
@@ -36,6 +38,7 @@ import weakref
 
 import eventlet
 import eventlet.corolocal
+import eventlet.semaphore
 from oslo_config import cfg
 from oslo_serialization import jsonutils
 from oslo_utils import excutils
@@ -86,11 +89,69 @@ class RemoteRestError(exceptions.NeutronException):
         super(RemoteRestError, self).__init__(**kwargs)
 
 
+class TopologyResource(object):
+    """A backend resource sent individually by a delta topology sync."""
+
+    def __init__(self, path, data, create_path=None, update_by_create=False):
+        # path used to update and delete the resource
+        self.path = path
+        self.data = data
+        # collection the resource is POSTed to when the backend does not
+        # have it yet, or None if it is created with a PUT on path
+        self.create_path = create_path
+        # resources without an update operation are created again
+        self.update_by_create = update_by_create
+
+    @property
+    def digest(self):
+        return hashlib.sha1(jsonutils.dumps(self.data,
+                                            sort_keys=True)).hexdigest()
+
+
+def get_topology_resources(topology):
+    """Split a topology into the TopologyResources of its objects.
+
+    The topology has the format of the full topology sync. Parents are
+    yielded before their children.
+    """
+    for network in topology.get('networks', []):
+        network = dict(network)
+        ports = network.pop('ports', [])
+        tenant_id = network['tenant_id']
+        yield TopologyResource(
+            NETWORKS_PATH % (tenant_id, network['id']),
+            {'network': network},
+            create_path=NET_RESOURCE_PATH % tenant_id)
+        for port in ports:
+            # controller only cares about ports attached to devices
+            if not port.get('mac_address') or not port.get('device_id'):
+                continue
+            port = dict(port)
+            attachment = port.pop('attachment')
+            yield TopologyResource(
+                ATTACHMENT_PATH % (tenant_id, network['id'], port['id']),
+                {'port': port, 'attachment': attachment})
+    for router in topology.get('routers', []):
+        router = dict(router)
+        interfaces = router.pop('interfaces', [])
+        tenant_id = router['tenant_id']
+        yield TopologyResource(
+            ROUTERS_PATH % (tenant_id, router['id']),
+            {'router': router},
+            create_path=ROUTER_RESOURCE_PATH % tenant_id)
+        for intf in interfaces:
+            yield TopologyResource(
+                ROUTER_INTF_PATH % (tenant_id, router['id'], intf['id']),
+                {'interface': intf},
+                create_path=ROUTER_INTF_OP_PATH % (tenant_id, router['id']),
+                update_by_create=True)
+
+
 class ServerProxy(object):
     """REST server proxy to a network controller."""
 
     def __init__(self, server, port, ssl, auth, neutron_id, timeout,
-                 base_uri, name, mypool, combined_cert):
+                 base_uri, name, mypool, combined_cert, pool_size=1):
         self.server = server
         self.port = port
         self.ssl = ssl
@@ -104,8 +165,11 @@ class ServerProxy(object):
         self.capabilities = []
         # enable server to reference parent pool
         self.mypool = mypool
-        # cache connection here to avoid a SSL handshake for every connection
-        self.currentconn = None
+        # cache idle connections here to avoid a SSL handshake for every
+        # request, and bound the number of connections open concurrently
+        # by the API greenthreads
+        self.idle_connections = collections.deque()
+        self.connection_slots = eventlet.semaphore.Semaphore(pool_size)
         if auth:
             self.auth = 'Basic ' + base64.encodestring(auth).strip()
         self.combined_cert = combined_cert
@@ -122,6 +186,50 @@ class ServerProxy(object):
                                                   'cap': self.capabilities})
         return self.capabilities
 
+    def _new_connection(self, timeout):
+        if self.ssl:
+            conn = HTTPSConnectionWithValidation(
+                self.server, self.port, timeout=timeout)
+            if conn is None:
+                LOG.error(_LE('ServerProxy: Could not establish HTTPS '
+                              'connection'))
+                return None
+            conn.combined_cert = self.combined_cert
+        else:
+            conn = httplib.HTTPConnection(
+                self.server, self.port, timeout=timeout)
+            if conn is None:
+                LOG.error(_LE('ServerProxy: Could not establish HTTP '
+                              'connection'))
+                return None
+        return conn
+
+    def _get_connection(self, timeout, reconnect):
+        """Take a connection slot and return a connection to use in it.
+
+        An idle connection is re-used unless a fresh one is required. The
+        slot is released if no connection could be created.
+        """
+        self.connection_slots.acquire()
+        if not reconnect and self.idle_connections:
+            return self.idle_connections.pop()
+        conn = self._new_connection(timeout)
+        if conn is None:
+            self.connection_slots.release()
+        return conn
+
+    def _put_connection(self, conn, reuse):
+        if reuse:
+            self.idle_connections.append(conn)
+        else:
+            conn.close()
+        self.connection_slots.release()
+
+    def close_idle_connections(self):
+        """Close the cached connections, e.g. after a server failure."""
+        while self.idle_connections:
+            self.idle_connections.pop().close()
+
     def rest_call(self, action, resource, data='', headers=None,
                   timeout=False, reconnect=False, hash_handler=None):
         uri = self.base_uri + resource
@@ -132,12 +240,10 @@ class ServerProxy(object):
         headers['NeutronProxy-Agent'] = self.name
         headers['Instance-ID'] = self.neutron_id
         headers['Orchestration-Service-ID'] = ORCHESTRATION_SERVICE_ID
-        if hash_handler:
-            # this will be excluded on calls that don't need hashes
-            # (e.g. topology sync, capability checks)
-            headers[HASH_MATCH_HEADER] = hash_handler.read_for_update()
-        else:
-            hash_handler = cdb.HashHandler()
+        # the hash is excluded on calls that don't need it (e.g. topology
+        # sync, capability checks), but the hash they return is still stored
+        request_hash_handler = hash_handler
+        hash_handler = hash_handler or cdb.HashHandler()
         if 'keep-alive' in self.capabilities:
             headers['Connection'] = 'keep-alive'
         else:
@@ -162,30 +268,19 @@ class ServerProxy(object):
             # need a new connection if timeout has changed
             reconnect = True
 
-        if not self.currentconn or reconnect:
-            if self.currentconn:
-                self.currentconn.close()
-            if self.ssl:
-                self.currentconn = HTTPSConnectionWithValidation(
-                    self.server, self.port, timeout=timeout)
-                if self.currentconn is None:
-                    LOG.error(_LE('ServerProxy: Could not establish HTTPS '
-                                  'connection'))
-                    return 0, None, None, None
-                self.currentconn.combined_cert = self.combined_cert
-            else:
-                self.currentconn = httplib.HTTPConnection(
-                    self.server, self.port, timeout=timeout)
-                if self.currentconn is None:
-                    LOG.error(_LE('ServerProxy: Could not establish HTTP '
-                                  'connection'))
-                    return 0, None, None, None
+        conn = self._get_connection(timeout, reconnect)
+        if conn is None:
+            return 0, None, None, None
 
+        reuse = False
         try:
-            self.currentconn.request(action, uri, body, headers)
-            response = self.currentconn.getresponse()
-            respstr = response.read()
-            respdata = respstr
+            if request_hash_handler:
+                # Take the consistency lock only once the connection is
+                # ready, and release it as soon as the response headers
+                # carrying the new hash are received.
+                headers[HASH_MATCH_HEADER] = hash_handler.read_for_update()
+            conn.request(action, uri, body, headers)
+            response = conn.getresponse()
             if response.status in self.success_codes:
                 hash_value = response.getheader(HASH_MATCH_HEADER)
                 # don't clear hash from DB if a hash header wasn't present
@@ -193,20 +288,24 @@ class ServerProxy(object):
                     hash_handler.put_hash(hash_value)
                 else:
                     hash_handler.clear_lock()
+            else:
+                # release lock so others don't have to wait for timeout
+                hash_handler.clear_lock()
+            respstr = response.read()
+            respdata = respstr
+            if response.status in self.success_codes:
                 try:
                     respdata = jsonutils.loads(respstr)
                 except ValueError:
                     # response was not JSON, ignore the exception
                     pass
-            else:
-                # release lock so others don't have to wait for timeout
-                hash_handler.clear_lock()
 
             ret = (response.status, response.reason, respstr, respdata)
+            reuse = not reconnect
         except httplib.HTTPException:
             # If we were using a cached connection, try again with a new one.
             with excutils.save_and_reraise_exception() as ctxt:
-                self.currentconn.close()
+                self._put_connection(conn, reuse)
                 if reconnect:
                     # if reconnect is true, this was on a fresh connection so
                     # reraise since this server seems to be broken
@@ -216,12 +315,22 @@ class ServerProxy(object):
                     # try one more time before re-raising
                     ctxt.reraise = False
             return self.rest_call(action, resource, data, headers,
-                                  timeout=timeout, reconnect=True)
+                                  timeout=timeout, reconnect=True,
+                                  hash_handler=request_hash_handler)
         except (socket.timeout, socket.error) as e:
-            self.currentconn.close()
+            self._put_connection(conn, reuse)
+            # release lock so others don't have to wait for timeout
+            hash_handler.clear_lock()
+            # the other cached connections are likely broken as well
+            self.close_idle_connections()
             LOG.error(_LE('ServerProxy: %(action)s failure, %(e)r'),
                       {'action': action, 'e': e})
             ret = 0, None, None, None
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                self._put_connection(conn, reuse)
+        else:
+            self._put_connection(conn, reuse)
         LOG.debug("ServerProxy: status=%(status)d, reason=%(reason)r, "
                   "ret=%(ret)s, data=%(data)r", {'status': ret[0],
                                                  'reason': ret[1],
@@ -256,6 +365,8 @@ class ServerPool(object):
         self.contexts = {}
         self.timeout = cfg.CONF.RESTPROXY.server_timeout
         self.always_reconnect = not cfg.CONF.RESTPROXY.cache_connections
+        self.connection_pool_size = (
+            cfg.CONF.RESTPROXY.server_connection_pool_size)
         default_port = 8000
         if timeout is not False:
             self.timeout = timeout
@@ -264,6 +375,14 @@ class ServerPool(object):
         # Needs to be set by module that uses the servermanager.
         self.get_topo_function = None
         self.get_topo_function_args = {}
+        # Function returning the TopologyResources of the topology, called
+        # with get_topo_function_args. Needed for delta syncs.
+        self.get_topo_resources_function = None
+        # Digests of the resources the backend acknowledged, keyed by their
+        # path. The digest is None for resources written by API calls since
+        # the last sync. None until a full sync provides a baseline. This is
+        # per process, so each API worker needs its own full sync first.
+        self.synced_resources = None
 
         if not servers:
             raise cfg.Error(_('Servers not defined. Aborting server manager.'))
@@ -318,7 +437,8 @@ class ServerPool(object):
         combined_cert = self._get_combined_cert_for_server(server, port)
         return ServerProxy(server, port, self.ssl, self.auth, self.neutron_id,
                            self.timeout, self.base_uri, self.name, mypool=self,
-                           combined_cert=combined_cert)
+                           combined_cert=combined_cert,
+                           pool_size=self.connection_pool_size)
 
     def _get_combined_cert_for_server(self, server, port):
         # The ssl library requires a combined file with all trusted certs
@@ -448,14 +568,19 @@ class ServerPool(object):
                     break
                 time.sleep(HTTP_SERVICE_UNAVAILABLE_RETRY_INTERVAL)
 
-            # If inconsistent, do a full synchronization
+            # If inconsistent, do a full synchronization. The backend state
+            # diverged from this process' record of it in unknown ways (e.g.
+            # changes through another server), so no delta sync is used.
             if ret[0] == httplib.CONFLICT:
                 if not self.get_topo_function:
                     raise cfg.Error(_('Server requires synchronization, '
                                       'but no topology function was defined.'))
                 data = self.get_topo_function(**self.get_topo_function_args)
-                active_server.rest_call('PUT', TOPOLOGY_PATH, data,
-                                        timeout=None)
+                resp = active_server.rest_call('PUT', TOPOLOGY_PATH, data,
+                                               timeout=None)
+                self.synced_resources = (self.get_topo_baseline(data)
+                                         if self.action_success(resp)
+                                         else None)
             # Store the first response as the error to be bubbled up to the
             # user since it was a good server. Subsequent servers will most
             # likely be cluster slaves and won't have a useful error for the
@@ -477,6 +602,7 @@ class ServerPool(object):
                           {'status': ret[0], 'reason': ret[1], 'ret': ret[2],
                            'data': ret[3]})
                 active_server.failed = True
+                active_server.close_idle_connections()
 
         # A failure on a delete means the object is gone from Neutron but not
         # from the controller. Set the consistency hash to a bad value to
@@ -518,50 +644,136 @@ class ServerPool(object):
                       'resource': resource})
         return resp
 
+    def get_topo_baseline(self, topology):
+        """Return the digests of the resources of a full topology.
+
+        The result becomes synced_resources once the topology is pushed.
+        """
+        if (not cfg.CONF.RESTPROXY.incremental_sync or
+                not self.get_topo_resources_function):
+            return None
+        return dict((resource.path, resource.digest)
+                    for resource in get_topology_resources(topology))
+
+    def _mark_synced(self, path):
+        # the backend has the resource, but its digest is unknown
+        if self.synced_resources is not None:
+            self.synced_resources[path] = None
+
+    def _forget_synced(self, path):
+        if self.synced_resources is not None:
+            self.synced_resources.pop(path, None)
+
+    def forget_synced_resources(self, path):
+        """Forget a resource and its children so delta syncs resend them."""
+        if self.synced_resources is None:
+            return
+        for synced_path in list(self.synced_resources):
+            if synced_path == path or synced_path.startswith(path + '/'):
+                del self.synced_resources[synced_path]
+
+    def sync_topology_delta(self, resources):
+        """Send the resources that changed since the last sync.
+
+        Resources are created, updated or deleted one by one when their
+        digest differs from synced_resources. Parents must be listed before
+        their children. A RemoteRestError is raised on the first failure.
+
+        :returns: the number of requests sent to the backend.
+        """
+        if self.synced_resources is None:
+            raise ValueError(_('No baseline for a delta topology sync.'))
+        errstr = _("Unable to sync remote topology: %s")
+        # Resources created or updated by concurrent API calls while the
+        # topology is read may be missing from it: only the resources known
+        # beforehand, and left untouched since then, may be deleted.
+        known = dict(self.synced_resources)
+        seen = set()
+        sent = 0
+        for resource in resources:
+            seen.add(resource.path)
+            digest = resource.digest
+            if resource.path not in self.synced_resources:
+                if resource.create_path:
+                    self.rest_action('POST', resource.create_path,
+                                     resource.data, errstr)
+                else:
+                    self.rest_action('PUT', resource.path, resource.data,
+                                     errstr)
+            elif self.synced_resources[resource.path] != digest:
+                if resource.update_by_create:
+                    self.rest_action('POST', resource.create_path,
+                                     resource.data, errstr)
+                else:
+                    self.rest_action('PUT', resource.path, resource.data,
+                                     errstr)
+            else:
+                continue
+            self.synced_resources[resource.path] = digest
+            sent += 1
+        # children have longer paths, delete them before their parents
+        for path in sorted(set(known) - seen, key=len, reverse=True):
+            if (path not in self.synced_resources or
+                    self.synced_resources[path] != known[path]):
+                continue
+            self.rest_action('DELETE', path, errstr=errstr)
+            self._forget_synced(path)
+            sent += 1
+        return sent
+
     def rest_create_router(self, tenant_id, router):
         resource = ROUTER_RESOURCE_PATH % tenant_id
         data = {"router": router}
         errstr = _("Unable to create remote router: %s")
         self.rest_action('POST', resource, data, errstr)
+        self._mark_synced(ROUTERS_PATH % (tenant_id, router['id']))
 
     def rest_update_router(self, tenant_id, router, router_id):
         resource = ROUTERS_PATH % (tenant_id, router_id)
         data = {"router": router}
         errstr = _("Unable to update remote router: %s")
         self.rest_action('PUT', resource, data, errstr)
+        self._mark_synced(resource)
 
     def rest_delete_router(self, tenant_id, router_id):
         resource = ROUTERS_PATH % (tenant_id, router_id)
         errstr = _("Unable to delete remote router: %s")
         self.rest_action('DELETE', resource, errstr=errstr)
+        self.forget_synced_resources(resource)
 
     def rest_add_router_interface(self, tenant_id, router_id, intf_details):
         resource = ROUTER_INTF_OP_PATH % (tenant_id, router_id)
         data = {"interface": intf_details}
         errstr = _("Unable to add router interface: %s")
         self.rest_action('POST', resource, data, errstr)
+        self._mark_synced(ROUTER_INTF_PATH % (tenant_id, router_id,
+                                              intf_details['id']))
 
     def rest_remove_router_interface(self, tenant_id, router_id, interface_id):
         resource = ROUTER_INTF_PATH % (tenant_id, router_id, interface_id)
         errstr = _("Unable to delete remote intf: %s")
         self.rest_action('DELETE', resource, errstr=errstr)
+        self._forget_synced(resource)
 
     def rest_create_network(self, tenant_id, network):
         resource = NET_RESOURCE_PATH % tenant_id
         data = {"network": network}
         errstr = _("Unable to create remote network: %s")
         self.rest_action('POST', resource, data, errstr)
+        self._mark_synced(NETWORKS_PATH % (tenant_id, network['id']))
 
     def rest_update_network(self, tenant_id, net_id, network):
         resource = NETWORKS_PATH % (tenant_id, net_id)
         data = {"network": network}
         errstr = _("Unable to update remote network: %s")
         self.rest_action('PUT', resource, data, errstr)
+        self._mark_synced(resource)
 
     def rest_delete_network(self, tenant_id, net_id):
         resource = NETWORKS_PATH % (tenant_id, net_id)
         errstr = _("Unable to update remote network: %s")
         self.rest_action('DELETE', resource, errstr=errstr)
+        self.forget_synced_resources(resource)
 
     def rest_create_port(self, tenant_id, net_id, port):
         resource = ATTACHMENT_PATH % (tenant_id, net_id, port["id"])
@@ -577,11 +789,13 @@ class ServerPool(object):
                               "mac": port["mac_address"]}
         errstr = _("Unable to create remote port: %s")
         self.rest_action('PUT', resource, data, errstr)
+        self._mark_synced(resource)
 
     def rest_delete_port(self, tenant_id, network_id, port_id):
         resource = ATTACHMENT_PATH % (tenant_id, network_id, port_id)
         errstr = _("Unable to delete remote port: %s")
         self.rest_action('DELETE', resource, errstr=errstr)
+        self._forget_synced(resource)
 
     def rest_update_port(self, tenant_id, net_id, port):
         # Controller has no update operation for the port endpoint
@@ -32,6 +32,7 @@ from six import moves
 
 from neutron.agent import l2population_rpc as l2pop_rpc
 from neutron.agent.linux import ip_lib
+from neutron.agent.linux import ip_monitor
 from neutron.agent.linux import utils
 from neutron.agent import rpc as agent_rpc
 from neutron.agent import securitygroups_rpc as sg_rpc
@@ -631,6 +632,88 @@ class LinuxBridgeManager(object):
             elif self.vxlan_mode == lconst.VXLAN_UCAST:
                 self.remove_fdb_bridge_entry(mac, agent_ip, interface)
 
+    def get_fdb_bridge_entries(self, interface):
+        """Return the (mac, dst) pairs of the FDB of interface."""
+        output = utils.execute(['bridge', 'fdb', 'show', 'dev', interface],
+                               root_helper=self.root_helper)
+        entries = set()
+        for line in output.splitlines():
+            fields = line.split()
+            if len(fields) > 2 and fields[1] == 'dst':
+                entries.add((fields[0].lower(), fields[2]))
+        return entries
+
+    def get_fdb_ip_entries(self, interface):
+        """Return the (mac, ip) pairs of the neighbours of interface."""
+        output = utils.execute(['ip', 'neigh', 'show', 'dev', interface],
+                               root_helper=self.root_helper)
+        entries = set()
+        for line in output.splitlines():
+            fields = line.split()
+            if 'lladdr' in fields[1:-1]:
+                mac = fields[fields.index('lladdr') + 1]
+                entries.add((mac.lower(), fields[0]))
+        return entries
+
+    def _execute_batch(self, cmd, batch):
+        if batch:
+            utils.execute([cmd, '-force', '-batch', '-'],
+                          root_helper=self.root_helper,
+                          process_input='\n'.join(batch) + '\n',
+                          check_exit_code=False)
+
+    def add_fdb_entries_batch(self, agent_ports, interface):
+        """Add the FDB entries of many agents in batch.
+
+        :param agent_ports: maps agent ips to the (mac, ip) pairs of ports.
+        """
+        fdb_entries = self.get_fdb_bridge_entries(interface)
+        ip_entries = self.get_fdb_ip_entries(interface)
+        flooding_mac = constants.FLOODING_ENTRY[0]
+        flooding = any(mac == flooding_mac for mac, dst in fdb_entries)
+        fdb_batch = []
+        ip_batch = []
+        for agent_ip, ports in agent_ports.items():
+            for mac, ip in ports:
+                if mac != flooding_mac:
+                    if (mac.lower(), ip) not in ip_entries:
+                        ip_batch.append('neigh replace %s lladdr %s dev %s '
+                                        'nud permanent' % (ip, mac, interface))
+                    if (mac.lower(), agent_ip) not in fdb_entries:
+                        fdb_batch.append('fdb add %s dev %s dst %s' %
+                                         (mac, interface, agent_ip))
+                elif (self.vxlan_mode == lconst.VXLAN_UCAST and
+                      (mac, agent_ip) not in fdb_entries):
+                    fdb_batch.append('fdb %s %s dev %s dst %s' %
+                                     ('append' if flooding else 'add',
+                                      mac, interface, agent_ip))
+                    flooding = True
+        self._execute_batch('ip', ip_batch)
+        self._execute_batch('bridge', fdb_batch)
+
+    def remove_fdb_entries_batch(self, agent_ports, interface):
+        """Remove the FDB entries of many agents in batch.
+
+        :param agent_ports: maps agent ips to the (mac, ip) pairs of ports.
+        """
+        fdb_entries = self.get_fdb_bridge_entries(interface)
+        ip_entries = self.get_fdb_ip_entries(interface)
+        fdb_batch = []
+        ip_batch = []
+        for agent_ip, ports in agent_ports.items():
+            for mac, ip in ports:
+                if mac != constants.FLOODING_ENTRY[0]:
+                    if (mac.lower(), ip) in ip_entries:
+                        ip_batch.append('neigh del %s lladdr %s dev %s' %
+                                        (ip, mac, interface))
+                elif self.vxlan_mode != lconst.VXLAN_UCAST:
+                    continue
+                if (mac.lower(), agent_ip) in fdb_entries:
+                    fdb_batch.append('fdb del %s dev %s dst %s' %
+                                     (mac, interface, agent_ip))
+        self._execute_batch('bridge', fdb_batch)
+        self._execute_batch('ip', ip_batch)
+
 
 class LinuxBridgeRpcCallbacks(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                               l2pop_rpc.L2populationRpcCallBackMixin):
@@ -676,11 +759,18 @@ class LinuxBridgeRpcCallbacks(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
             interface = self.agent.br_mgr.get_vxlan_device_name(
                 segment.segmentation_id)
 
-            agent_ports = values.get('ports')
-            for agent_ip, ports in agent_ports.items():
-                if agent_ip == self.agent.br_mgr.local_ip:
-                    continue
+            agent_ports = dict(
+                (agent_ip, ports)
+                for agent_ip, ports in values.get('ports').items()
+                if agent_ip != self.agent.br_mgr.local_ip)
+            if not agent_ports:
+                continue
+            if cfg.CONF.VXLAN.batch_fdb_updates:
+                self.agent.br_mgr.add_fdb_entries_batch(agent_ports,
+                                                        interface)
+                continue
 
+            for agent_ip, ports in agent_ports.items():
                 self.agent.br_mgr.add_fdb_entries(agent_ip,
                                                   ports,
                                                   interface)
@@ -698,11 +788,18 @@ class LinuxBridgeRpcCallbacks(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
             interface = self.agent.br_mgr.get_vxlan_device_name(
                 segment.segmentation_id)
 
-            agent_ports = values.get('ports')
-            for agent_ip, ports in agent_ports.items():
-                if agent_ip == self.agent.br_mgr.local_ip:
-                    continue
+            agent_ports = dict(
+                (agent_ip, ports)
+                for agent_ip, ports in values.get('ports').items()
+                if agent_ip != self.agent.br_mgr.local_ip)
+            if not agent_ports:
+                continue
+            if cfg.CONF.VXLAN.batch_fdb_updates:
+                self.agent.br_mgr.remove_fdb_entries_batch(agent_ports,
+                                                           interface)
+                continue
 
+            for agent_ip, ports in agent_ports.items():
                 self.agent.br_mgr.remove_fdb_entries(agent_ip,
                                                      ports,
                                                      interface)
@@ -764,6 +861,7 @@ class LinuxBridgeNeutronAgentRPC(object):
 
         # stores received port_updates for processing by the main loop
         self.updated_devices = set()
+        self.device_monitor = None
         self.context = context.get_admin_context_without_session()
         self.plugin_rpc = agent_rpc.PluginApi(topics.PLUGIN)
         self.sg_plugin_rpc = sg_rpc.SecurityGroupServerRpcApi(topics.PLUGIN)
@@ -775,6 +873,8 @@ class LinuxBridgeNeutronAgentRPC(object):
         try:
             devices = len(self.br_mgr.get_tap_devices())
             self.agent_state.get('configurations')['devices'] = devices
+            self.agent_state.get('configurations')['command_stats'] = (
+                utils.get_command_stats())
             self.state_rpc.report_state(self.context,
                                         self.agent_state)
             self.agent_state.pop('start_flag', None)
@@ -962,16 +1062,72 @@ class LinuxBridgeNeutronAgentRPC(object):
 
         return device_info
 
+    def scan_device_events(self, previous, events):
+        """Return the device changes described by device monitor events.
+
+        Unlike scan_devices, updated devices are left to the next scan.
+        """
+        added = set()
+        removed = set()
+        for device, deleted in events:
+            if not device.startswith(constants.TAP_DEVICE_PREFIX):
+                continue
+            if deleted:
+                added.discard(device)
+                removed.add(device)
+            else:
+                removed.discard(device)
+                added.add(device)
+
+        return {'current': (previous['current'] - removed) | added,
+                'added': added - previous['current'],
+                'removed': removed & previous['current'],
+                'updated': set()}
+
     def _device_info_has_changes(self, device_info):
         return (device_info.get('added')
                 or device_info.get('updated')
                 or device_info.get('removed'))
 
+    def _process_device_changes(self, device_info):
+        """Process the changes of device_info, returning if sync is needed."""
+        if self._device_info_has_changes(device_info):
+            LOG.debug("Agent loop found changes! %s", device_info)
+            try:
+                return self.process_network_devices(device_info)
+            except Exception:
+                LOG.exception(_LE("Error in agent loop. Devices info: %s"),
+                              device_info)
+                return True
+        return False
+
+    def _process_device_events(self, device_info, end):
+        """Process the device monitor events received until end.
+
+        Returns the resulting device info and whether sync is needed.
+        """
+        sync = False
+        while not sync:
+            timeout = end - time.time()
+            if timeout <= 0:
+                break
+            events = self.device_monitor.get_events(timeout=timeout)
+            if events:
+                device_info = self.scan_device_events(device_info, events)
+                sync = self._process_device_changes(device_info)
+        return device_info, sync
+
     def daemon_loop(self):
         LOG.info(_LI("LinuxBridge Agent RPC Daemon Started!"))
         device_info = None
         sync = True
 
+        if cfg.CONF.AGENT.monitor_devices:
+            respawn_interval = cfg.CONF.AGENT.device_monitor_respawn_interval
+            self.device_monitor = ip_monitor.IpLinkMonitor(
+                respawn_interval=respawn_interval)
+            self.device_monitor.start()
+
         while True:
             start = time.time()
 
@@ -981,14 +1137,12 @@ class LinuxBridgeNeutronAgentRPC(object):
                 LOG.info(_LI("Agent out of sync with plugin!"))
                 sync = False
 
-            if self._device_info_has_changes(device_info):
-                LOG.debug("Agent loop found changes! %s", device_info)
-                try:
-                    sync = self.process_network_devices(device_info)
-                except Exception:
-                    LOG.exception(_LE("Error in agent loop. Devices info: %s"),
-                                  device_info)
-                    sync = True
+            sync = self._process_device_changes(device_info)
+
+            if self.device_monitor and not sync:
+                # Process the devices added and removed until the next scan
+                device_info, sync = self._process_device_events(
+                    device_info, start + self.polling_interval)
 
             # sleep till end of polling interval
             elapsed = (time.time() - start)
@@ -48,6 +48,12 @@ vxlan_opts = [
                 help=_("Extension to use alongside ml2 plugin's l2population "
                        "mechanism driver. It enables the plugin to populate "
                        "VXLAN forwarding table.")),
+    cfg.BoolOpt('batch_fdb_updates', default=False,
+                help=_("Read the forwarding and neighbour tables of a VXLAN "
+                       "interface once per l2 population update and apply "
+                       "the missing changes with 'bridge -batch' and "
+                       "'ip -batch'. Needs an iproute2 whose bridge "
+                       "command supports batch mode.")),
 ]
 
 bridge_opts = [
@@ -60,6 +66,15 @@ agent_opts = [
     cfg.IntOpt('polling_interval', default=2,
                help=_("The number of seconds the agent will wait between "
                       "polling for local device changes.")),
+    cfg.BoolOpt('monitor_devices', default=False,
+                help=_("Monitor links with 'ip monitor' to process tap "
+                       "devices as soon as they are added or removed. "
+                       "All the devices are still scanned every "
+                       "polling_interval seconds, to reconcile and to "
+                       "process port updates.")),
+    cfg.IntOpt('device_monitor_respawn_interval', default=30,
+               help=_("The number of seconds to wait before respawning the "
+                      "device monitor after losing communication with it.")),
     cfg.BoolOpt('rpc_support_old_agents', default=False,
                 help=_("Enable server RPC compatibility with old agents")),
 ]
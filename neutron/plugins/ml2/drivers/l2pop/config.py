@@ -20,6 +20,13 @@ l2_population_options = [
     cfg.IntOpt('agent_boot_time', default=180,
                help=_('Delay within which agent is expected to update '
                       'existing ports whent it restarts')),
+    cfg.FloatOpt('fanout_batch_interval', default=0,
+                 help=_('Seconds during which the FDB entries added and '
+                        'removed by port events are merged before being '
+                        'sent to all the agents in a single fanout per '
+                        'method. An entry added and removed within the '
+                        'same window is not sent. 0 sends each update '
+                        'immediately.')),
 ]
 
 cfg.CONF.register_opts(l2_population_options, "l2pop")
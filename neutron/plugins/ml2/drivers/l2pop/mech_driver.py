@@ -189,33 +189,30 @@ class L2populationMechanismDriver(api.MechanismDriver,
         fdb_network_ports = (
             self.get_nondvr_active_network_ports(session, network_id).all())
         ports = agent_fdb_entries[network_id]['ports']
-        ports.update(self._get_tunnels(
-            fdb_network_ports + tunnel_network_ports,
-            agent.host))
-        for agent_ip, fdbs in ports.items():
-            for binding, agent in fdb_network_ports:
-                if self.get_agent_ip(agent) == agent_ip:
-                    fdbs.extend(self._get_port_fdb_entries(binding.port))
+        # The IP of each agent is parsed from its configuration only once
+        agent_ips = {}
+
+        def get_agent_fdbs(port_agent):
+            if port_agent.host == agent.host:
+                return
+            if port_agent.host not in agent_ips:
+                agent_ips[port_agent.host] = self.get_agent_ip(port_agent)
+                if not agent_ips[port_agent.host]:
+                    LOG.debug("Unable to retrieve the agent ip, check "
+                              "the agent %s configuration.", port_agent.host)
+            ip = agent_ips[port_agent.host]
+            if ip:
+                return ports.setdefault(ip, [const.FLOODING_ENTRY])
+
+        for _, port_agent in tunnel_network_ports:
+            get_agent_fdbs(port_agent)
+        for binding, port_agent in fdb_network_ports:
+            fdbs = get_agent_fdbs(port_agent)
+            if fdbs is not None:
+                fdbs.extend(self._get_port_fdb_entries(binding.port))
 
         return agent_fdb_entries
 
-    def _get_tunnels(self, tunnel_network_ports, exclude_host):
-        agents = {}
-        for _, agent in tunnel_network_ports:
-            if agent.host == exclude_host:
-                continue
-
-            ip = self.get_agent_ip(agent)
-            if not ip:
-                LOG.debug("Unable to retrieve the agent ip, check "
-                          "the agent %s configuration.", agent.host)
-                continue
-
-            if ip not in agents:
-                agents[ip] = [const.FLOODING_ENTRY]
-
-        return agents
-
     def _update_port_up(self, context):
         port = context.current
         agent_host = context.host
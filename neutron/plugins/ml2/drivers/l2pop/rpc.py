@@ -16,10 +16,13 @@
 import collections
 import copy
 
+from eventlet import greenthread
+from oslo_config import cfg
 import oslo_messaging
 
 from neutron.common import rpc as n_rpc
 from neutron.common import topics
+from neutron.i18n import _LE
 from neutron.openstack.common import log as logging
 
 
@@ -38,6 +41,11 @@ class L2populationAgentNotifyAPI(object):
                                                         topics.UPDATE)
         target = oslo_messaging.Target(topic=topic, version='1.0')
         self.client = n_rpc.get_client(target)
+        # network id -> {'segment_id', 'network_type',
+        #                'ports': {agent ip -> {PortInfo -> True if added,
+        #                                       False if removed}}}
+        self._pending_fdb_entries = {}
+        self._flush_timer = None
 
     def _notification_fanout(self, context, method, fdb_entries):
         LOG.debug('Fanout notify l2population agents at %(topic)s '
@@ -62,12 +70,66 @@ class L2populationAgentNotifyAPI(object):
         cctxt = self.client.prepare(topic=self.topic_l2pop_update, server=host)
         cctxt.cast(context, method, fdb_entries=marshalled_fdb_entries)
 
+    def _batch_fanout(self, context, fdb_entries, added):
+        """Merge FDB entries into the ones pending for the next fanout.
+
+        Returns False if fanouts are not batched.
+        """
+        interval = cfg.CONF.l2pop.fanout_batch_interval
+        if interval <= 0:
+            return False
+        for network_id, network_entries in fdb_entries.items():
+            pending = self._pending_fdb_entries.setdefault(
+                network_id, {'ports': {}})
+            pending['segment_id'] = network_entries['segment_id']
+            pending['network_type'] = network_entries['network_type']
+            for agent_ip, port_infos in network_entries['ports'].items():
+                pending_ports = pending['ports'].setdefault(
+                    agent_ip, collections.OrderedDict())
+                for port_info in port_infos:
+                    port_info = PortInfo(*port_info)
+                    if pending_ports.get(port_info, added) != added:
+                        # Added and removed in the same window
+                        del pending_ports[port_info]
+                    else:
+                        pending_ports[port_info] = added
+        if self._flush_timer is None:
+            self._flush_timer = greenthread.spawn_after(
+                interval, self._flush_fanouts, context)
+        return True
+
+    def _flush_fanouts(self, context):
+        """Send the pending FDB entries in one fanout per method."""
+        self._flush_timer = None
+        pending, self._pending_fdb_entries = self._pending_fdb_entries, {}
+        entries = {True: {}, False: {}}
+        for network_id, pending_entries in pending.items():
+            for agent_ip, port_infos in pending_entries['ports'].items():
+                for port_info, added in port_infos.items():
+                    network_entries = entries[added].setdefault(
+                        network_id,
+                        {'segment_id': pending_entries['segment_id'],
+                         'network_type': pending_entries['network_type'],
+                         'ports': {}})
+                    network_entries['ports'].setdefault(
+                        agent_ip, []).append(port_info)
+        try:
+            if entries[False]:
+                self._notification_fanout(context, 'remove_fdb_entries',
+                                          entries[False])
+            if entries[True]:
+                self._notification_fanout(context, 'add_fdb_entries',
+                                          entries[True])
+        except Exception:
+            LOG.exception(_LE("Failed to send the FDB entries of %d "
+                              "networks"), len(pending))
+
     def add_fdb_entries(self, context, fdb_entries, host=None):
         if fdb_entries:
             if host:
                 self._notification_host(context, 'add_fdb_entries',
                                         fdb_entries, host)
-            else:
+            elif not self._batch_fanout(context, fdb_entries, True):
                 self._notification_fanout(context, 'add_fdb_entries',
                                           fdb_entries)
 
@@ -76,7 +138,7 @@ class L2populationAgentNotifyAPI(object):
             if host:
                 self._notification_host(context, 'remove_fdb_entries',
                                         fdb_entries, host)
-            else:
+            elif not self._batch_fanout(context, fdb_entries, False):
                 self._notification_fanout(context, 'remove_fdb_entries',
                                           fdb_entries)
 
@@ -86,6 +148,10 @@ class L2populationAgentNotifyAPI(object):
                 self._notification_host(context, 'update_fdb_entries',
                                         fdb_entries, host)
             else:
+                if self._flush_timer is not None:
+                    # Send the pending entries first, which updates apply to
+                    self._flush_timer.cancel()
+                    self._flush_fanouts(context)
                 self._notification_fanout(context, 'update_fdb_entries',
                                           fdb_entries)
 
@@ -59,6 +59,8 @@ class BigSwitchMechanismDriver(plugin.NeutronRestProxyV2Base,
         # init network ctrl connections
         self.servers = servermanager.ServerPool()
         self.servers.get_topo_function = self._get_all_data
+        self.servers.get_topo_resources_function = (
+            self._get_topology_resources)
         self.servers.get_topo_function_args = {'get_ports': True,
                                                'get_floating_ips': False,
                                                'get_routers': False}
@@ -106,14 +108,12 @@ class BigSwitchMechanismDriver(plugin.NeutronRestProxyV2Base,
                         servermanager.NXNETWORK in e.reason):
                         ctxt.reraise = False
                         LOG.error(_LE("Inconsistency with backend controller "
-                                      "triggering full synchronization."))
-                        topoargs = self.servers.get_topo_function_args
-                        self._send_all_data(
-                            send_ports=topoargs['get_ports'],
-                            send_floating_ips=topoargs['get_floating_ips'],
-                            send_routers=topoargs['get_routers'],
-                            triggered_by_tenant=port["network"]["tenant_id"]
-                        )
+                                      "triggering synchronization."))
+                        tenant_id = port["network"]["tenant_id"]
+                        self._sync_topology(
+                            triggered_by_tenant=tenant_id,
+                            stale_path=servermanager.NETWORKS_PATH % (
+                                tenant_id, port["network"]["id"]))
 
     @put_context_in_serverpool
     def delete_port_postcommit(self, context):
@@ -196,6 +196,8 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
         self.bridge_mappings = bridge_mappings
         self.setup_physical_bridges(self.bridge_mappings)
         self.local_vlan_map = {}
+        # vif id -> uuid of the network in local_vlan_map the vif is bound to
+        self.vif_net_uuids = {}
         self.tun_br_ofports = {p_const.TYPE_GRE: {},
                                p_const.TYPE_VXLAN: {}}
 
@@ -270,6 +272,8 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
             self.int_br_device_count)
         self.agent_state.get('configurations')['in_distributed_mode'] = (
             self.dvr_agent.in_distributed_mode())
+        self.agent_state.get('configurations')['command_stats'] = (
+            utils.get_command_stats())
 
         try:
             self.state_rpc.report_state(self.context,
@@ -307,9 +311,7 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                                                      start_listening=False)
 
     def get_net_uuid(self, vif_id):
-        for network_id, vlan_mapping in self.local_vlan_map.iteritems():
-            if vif_id in vlan_mapping.vif_ports:
-                return network_id
+        return self.vif_net_uuids.get(vif_id)
 
     def network_delete(self, context, **kwargs):
         LOG.debug("network_delete received")
@@ -356,40 +358,54 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
 
     def fdb_add(self, context, fdb_entries):
         LOG.debug("fdb_add received")
-        for lvm, agent_ports in self.get_agent_ports(fdb_entries,
-                                                     self.local_vlan_map):
-            agent_ports.pop(self.local_ip, None)
-            if len(agent_ports):
-                if not self.enable_distributed_routing:
-                    with self.tun_br.deferred() as deferred_br:
-                        self.fdb_add_tun(context, deferred_br, lvm,
-                                         agent_ports, self.tun_br_ofports)
-                else:
-                    self.fdb_add_tun(context, self.tun_br, lvm,
-                                     agent_ports, self.tun_br_ofports)
+        self._fdb_apply(context, fdb_entries, self.fdb_add_tun)
 
     def fdb_remove(self, context, fdb_entries):
         LOG.debug("fdb_remove received")
+        self._fdb_apply(context, fdb_entries, self.fdb_remove_tun)
+
+    def _fdb_apply(self, context, fdb_entries, fdb_tun_method):
+        remote_agent_ports = []
         for lvm, agent_ports in self.get_agent_ports(fdb_entries,
                                                      self.local_vlan_map):
             agent_ports.pop(self.local_ip, None)
             if len(agent_ports):
-                if not self.enable_distributed_routing:
-                    with self.tun_br.deferred() as deferred_br:
-                        self.fdb_remove_tun(context, deferred_br, lvm,
-                                            agent_ports, self.tun_br_ofports)
-                else:
-                    self.fdb_remove_tun(context, self.tun_br, lvm,
-                                        agent_ports, self.tun_br_ofports)
+                remote_agent_ports.append((lvm, agent_ports))
+        if not remote_agent_ports:
+            return
+        if not self.enable_distributed_routing:
+            # Apply the flows of all the networks in a single transaction
+            with self.tun_br.deferred() as deferred_br:
+                for lvm, agent_ports in remote_agent_ports:
+                    fdb_tun_method(context, deferred_br, lvm,
+                                   agent_ports, self.tun_br_ofports)
+        else:
+            for lvm, agent_ports in remote_agent_ports:
+                fdb_tun_method(context, self.tun_br, lvm,
+                               agent_ports, self.tun_br_ofports)
 
-    def add_fdb_flow(self, br, port_info, remote_ip, lvm, ofport):
-        if port_info == q_const.FLOODING_ENTRY:
-            lvm.tun_ofports.add(ofport)
+    def _set_fdb_flood_flow(self, br, lvm):
+        if lvm.tun_ofports:
             ofports = _ofport_set_to_str(lvm.tun_ofports)
             br.mod_flow(table=constants.FLOOD_TO_TUN,
                         dl_vlan=lvm.vlan,
                         actions="strip_vlan,set_tunnel:%s,output:%s" %
                         (lvm.segmentation_id, ofports))
+        else:
+            # This local vlan doesn't require any more tunnelling
+            br.delete_flows(table=constants.FLOOD_TO_TUN, dl_vlan=lvm.vlan)
+
+    def add_fdb_flood_flows(self, br, lvm, remote_ofports):
+        lvm.tun_ofports.update(remote_ofports.values())
+        self._set_fdb_flood_flow(br, lvm)
+
+    def del_fdb_flood_flows(self, br, lvm, remote_ofports):
+        lvm.tun_ofports.difference_update(remote_ofports.values())
+        self._set_fdb_flood_flow(br, lvm)
+
+    def add_fdb_flow(self, br, port_info, remote_ip, lvm, ofport):
+        if port_info == q_const.FLOODING_ENTRY:
+            self.add_fdb_flood_flows(br, lvm, {remote_ip: ofport})
         else:
             self.setup_entry_for_arp_reply(br, 'add', lvm.vlan,
                                            port_info.mac_address,
@@ -403,16 +419,7 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
 
     def del_fdb_flow(self, br, port_info, remote_ip, lvm, ofport):
         if port_info == q_const.FLOODING_ENTRY:
-            lvm.tun_ofports.remove(ofport)
-            if len(lvm.tun_ofports) > 0:
-                ofports = _ofport_set_to_str(lvm.tun_ofports)
-                br.mod_flow(table=constants.FLOOD_TO_TUN,
-                            dl_vlan=lvm.vlan,
-                            actions="strip_vlan,set_tunnel:%s,output:%s" %
-                            (lvm.segmentation_id, ofports))
-            else:
-                # This local vlan doesn't require any more tunnelling
-                br.delete_flows(table=constants.FLOOD_TO_TUN, dl_vlan=lvm.vlan)
+            self.del_fdb_flood_flows(br, lvm, {remote_ip: ofport})
         else:
             self.setup_entry_for_arp_reply(br, 'remove', lvm.vlan,
                                            port_info.mac_address,
@@ -591,6 +598,8 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
         LOG.info(_LI("Reclaiming vlan = %(vlan_id)s from "
                      "net-id = %(net_uuid)s"),
                  {'vlan_id': lvm.vlan, 'net_uuid': net_uuid})
+        for vif_id in lvm.vif_ports:
+            self.vif_net_uuids.pop(vif_id, None)
 
         if lvm.network_type in constants.TUNNEL_NETWORK_TYPES:
             if self.enable_tunneling:
@@ -657,6 +666,7 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                                       physical_network, segmentation_id)
         lvm = self.local_vlan_map[net_uuid]
         lvm.vif_ports[port.vif_id] = port
+        self.vif_net_uuids[port.vif_id] = net_uuid
 
         self.dvr_agent.bind_port_to_dvr(port, lvm,
                                         fixed_ips,
@@ -693,6 +703,8 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
             vif_port = lvm.vif_ports[vif_id]
             self.dvr_agent.unbind_port_from_dvr(vif_port, lvm)
         lvm.vif_ports.pop(vif_id, None)
+        if self.vif_net_uuids.get(vif_id) == net_uuid:
+            del self.vif_net_uuids[vif_id]
 
         if not lvm.vif_ports:
             self.reclaim_local_vlan(net_uuid)
@@ -1000,20 +1012,21 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
         """
         port_tags = self.int_br.get_port_tag_dict()
         changed_ports = set()
-        for lvm in self.local_vlan_map.values():
-            for port in registered_ports:
-                if (
-                    port in lvm.vif_ports
-                    and lvm.vif_ports[port].port_name in port_tags
-                    and port_tags[lvm.vif_ports[port].port_name] != lvm.vlan
-                ):
-                    LOG.info(
-                        _LI("Port '%(port_name)s' has lost "
-                            "its vlan tag '%(vlan_tag)d'!"),
-                        {'port_name': lvm.vif_ports[port].port_name,
-                         'vlan_tag': lvm.vlan}
-                    )
-                    changed_ports.add(port)
+        for port in registered_ports:
+            lvm = self.local_vlan_map.get(self.vif_net_uuids.get(port))
+            vif_port = lvm and lvm.vif_ports.get(port)
+            if (
+                vif_port
+                and vif_port.port_name in port_tags
+                and port_tags[vif_port.port_name] != lvm.vlan
+            ):
+                LOG.info(
+                    _LI("Port '%(port_name)s' has lost "
+                        "its vlan tag '%(vlan_tag)d'!"),
+                    {'port_name': vif_port.port_name,
+                     'vlan_tag': lvm.vlan}
+                )
+                changed_ports.add(port)
         return changed_ports
 
     def update_ancillary_ports(self, registered_ports):
@@ -15,7 +15,7 @@
 
 import random
 
-from oslo_serialization import jsonutils
+import eventlet
 from oslo_utils import timeutils
 
 from neutron.common import constants
@@ -43,6 +43,23 @@ MAX_PAGE_SIZE = 5000
 LOG = log.getLogger(__name__)
 
 
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.iteritems()))
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _hash_resource(item):
+    """Return a hash of a NSX resource which ignores the order of keys.
+
+    The synchronizer only fetches the uuid, tags, status fields and status
+    relations of resources, so this is in effect a hash of their state.
+    """
+    return hash(_freeze(item))
+
+
 class NsxCache(object):
     """A simple Cache for NSX resources.
 
@@ -86,32 +103,33 @@ class NsxCache(object):
         if clear_changed:
             self._clear_changed_flag_and_remove_from_cache(resources)
 
-        def do_hash(item):
-            return hash(jsonutils.dumps(item))
-
         # Parse new data and identify new, deleted, and updated resources
+        added = updated = 0
         for item in new_resources:
             item_id = item['uuid']
             if resources.get(item_id):
-                new_hash = do_hash(item)
+                new_hash = _hash_resource(item)
                 if new_hash != resources[item_id]['hash']:
                     resources[item_id]['hash'] = new_hash
                     resources[item_id]['changed'] = True
                     resources[item_id]['data_bk'] = (
                         resources[item_id]['data'])
                     resources[item_id]['data'] = item
+                    updated += 1
                 # Mark the item as hit in any case
                 resources[item_id]['hit'] = True
-                LOG.debug("Updating item %s in NSX object cache", item_id)
             else:
-                resources[item_id] = {'hash': do_hash(item)}
+                resources[item_id] = {'hash': _hash_resource(item)}
                 resources[item_id]['hit'] = True
                 resources[item_id]['changed'] = True
                 resources[item_id]['data'] = item
                 # add a uuid to dict mapping for easy retrieval
                 # with __getitem__
                 self._uuid_dict_mappings[item_id] = resources
-                LOG.debug("Added item %s to NSX object cache", item_id)
+                added += 1
+        if added or updated:
+            LOG.debug("Added %(added)d and updated %(updated)d items in "
+                      "NSX object cache", {'added': added, 'updated': updated})
 
     def _delete_resources(self, resources):
         # Mark for removal all the elements which have not been visited.
@@ -175,6 +193,10 @@ class SyncParameters(object):
     Page cursors: markers for the next resource to fetch.
                  'start' means page cursor unset for fetching 1st page
     init_sync_performed: True if the initial synchronization concluded
+    Remaining counts: estimated number of resources of each type still to
+                      fetch in the current synchronization, or None until
+                      known (i.e.: while fetching the first chunk)
+    fetch_time: Time in seconds taken to fetch the last chunk
     """
 
     def __init__(self, min_chunk_size):
@@ -186,6 +208,8 @@ class SyncParameters(object):
         self.lp_cursor = 'start'
         self.init_sync_performed = False
         self.total_size = 0
+        self.ls_left = self.lr_left = self.lp_left = None
+        self.fetch_time = 0
 
 
 def _start_loopingcall(min_chunk_size, state_sync_interval, func):
@@ -521,6 +545,13 @@ class NsxSynchronizer(object):
         ratio = ((float(sp.total_size) / float(sp.chunk_size)) /
                  (float(self._sync_interval) / float(self._req_delay)))
         new_size = max(1.0, ratio) * float(sp.chunk_size)
+        # If fetching a chunk takes longer than the delay between requests,
+        # the synchronization cannot complete within the interval. Use
+        # larger chunks to reduce the number of round-trips.
+        if sp.fetch_time > self._req_delay:
+            new_size = max(new_size,
+                           min(new_size * sp.fetch_time / self._req_delay,
+                               MAX_PAGE_SIZE))
         return int(new_size) + (new_size - int(new_size) > 0)
 
     def _fetch_data(self, uri, cursor, page_size):
@@ -565,13 +596,37 @@ class NsxSynchronizer(object):
             return results, cursor if page_size else 'start', total_size
         return [], cursor, None
 
-    def _fetch_nsx_data_chunk(self, sp):
-        base_chunk_size = sp.chunk_size
-        chunk_size = base_chunk_size + sp.extra_chunk_size
-        LOG.info(_LI("Fetching up to %s resources "
-                     "from NSX backend"), chunk_size)
-        fetched = ls_count = lr_count = lp_count = 0
+    def _get_page_sizes(self, sp, chunk_size):
+        """Split a chunk among lswitches, lrouters and lswitchports.
+
+        Each resource type gets what is left of the chunk after the
+        preceding types, according to the estimated number of resources
+        still to fetch, so that the three types can be fetched at once.
+
+        :returns: a list of page sizes, where None means that the resource
+                  type must not be fetched.
+        """
+        cursors = (sp.ls_cursor, sp.lr_cursor, sp.lp_cursor)
+        estimates = (sp.ls_left, sp.lr_left, sp.lp_left)
+        active = [i for i, cursor in enumerate(cursors) if cursor]
+        page_sizes = []
+        left = chunk_size
+        for i, cursor in enumerate(cursors):
+            if not cursor:
+                page_sizes.append(None)
+                continue
+            # the last type gets whatever is left
+            page_size = left if i == active[-1] else min(left, estimates[i])
+            left -= page_size
+            # a walk which has not started is queried for its total size
+            page_sizes.append(page_size if page_size or cursor == 'start'
+                              else None)
+        return page_sizes
+
+    def _fetch_chunk_sequentially(self, sp, chunk_size):
+        fetched = 0
         lswitches = lrouters = lswitchports = []
+        ls_count = lr_count = lp_count = None
         if sp.ls_cursor or sp.ls_cursor == 'start':
             (lswitches, sp.ls_cursor, ls_count) = self._fetch_data(
                 self.LS_URI, sp.ls_cursor, chunk_size)
@@ -583,7 +638,52 @@ class NsxSynchronizer(object):
         if fetched < chunk_size and sp.lp_cursor or sp.lp_cursor == 'start':
             (lswitchports, sp.lp_cursor, lp_count) = self._fetch_data(
                 self.LP_URI, sp.lp_cursor, max(chunk_size - fetched, 0))
-        fetched += len(lswitchports)
+        return ((lswitches, ls_count), (lrouters, lr_count),
+                (lswitchports, lp_count))
+
+    def _fetch_chunk_concurrently(self, sp, chunk_size):
+        page_sizes = self._get_page_sizes(sp, chunk_size)
+        uris = (self.LS_URI, self.LR_URI, self.LP_URI)
+        cursors = (sp.ls_cursor, sp.lr_cursor, sp.lp_cursor)
+        pool = eventlet.GreenPool(size=len(uris))
+        # Types which are not fetched keep a None placeholder. Do not rely
+        # on the truth value of GreenThreads: it is False until they start
+        threads = []
+        for uri, cursor, page_size in zip(uris, cursors, page_sizes):
+            if page_size is None:
+                threads.append(None)
+            else:
+                threads.append(
+                    pool.spawn(self._fetch_data, uri, cursor, page_size))
+        results = [([], cursor, None) if thread is None else thread.wait()
+                   for thread, cursor in zip(threads, cursors)]
+        ((lswitches, sp.ls_cursor, ls_count),
+         (lrouters, sp.lr_cursor, lr_count),
+         (lswitchports, sp.lp_cursor, lp_count)) = results
+        return ((lswitches, ls_count), (lrouters, lr_count),
+                (lswitchports, lp_count))
+
+    def _fetch_nsx_data_chunk(self, sp):
+        base_chunk_size = sp.chunk_size
+        chunk_size = base_chunk_size + sp.extra_chunk_size
+        LOG.info(_LI("Fetching up to %s resources "
+                     "from NSX backend"), chunk_size)
+        start = timeutils.utcnow()
+        if None in (sp.ls_left, sp.lr_left, sp.lp_left):
+            # Until the number of resources of each type is known, the page
+            # size of each type depends on what the previous ones returned
+            fetch = self._fetch_chunk_sequentially
+        else:
+            fetch = self._fetch_chunk_concurrently
+        ((lswitches, ls_count), (lrouters, lr_count),
+         (lswitchports, lp_count)) = fetch(sp, chunk_size)
+        sp.fetch_time = timeutils.delta_seconds(start, timeutils.utcnow())
+        sp.ls_left = self._get_left(sp.ls_left, ls_count, lswitches)
+        sp.lr_left = self._get_left(sp.lr_left, lr_count, lrouters)
+        sp.lp_left = self._get_left(sp.lp_left, lp_count, lswitchports)
+        ls_count = ls_count or 0
+        lr_count = lr_count or 0
+        lp_count = lp_count or 0
         if sp.current_chunk == 0:
             # No cursors were provided. Then it must be possible to
             # calculate the total amount of data to fetch
@@ -600,6 +700,14 @@ class NsxSynchronizer(object):
                    'num_lrouters': len(lrouters)})
         return (lswitches, lrouters, lswitchports)
 
+    @staticmethod
+    def _get_left(left, count, results):
+        # The total count is only returned when a walk starts
+        if count is not None:
+            return max(count - len(results), 0)
+        if left is not None:
+            return max(left - len(results), 0)
+
     def _synchronize_state(self, sp):
         # If the plugin has been destroyed, stop the LoopingCall
         if not self._plugin:
@@ -608,6 +716,7 @@ class NsxSynchronizer(object):
         # Reset page cursor variables if necessary
         if sp.current_chunk == 0:
             sp.ls_cursor = sp.lr_cursor = sp.lp_cursor = 'start'
+            sp.ls_left = sp.lr_left = sp.lp_left = None
         LOG.info(_LI("Running state synchronization task. Chunk: %s"),
                  sp.current_chunk)
         # Fetch chunk_size data from NSX
@@ -56,6 +56,13 @@ DEPRECATED_ACTION_MAP = {
     'view': ['get'],
     'set': ['create', 'update']
 }
+# Match rules built for an action and the attributes explicitly set on its
+# target, which are all the rules depend on
+_MATCH_RULES = {}
+# Bound to the match rules cached, as sub-attribute names come from requests
+MAX_MATCH_RULES = 1000
+# Resource -> (identity of its attribute map, attributes subject to policies)
+_ENFORCED_ATTRIBUTES = {}
 
 
 def reset():
@@ -63,6 +70,8 @@ def reset():
     if _ENFORCER:
         _ENFORCER.clear()
         _ENFORCER = None
+    _MATCH_RULES.clear()
+    _ENFORCED_ATTRIBUTES.clear()
 
 
 def init():
@@ -190,6 +199,86 @@ def _process_rules_list(rules, match_rule):
     return rules
 
 
+def _get_enforced_attributes(resource):
+    """Return the attribute map of a resource and its enforced attributes.
+
+    The enforced attributes are the (name, attribute) pairs of the
+    attributes subject to policy checks when set.
+    """
+    resource_attrs = attributes.RESOURCE_ATTRIBUTE_MAP.get(resource)
+    if resource_attrs is None:
+        return None, []
+    identity = (id(resource_attrs), len(resource_attrs))
+    cached = _ENFORCED_ATTRIBUTES.get(resource)
+    if cached and cached[0] == identity:
+        return resource_attrs, cached[1]
+    # The attribute map changed, so may the rules built from it
+    _MATCH_RULES.clear()
+    enforced = [(name, attr) for name, attr in resource_attrs.iteritems()
+                if 'enforce_policy' in attr]
+    _ENFORCED_ATTRIBUTES[resource] = (identity, enforced)
+    return resource_attrs, enforced
+
+
+def _get_match_rule_key(action, target):
+    """Return what the match rule of action on target depends on.
+
+    None is returned when the rule can not be cached.
+    """
+    resource, is_write = get_resource_and_action(action)
+    if not is_write:
+        return action
+    resource_attrs, enforced = _get_enforced_attributes(resource)
+    explicitly_set = []
+    for attribute_name, attribute in enforced:
+        if not _is_attribute_explicitly_set(attribute_name, resource_attrs,
+                                            target, action):
+            continue
+        sub_attrs = None
+        if _should_validate_sub_attributes(attribute,
+                                           target[attribute_name]):
+            try:
+                sub_attrs = frozenset(target[attribute_name])
+            except TypeError:
+                return
+        explicitly_set.append((attribute_name, sub_attrs))
+    return action, tuple(explicitly_set)
+
+
+def _get_match_rule(action, target):
+    """Return the rule to match for an action, building it once."""
+    key = _get_match_rule_key(action, target)
+    if key is None:
+        return _build_match_rule(action, target)
+    match_rule = _MATCH_RULES.get(key)
+    if match_rule is None:
+        if len(_MATCH_RULES) >= MAX_MATCH_RULES:
+            _MATCH_RULES.clear()
+        match_rule = _MATCH_RULES[key] = _build_match_rule(action, target)
+    return match_rule
+
+
+def _get_credentials(context):
+    """Return the credentials of a context for the policy engine.
+
+    They are built once per context, that is once per request, unless the
+    identity or the roles of the context change. The policy file is checked
+    for modifications when they are built rather than on each check.
+    """
+    try:
+        key = (context.user_id, context.tenant_id, context.is_admin,
+               tuple(context.roles or ()))
+    except TypeError:
+        return context.to_dict()
+    cached = getattr(context, '_policy_credentials', None)
+    if isinstance(cached, tuple) and cached[0] == key:
+        return cached[1]
+    _ENFORCER.load_rules()
+    credentials = context.to_dict()
+    context._policy_credentials = (key, credentials)
+    return credentials
+
+
 def _build_match_rule(action, target):
     """Create the rule to match for a given action.
 
@@ -358,8 +447,8 @@ def _prepare_check(context, action, target):
     # Compare with None to distinguish case in which target is {}
     if target is None:
         target = {}
-    match_rule = _build_match_rule(action, target)
-    credentials = context.to_dict()
+    match_rule = _get_match_rule(action, target)
+    credentials = _get_credentials(context)
     return match_rule, target, credentials
 
 
@@ -389,7 +478,8 @@ def check(context, action, target, plugin=None, might_not_exist=False):
     if might_not_exist and not (_ENFORCER.rules and action in _ENFORCER.rules):
         return True
     match_rule, target, credentials = _prepare_check(context, action, target)
-    result = _ENFORCER.enforce(match_rule, target, credentials)
+    # the rules were loaded along with the credentials
+    result = match_rule(target, credentials, _ENFORCER)
     # logging applied rules in case of failure
     if not result:
         log_rule_list(match_rule)
@@ -412,13 +502,12 @@ def enforce(context, action, target, plugin=None):
             if verification fails.
     """
     rule, target, credentials = _prepare_check(context, action, target)
-    try:
-        result = _ENFORCER.enforce(rule, target, credentials, action=action,
-                                   do_raise=True)
-    except policy.PolicyNotAuthorized:
-        with excutils.save_and_reraise_exception():
-            log_rule_list(rule)
-            LOG.debug("Failed policy check for '%s'", action)
+    # the rules were loaded along with the credentials
+    result = rule(target, credentials, _ENFORCER)
+    if not result:
+        log_rule_list(rule)
+        LOG.debug("Failed policy check for '%s'", action)
+        raise policy.PolicyNotAuthorized(rule)
     return result
 
 
@@ -28,6 +28,12 @@ LOG = logging.getLogger(__name__)
 QUOTA_DB_MODULE = 'neutron.db.quota_db'
 QUOTA_DB_DRIVER = 'neutron.db.quota_db.DbQuotaDriver'
 QUOTA_CONF_DRIVER = 'neutron.quota.ConfDriver'
+# Core resources whose usage is tracked rather than counted on each request
+TRACKED_RESOURCES = {
+    'network': 'neutron.db.models_v2.Network',
+    'subnet': 'neutron.db.models_v2.Subnet',
+    'port': 'neutron.db.models_v2.Port',
+}
 
 quota_opts = [
     cfg.ListOpt('quota_items',
@@ -206,6 +212,42 @@ class CountableResource(BaseResource):
         self.count = count
 
 
+class TrackedResource(CountableResource):
+    """Describe a resource whose usage is tracked by the quota driver."""
+
+    def __init__(self, name, model_class, count, flag=None):
+        """Initializes a TrackedResource.
+
+        Quota drivers which keep usage records, such as DbQuotaDriver,
+        update the usage of a tracked resource in the transaction creating
+        or deleting instances of its model, so that checking the quota does
+        not need counting them. The counting function is used to resync a
+        usage record which is missing or marked dirty, and by drivers which
+        do not keep usage records.
+
+        Tracked resources must be created and deleted through the ORM:
+        bulk deletes only mark the usage records of the resource dirty.
+
+        :param name: The name of the resource, i.e., "instances".
+        :param model_class: The model class of the resource, or its import
+                            path.
+        :param count: A callable which returns the count of the
+                      resource, as for a CountableResource.
+        :param flag: The name of the flag or configuration option
+                     which specifies the default value of the quota
+                     for this resource.
+        """
+
+        super(TrackedResource, self).__init__(name, count, flag=flag)
+        self._model_class = model_class
+
+    @property
+    def model_class(self):
+        if isinstance(self._model_class, basestring):
+            self._model_class = importutils.import_class(self._model_class)
+        return self._model_class
+
+
 class QuotaEngine(object):
     """Represent the set of recognized quotas."""
 
@@ -213,6 +255,7 @@ class QuotaEngine(object):
         """Initialize a Quota object."""
 
         self._resources = {}
+        self._tracked_models = None
         self._driver = None
         self._driver_class = quota_driver_class
 
@@ -230,6 +273,10 @@ class QuotaEngine(object):
                 _driver_class = importutils.import_object(_driver_class)
             self._driver = _driver_class
             LOG.info(_LI('Loaded quota_driver: %s.'), _driver_class)
+            # Drivers keeping usage records start tracking them
+            track_usages = getattr(self._driver, 'track_usages', None)
+            if track_usages:
+                track_usages()
         return self._driver
 
     def __contains__(self, resource):
@@ -241,6 +288,7 @@ class QuotaEngine(object):
             LOG.warn(_LW('%s is already registered.'), resource.name)
             return
         self._resources[resource.name] = resource
+        self._tracked_models = None
 
     def register_resource_by_name(self, resourcename):
         """Register a resource by name."""
@@ -271,8 +319,21 @@ class QuotaEngine(object):
         if not res or not hasattr(res, 'count'):
             raise exceptions.QuotaResourceUnknown(unknown=[resource])
 
+        if isinstance(res, TrackedResource):
+            get_usage = getattr(self.get_driver(), 'get_resource_usage', None)
+            if get_usage:
+                return get_usage(context, res, *args, **kwargs)
         return res.count(context, *args, **kwargs)
 
+    def get_tracked_models(self):
+        """Return the names of tracked resources keyed by model class."""
+        if self._tracked_models is None:
+            self._tracked_models = dict(
+                (res.model_class, res.name)
+                for res in self._resources.values()
+                if isinstance(res, TrackedResource))
+        return self._tracked_models
+
     def limit_check(self, context, tenant_id, **values):
         """Check simple quota limits.
 
@@ -325,8 +386,14 @@ def _count_resource(context, plugin, resources, tenant_id):
 def register_resources_from_config():
     resources = []
     for resource_item in cfg.CONF.QUOTAS.quota_items:
-        resources.append(CountableResource(resource_item, _count_resource,
-                                           'quota_' + resource_item))
+        if resource_item in TRACKED_RESOURCES:
+            resources.append(TrackedResource(
+                resource_item, TRACKED_RESOURCES[resource_item],
+                _count_resource, 'quota_' + resource_item))
+        else:
+            resources.append(CountableResource(resource_item,
+                                               _count_resource,
+                                               'quota_' + resource_item))
     QUOTAS.register_resources(resources)
 
 
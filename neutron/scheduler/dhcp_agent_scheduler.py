@@ -13,17 +13,22 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import random
 
 from oslo_config import cfg
 from oslo_db import exception as db_exc
+from sqlalchemy import func
+from sqlalchemy import orm
 from sqlalchemy import sql
 
 from neutron.common import constants
 from neutron.db import agents_db
 from neutron.db import agentschedulers_db
+from neutron.db import models_v2
 from neutron.i18n import _LI, _LW
 from neutron.openstack.common import log as logging
+from neutron.scheduler import weights
 
 
 LOG = logging.getLogger(__name__)
@@ -72,27 +77,94 @@ class ChanceScheduler(object):
                           network['id'])
                 return
             n_agents = agents_per_network - len(dhcp_agents)
-            enabled_dhcp_agents = plugin.get_agents_db(
-                context, filters={
-                    'agent_type': [constants.AGENT_TYPE_DHCP],
-                    'admin_state_up': [True]})
-            if not enabled_dhcp_agents:
-                LOG.warn(_LW('No more DHCP agents'))
-                return
+            hosting_agent_ids = set(agent['id'] for agent in dhcp_agents)
             active_dhcp_agents = [
-                agent for agent in set(enabled_dhcp_agents)
-                if not agents_db.AgentDbMixin.is_agent_down(
-                    agent['heartbeat_timestamp'])
-                and agent not in dhcp_agents
+                entry for entry in agents_db.agent_registry.get_agents(
+                    context, constants.AGENT_TYPE_DHCP)
+                if entry['id'] not in hosting_agent_ids
             ]
             if not active_dhcp_agents:
                 LOG.warn(_LW('No more DHCP agents'))
                 return
             n_agents = min(len(active_dhcp_agents), n_agents)
-            chosen_agents = random.sample(active_dhcp_agents, n_agents)
+            # the configurations are copied to update the load
+            active_dhcp_agents = [
+                dict(entry, configurations=dict(entry['configurations']))
+                for entry in active_dhcp_agents]
+            self._update_load(context, active_dhcp_agents)
+            chosen_agents = plugin.get_agents_db(
+                context, filters={
+                    'id': [entry['id'] for entry in self._choose_agents(
+                        active_dhcp_agents, n_agents)]})
+            if not chosen_agents:
+                LOG.warn(_LW('No more DHCP agents'))
+                return
         self._schedule_bind_network(context, chosen_agents, network['id'])
         return chosen_agents
 
+    def get_networks_placement(self, plugin, context, network_ids):
+        """Choose the DHCP agents of many networks in a single pass.
+
+        :returns: a dict mapping the ids of the networks which can be
+                  scheduled to the list of the agents chosen for them.
+        """
+        placement = {}
+        agents_per_network = cfg.CONF.dhcp_agents_per_network
+        binding_model = agentschedulers_db.NetworkDhcpAgentBinding
+        query = context.session.query(binding_model).options(
+            orm.joinedload('dhcp_agent')).filter(
+            binding_model.network_id.in_(network_ids))
+        hosting_agent_ids = collections.defaultdict(set)
+        for binding in query:
+            if (binding.dhcp_agent.admin_state_up and
+                    not agents_db.AgentDbMixin.is_agent_down(
+                        binding.dhcp_agent.heartbeat_timestamp)):
+                hosting_agent_ids[binding.network_id].add(
+                    binding.dhcp_agent_id)
+        # the configurations are copied to track the load in memory
+        active_dhcp_agents = [
+            dict(entry, configurations=dict(entry['configurations']))
+            for entry in agents_db.agent_registry.get_agents(
+                context, constants.AGENT_TYPE_DHCP)]
+        if not active_dhcp_agents:
+            LOG.warn(_LW('No more DHCP agents'))
+            return placement
+        agents_db_by_id = dict(
+            (agent.id, agent) for agent in
+            context.session.query(agents_db.Agent).filter(
+                agents_db.Agent.id.in_(
+                    [entry['id'] for entry in active_dhcp_agents])))
+        active_dhcp_agents = [entry for entry in active_dhcp_agents
+                              if entry['id'] in agents_db_by_id]
+        self._update_load(context, active_dhcp_agents)
+        for network_id in network_ids:
+            hosting = hosting_agent_ids[network_id]
+            n_agents = agents_per_network - len(hosting)
+            if n_agents <= 0:
+                LOG.debug('Network %s is hosted already', network_id)
+                continue
+            candidates = [entry for entry in active_dhcp_agents
+                          if entry['id'] not in hosting]
+            if not candidates:
+                continue
+            chosen = self._choose_agents(
+                candidates, min(len(candidates), n_agents))
+            for entry in chosen:
+                configurations = entry['configurations']
+                configurations['networks'] = (
+                    configurations.get('networks') or 0) + 1
+            placement[network_id] = [agents_db_by_id[entry['id']]
+                                     for entry in chosen]
+        return placement
+
+    def _update_load(self, context, agents):
+        """Update the load in the configurations of agent entries."""
+        pass
+
+    def _choose_agents(self, agents, count):
+        """Choose count agents among the registry entries of agents."""
+        return random.sample(agents, count)
+
     def auto_schedule_networks(self, plugin, context, host):
         """Schedule non-hosted networks to the DHCP agent on
         the specified host.
@@ -132,3 +204,45 @@ class ChanceScheduler(object):
         for agent, net_id in bindings_to_add:
             self._schedule_bind_network(context, [agent], net_id)
         return True
+
+
+class WeightedScheduler(ChanceScheduler):
+    """Allocate the DHCP agents of a network on their load.
+
+    The agents are rated by the weighers of dhcp_agent_weighers. The number
+    of networks bound to the agents, and of ports on these networks,
+    replace the ones they report, which lag behind the scheduling decisions.
+    """
+
+    def __init__(self):
+        super(WeightedScheduler, self).__init__()
+        self.weighers = weights.load_weighers(cfg.CONF.dhcp_agent_weighers)
+
+    def _update_load(self, context, agents):
+        agent_ids = [entry['id'] for entry in agents]
+        if not agent_ids:
+            return
+        binding_model = agentschedulers_db.NetworkDhcpAgentBinding
+        networks = dict(
+            context.session.query(
+                binding_model.dhcp_agent_id,
+                func.count(binding_model.network_id)).filter(
+                binding_model.dhcp_agent_id.in_(agent_ids)).group_by(
+                binding_model.dhcp_agent_id))
+        ports = dict(
+            context.session.query(
+                binding_model.dhcp_agent_id,
+                func.count(models_v2.Port.id)).join(
+                models_v2.Port,
+                models_v2.Port.network_id == binding_model.network_id).filter(
+                binding_model.dhcp_agent_id.in_(agent_ids)).group_by(
+                binding_model.dhcp_agent_id))
+        for entry in agents:
+            entry['configurations']['networks'] = networks.get(entry['id'], 0)
+            entry['configurations']['ports'] = ports.get(entry['id'], 0)
+
+    def _choose_agents(self, agents, count):
+        configurations = dict(
+            (entry['id'], entry['configurations']) for entry in agents)
+        return weights.weigh_agents(
+            self.weighers, agents, configurations)[:count]
@@ -29,6 +29,7 @@ from neutron.db import l3_db
 from neutron.db import l3_hamode_db
 from neutron.i18n import _LE, _LW
 from neutron.openstack.common import log as logging
+from neutron.scheduler import weights
 
 
 LOG = logging.getLogger(__name__)
@@ -195,6 +196,45 @@ class L3Scheduler(object):
 
             return candidates
 
+    def get_routers_placement(self, plugin, context, routers):
+        """Choose an L3 agent for many centralized, non HA routers.
+
+        The active L3 agents and their load are looked up once for all the
+        routers, the load being then tracked in memory as routers are
+        placed.
+
+        :returns: a dict mapping the ids of the routers which can be hosted
+                  to the agent chosen for them.
+        """
+        placement = {}
+        active_l3_agents = plugin.get_l3_agents(context, active=True)
+        if not active_l3_agents:
+            LOG.warn(_LW('No active L3 agents'))
+            return placement
+        load = plugin.get_l3_agents_router_count(
+            context, [l3_agent.id for l3_agent in active_l3_agents])
+        for router in routers:
+            candidates = plugin.get_l3_agent_candidates(
+                context, router, active_l3_agents)
+            if not candidates:
+                LOG.warn(_LW('No L3 agents can host the router %s'),
+                         router['id'])
+                continue
+            chosen_agent = self._choose_router_agent_by_load(
+                plugin, context, candidates, load)
+            load[chosen_agent.id] += 1
+            placement[router['id']] = chosen_agent
+        return placement
+
+    def _choose_router_agent_by_load(self, plugin, context, candidates,
+                                     load):
+        """Choose an agent from candidates knowing their number of routers.
+
+        :param load: maps the ids of the candidates to the number of
+                     routers they host.
+        """
+        return self._choose_router_agent(plugin, context, candidates)
+
     def bind_routers(self, context, plugin, routers, l3_agent):
         for router in routers:
             if router.get('ha'):
@@ -380,8 +420,53 @@ class LeastRoutersScheduler(L3Scheduler):
             context, candidate_ids)
         return chosen_agent
 
+    def _choose_router_agent_by_load(self, plugin, context, candidates,
+                                     load):
+        return min(candidates, key=lambda candidate: load[candidate.id])
+
     def _choose_router_agents_for_ha(self, plugin, context, candidates):
         num_agents = self.get_num_of_agents_for_ha(len(candidates))
         ordered_agents = plugin.get_l3_agents_ordered_by_num_routers(
             context, [candidate['id'] for candidate in candidates])
         return ordered_agents[:num_agents]
+
+
+class WeightedScheduler(L3Scheduler):
+    """Allocate to the L3 agents with the least load they report.
+
+    The agents are rated by the weighers of l3_agent_weighers. The number
+    of routers bound to the agents replaces the one they report, which lags
+    behind the scheduling decisions.
+    """
+
+    def __init__(self):
+        super(WeightedScheduler, self).__init__()
+        self.weighers = weights.load_weighers(cfg.CONF.l3_agent_weighers)
+
+    def schedule(self, plugin, context, router_id,
+                 candidates=None):
+        return self._schedule_router(
+            plugin, context, router_id, candidates=candidates)
+
+    def _weigh_candidates(self, plugin, context, candidates, load=None):
+        if load is None:
+            load = plugin.get_l3_agents_router_count(
+                context, [candidate['id'] for candidate in candidates])
+        configurations = {}
+        for candidate in candidates:
+            configuration = dict(plugin.get_configuration_dict(candidate))
+            configuration['routers'] = load[candidate['id']]
+            configurations[candidate['id']] = configuration
+        return weights.weigh_agents(self.weighers, candidates, configurations)
+
+    def _choose_router_agent(self, plugin, context, candidates):
+        return self._weigh_candidates(plugin, context, candidates)[0]
+
+    def _choose_router_agents_for_ha(self, plugin, context, candidates):
+        num_agents = self.get_num_of_agents_for_ha(len(candidates))
+        return self._weigh_candidates(
+            plugin, context, candidates)[:num_agents]
+
+    def _choose_router_agent_by_load(self, plugin, context, candidates,
+                                     load):
+        return self._weigh_candidates(plugin, context, candidates, load)[0]
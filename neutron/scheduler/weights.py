@@ -0,0 +1,129 @@
+# Copyright (c) 2015 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Weigh agents on the load they report to choose where to schedule."""
+
+import abc
+import random
+
+from oslo_utils import importutils
+import six
+
+
+@six.add_metaclass(abc.ABCMeta)
+class BaseAgentWeigher(object):
+    """Rate how suitable an agent is, higher weights being preferred."""
+
+    def __init__(self, multiplier=1.0):
+        self.multiplier = multiplier
+
+    @abc.abstractmethod
+    def weigh(self, configurations):
+        """Return the raw weight of an agent given its configurations."""
+        pass
+
+
+class ReportedLoadWeigher(BaseAgentWeigher):
+    """Prefer the agents reporting the least of a resource."""
+
+    load_key = None
+
+    def weigh(self, configurations):
+        try:
+            return -float(configurations.get(self.load_key) or 0)
+        except (TypeError, ValueError):
+            return 0.0
+
+
+class NetworksWeigher(ReportedLoadWeigher):
+    load_key = 'networks'
+
+
+class SubnetsWeigher(ReportedLoadWeigher):
+    load_key = 'subnets'
+
+
+class PortsWeigher(ReportedLoadWeigher):
+    load_key = 'ports'
+
+
+class RoutersWeigher(ReportedLoadWeigher):
+    load_key = 'routers'
+
+
+class GatewaysWeigher(ReportedLoadWeigher):
+    load_key = 'ex_gw_ports'
+
+
+class InterfacesWeigher(ReportedLoadWeigher):
+    load_key = 'interfaces'
+
+
+class FloatingIPsWeigher(ReportedLoadWeigher):
+    load_key = 'floating_ips'
+
+
+WEIGHERS = {
+    'networks': NetworksWeigher,
+    'subnets': SubnetsWeigher,
+    'ports': PortsWeigher,
+    'routers': RoutersWeigher,
+    'ex_gw_ports': GatewaysWeigher,
+    'interfaces': InterfacesWeigher,
+    'floating_ips': FloatingIPsWeigher,
+}
+
+
+def load_weighers(specs):
+    """Instantiate weighers from a list of '<weigher>[:<multiplier>]'.
+
+    <weigher> is either a key of WEIGHERS or the import path of a
+    BaseAgentWeigher subclass; the multiplier defaults to 1.0.
+    """
+    weighers = []
+    for spec in specs:
+        name, sep, multiplier = spec.strip().partition(':')
+        try:
+            multiplier = float(multiplier) if sep else 1.0
+        except ValueError:
+            raise ValueError(_("Invalid multiplier for weigher %s") % spec)
+        weigher_class = WEIGHERS.get(name) or importutils.import_class(name)
+        weighers.append(weigher_class(multiplier))
+    return weighers
+
+
+def weigh_agents(weighers, agents, configurations):
+    """Order agents from the most to the least suitable.
+
+    The raw weights of each weigher are normalized to [0, 1] across the
+    agents so that multipliers balance weighers of different scales. Agents
+    of equal weight are shuffled so that they share the load.
+
+    :param configurations: maps the agent ids to their configurations.
+    """
+    agents = list(agents)
+    random.shuffle(agents)
+    totals = dict((agent['id'], 0.0) for agent in agents)
+    for weigher in weighers:
+        weights = dict(
+            (agent['id'], weigher.weigh(configurations.get(agent['id'], {})))
+            for agent in agents)
+        lowest = min(weights.values()) if weights else 0
+        spread = max(weights.values()) - lowest if weights else 0
+        if not spread:
+            continue
+        for agent_id, weight in weights.items():
+            totals[agent_id] += weigher.multiplier * (weight - lowest) / spread
+    return sorted(agents, key=lambda agent: totals[agent['id']], reverse=True)
@@ -62,14 +62,14 @@ class IpsetManagerTestCase(IpsetBase):
 
     def test_add_member_allows_ping(self):
         self.pinger.assert_no_ping_from_ns(self.src_ns, self.DST_ADDRESS)
-        self.ipset._add_member_to_set(IPSET_SET, self.SRC_ADDRESS)
+        self.ipset._add_members_to_set(IPSET_SET, [self.SRC_ADDRESS])
         self.pinger.assert_ping_from_ns(self.src_ns, self.DST_ADDRESS)
 
     def test_del_member_denies_ping(self):
-        self.ipset._add_member_to_set(IPSET_SET, self.SRC_ADDRESS)
+        self.ipset._add_members_to_set(IPSET_SET, [self.SRC_ADDRESS])
         self.pinger.assert_ping_from_ns(self.src_ns, self.DST_ADDRESS)
 
-        self.ipset._del_member_from_set(IPSET_SET, self.SRC_ADDRESS)
+        self.ipset._del_members_from_set(IPSET_SET, [self.SRC_ADDRESS])
         self.pinger.assert_no_ping_from_ns(self.src_ns, self.DST_ADDRESS)
 
     def test_refresh_ipset_allows_ping(self):
@@ -0,0 +1,52 @@
+# Copyright 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from neutron.agent.linux import ip_monitor
+from neutron.tests import base
+
+
+class TestIpLinkMonitor(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestIpLinkMonitor, self).setUp()
+        self.monitor = ip_monitor.IpLinkMonitor()
+
+    def test_parse_link_event_added(self):
+        line = ('12: tap1234: <BROADCAST,MULTICAST> mtu 1500 qdisc noop '
+                'state DOWN \\    link/ether fa:16:3e:aa:bb:cc')
+        self.assertEqual(('tap1234', False),
+                         ip_monitor._parse_link_event(line))
+
+    def test_parse_link_event_deleted(self):
+        line = 'Deleted 12: tap1234: <BROADCAST,MULTICAST> mtu 1500'
+        self.assertEqual(('tap1234', True),
+                         ip_monitor._parse_link_event(line))
+
+    def test_parse_link_event_with_peer(self):
+        line = '7: veth1@if6: <BROADCAST,MULTICAST,UP> mtu 1500'
+        self.assertEqual(('veth1', False),
+                         ip_monitor._parse_link_event(line))
+
+    def test_parse_link_event_invalid(self):
+        self.assertIsNone(ip_monitor._parse_link_event('foo bar'))
+        self.assertIsNone(ip_monitor._parse_link_event(
+            '    link/ether fa:16:3e:aa:bb:cc brd ff:ff:ff:ff:ff:ff'))
+
+    def test_get_events(self):
+        self.monitor._stdout_lines.put('3: tap1: <BROADCAST> mtu 1500')
+        self.monitor._stdout_lines.put('garbage')
+        self.monitor._stdout_lines.put('Deleted 4: tap2: <BROADCAST>')
+        self.assertEqual([('tap1', False), ('tap2', True)],
+                         self.monitor.get_events(timeout=1))
+        self.assertEqual([], self.monitor.get_events(timeout=0.01))
@@ -60,7 +60,7 @@ class BaseIpsetManagerTest(base.BaseTestCase):
 
     def expect_del(self, addresses):
         self.expected_calls.extend(
-            mock.call(['ipset', 'del', TEST_SET_NAME, ip],
+            mock.call(['ipset', 'del', '-exist', TEST_SET_NAME, ip],
                       process_input=None,
                       root_helper=self.root_helper) for ip in addresses)
 
@@ -114,6 +114,16 @@ class IpsetManagerTestCase(BaseIpsetManagerTest):
         self.ipset.set_members(TEST_SET_ID, ETHERTYPE, FAKE_IPS)
         self.verify_mock_calls()
 
+    def test_set_members_tracks_partial_failure(self):
+        self.add_first_ip()
+        self.execute.side_effect = [None, RuntimeError]
+        self.assertRaises(RuntimeError, self.ipset.set_members,
+                          TEST_SET_ID, ETHERTYPE, FAKE_IPS[0:3])
+        self.execute.reset_mock()
+        self.execute.side_effect = None
+        self.ipset.set_members(TEST_SET_ID, ETHERTYPE, FAKE_IPS[0:3])
+        self.assertEqual(1, self.execute.call_count)
+
     def test_destroy(self):
         self.add_first_ip()
         self.expect_destroy()
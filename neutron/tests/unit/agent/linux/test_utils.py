@@ -11,6 +11,9 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import contextlib
+
+import eventlet
 import mock
 import testtools
 
@@ -119,6 +122,140 @@ class AgentUtilsExecuteTest(base.BaseTestCase):
                 self.assertTrue(log.debug.called)
 
 
+class AgentUtilsExecuteRootwrapDaemonTest(base.BaseTestCase):
+    def setUp(self):
+        super(AgentUtilsExecuteRootwrapDaemonTest, self).setUp()
+        self.config(root_helper_daemon='sudo neutron-rootwrap-daemon conf',
+                    group='AGENT')
+        self.get_client_p = mock.patch.object(utils.RootwrapDaemonHelper,
+                                              'get_client')
+        self.client = self.get_client_p.start().return_value
+        self.create_process_p = mock.patch.object(utils, 'create_process')
+        self.create_process = self.create_process_p.start()
+        self.create_process.return_value = FakeCreateProcess(0), 'ls'
+
+    def test_execute_through_daemon(self):
+        self.client.execute.return_value = (0, 'out', '')
+        result = utils.execute(['ip', 'link', 1], root_helper='sudo',
+                               process_input='in')
+        self.assertEqual('out', result)
+        self.client.execute.assert_called_once_with(['ip', 'link', '1'],
+                                                    'in')
+        self.assertFalse(self.create_process.called)
+
+    def test_execute_through_daemon_fails(self):
+        self.client.execute.return_value = (1, '', 'error')
+        self.assertRaises(RuntimeError, utils.execute, ['ip', 'link'],
+                          root_helper='sudo')
+
+    def test_execute_through_daemon_extra_ok_codes(self):
+        self.client.execute.return_value = (1, 'out', '')
+        result = utils.execute(['ip', 'link'], root_helper='sudo',
+                               extra_ok_codes=[1])
+        self.assertEqual('out', result)
+
+    def test_execute_without_root_helper(self):
+        utils.execute(['ls'])
+        self.assertFalse(self.client.execute.called)
+        self.assertTrue(self.create_process.called)
+
+    def test_execute_with_addl_env(self):
+        utils.execute(['ls'], root_helper='sudo', addl_env={'foo': 'bar'})
+        self.assertFalse(self.client.execute.called)
+        self.assertTrue(self.create_process.called)
+
+    def test_get_client_is_shared(self):
+        self.get_client_p.stop()
+        self.addCleanup(utils.RootwrapDaemonHelper._clients.clear)
+        with mock.patch.object(utils.client, 'Client') as client:
+            client_1 = utils.RootwrapDaemonHelper.get_client('sudo daemon')
+            client_2 = utils.RootwrapDaemonHelper.get_client('sudo daemon')
+        self.assertIs(client_1, client_2)
+        client.assert_called_once_with(['sudo', 'daemon'])
+
+
+class AgentUtilsExecuteManyTest(base.BaseTestCase):
+    def test_execute_many_keeps_order(self):
+        def fake_execute(cmd, **kwargs):
+            eventlet.sleep(0.01 * (3 - len(cmd)))
+            return ' '.join(cmd)
+
+        result = utils.execute_many([['a'], ['a', 'b'], ['a', 'b', 'c']],
+                                    execute_func=fake_execute)
+        self.assertEqual(['a', 'a b', 'a b c'], result)
+
+    def test_execute_many_passes_kwargs(self):
+        execute = mock.Mock(return_value='out')
+        result = utils.execute_many([['ls'], ['ps']], execute_func=execute,
+                                    root_helper='sudo')
+        self.assertEqual(['out', 'out'], result)
+        execute.assert_has_calls([mock.call(['ls'], root_helper='sudo'),
+                                  mock.call(['ps'], root_helper='sudo')])
+
+    def test_execute_many_limits_concurrency(self):
+        self.config(execute_concurrency=2, group='AGENT')
+        running = []
+        max_running = []
+
+        def fake_execute(cmd):
+            running.append(cmd)
+            max_running.append(len(running))
+            eventlet.sleep(0)
+            running.remove(cmd)
+
+        utils.execute_many([['cmd%d' % i] for i in range(6)],
+                           execute_func=fake_execute)
+        self.assertEqual(2, max(max_running))
+
+    def test_execute_many_raises(self):
+        execute = mock.Mock(side_effect=['out', RuntimeError])
+        self.assertRaises(RuntimeError, utils.execute_many, [['ls'], ['ps']],
+                          execute_func=execute)
+
+
+class AgentUtilsCommandStatsTest(base.BaseTestCase):
+    def setUp(self):
+        super(AgentUtilsCommandStatsTest, self).setUp()
+        self.stats = utils.CommandStats()
+
+    def test_get_binary(self):
+        self.assertEqual('ovs-vsctl',
+                         self.stats.get_binary(['/usr/bin/ovs-vsctl', 'show']))
+        self.assertEqual('iptables-save',
+                         self.stats.get_binary(['ip', 'netns', 'exec', 'ns',
+                                                'iptables-save', '-c']))
+        self.assertEqual('ip', self.stats.get_binary(['ip', 'netns', 'list']))
+
+    def test_record(self):
+        self.stats.record(['ip', 'link'], 0.002)
+        self.stats.record(['ip', 'addr'], 0.07)
+        self.stats.record(['ip', 'route'], 10)
+        report = self.stats.get_report()
+        self.assertEqual(list(utils.COMMAND_LATENCY_BUCKETS),
+                         report['buckets'])
+        self.assertEqual({'count': 3, 'total': 10.072, 'max': 10,
+                          'hist': [1, 0, 1, 0, 0, 0, 1]},
+                         report['commands']['ip'])
+
+    def test_get_report_limits_to_slowest(self):
+        self.stats.record(['ip'], 1)
+        self.stats.record(['ipset'], 3)
+        self.stats.record(['arping'], 2)
+        report = self.stats.get_report(limit=2)
+        self.assertEqual(set(['ipset', 'arping']),
+                         set(report['commands']))
+
+    def test_execute_records_stats(self):
+        with contextlib.nested(
+            mock.patch.object(utils, 'command_stats'),
+            mock.patch.object(utils, 'create_process')
+        ) as (command_stats, create_process):
+            create_process.return_value = FakeCreateProcess(0), 'ls'
+            utils.execute(['ls', '-l'], root_helper='sudo')
+            command_stats.record.assert_called_once_with(['ls', '-l'],
+                                                         mock.ANY)
+
+
 class AgentUtilsGetInterfaceMAC(base.BaseTestCase):
     def test_get_interface_mac(self):
         expect_val = '01:02:03:04:05:06'
@@ -123,6 +123,21 @@ class TestL2populationRpcCallBackTunnelMixin(
         self.assertEqual(sorted(expected),
                          sorted(mock_add_fdb_flow.call_args_list))
 
+    def test_fdb_add_tun_flooding_entries(self):
+        self.agent_ports[self.ports[1].ip].append(n_const.FLOODING_ENTRY)
+        self.agent_ports[self.ports[2].ip].append(n_const.FLOODING_ENTRY)
+        with contextlib.nested(
+            mock.patch.object(self.fakeagent, 'add_fdb_flow'),
+            mock.patch.object(self.fakeagent, 'add_fdb_flood_flows'),
+        ) as (mock_add_fdb_flow, mock_add_fdb_flood_flows):
+            self.fakeagent.fdb_add_tun('context', self.fakebr, self.lvm1,
+                                       self.agent_ports, self.ofports)
+        self.assertEqual(3, mock_add_fdb_flow.call_count)
+        mock_add_fdb_flood_flows.assert_called_once_with(
+            self.fakebr, self.lvm1,
+            {self.ports[1].ip: self.ports[1].ofport,
+             self.ports[2].ip: self.ports[2].ofport})
+
     def test_fdb_remove_tun(self):
         with mock.patch.object(
             self.fakeagent, 'del_fdb_flow') as mock_del_fdb_flow:
@@ -154,3 +154,16 @@ class TestDhcpAgentNotifyAPI(base.BaseTestCase):
     def test__cast_message(self):
         self.notifier._cast_message(mock.ANY, mock.ANY, mock.ANY)
         self.assertEqual(1, self.mock_cast.call_count)
+
+    def test_networks_added_to_agent_single_network(self):
+        self.notifier.networks_added_to_agent(mock.ANY, ['foo_network_id'],
+                                              'foo_host')
+        self.mock_cast.assert_called_once_with(
+            mock.ANY, 'network_create_end',
+            {'network': {'id': 'foo_network_id'}}, 'foo_host')
+
+    def test_networks_added_to_agent_many_networks(self):
+        self.notifier.networks_added_to_agent(
+            mock.ANY, ['foo_network_id', 'bar_network_id'], 'foo_host')
+        self.mock_cast.assert_called_once_with(
+            mock.ANY, 'agent_updated', {'admin_state_up': True}, 'foo_host')
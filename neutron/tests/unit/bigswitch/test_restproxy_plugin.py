@@ -23,6 +23,7 @@ from neutron.common import constants
 from neutron import context
 from neutron.extensions import portbindings
 from neutron import manager
+from neutron.plugins.bigswitch import servermanager
 from neutron.tests.unit import _test_extension_portbindings as test_bindings
 from neutron.tests.unit.bigswitch import fake_server
 from neutron.tests.unit.bigswitch import test_base
@@ -323,6 +324,57 @@ class TestBigSwitchProxySync(BigSwitchProxyPluginV2TestCase):
         result = plugin_obj._send_all_data()
         self.assertEqual(result[0], 200)
 
+    def test_send_data_records_baseline(self):
+        plugin_obj = manager.NeutronManager.get_plugin()
+        with self.network() as net:
+            plugin_obj._send_all_data()
+            path = servermanager.NETWORKS_PATH % (
+                net['network']['tenant_id'], net['network']['id'])
+            self.assertIn(path, plugin_obj.servers.synced_resources)
+            with patch.object(plugin_obj.servers, 'rest_action') as rest:
+                # nothing changed since the full sync
+                plugin_obj._sync_topology()
+                self.assertFalse(rest.called)
+
+    def test_sync_topology_resends_stale_network(self):
+        plugin_obj = manager.NeutronManager.get_plugin()
+        with self.network() as net:
+            tenant_id = net['network']['tenant_id']
+            plugin_obj._send_all_data()
+            with contextlib.nested(
+                patch.object(plugin_obj.servers, 'rest_action'),
+                patch.object(plugin_obj, '_send_all_data')
+            ) as (rest, send_all):
+                plugin_obj._sync_topology(
+                    stale_path=servermanager.NETWORKS_PATH % (
+                        tenant_id, net['network']['id']))
+                rest.assert_called_once_with(
+                    'POST', servermanager.NET_RESOURCE_PATH % tenant_id,
+                    mock.ANY, mock.ANY)
+                self.assertFalse(send_all.called)
+
+    def test_sync_topology_without_baseline_sends_all_data(self):
+        plugin_obj = manager.NeutronManager.get_plugin()
+        plugin_obj.servers.synced_resources = None
+        with patch.object(plugin_obj, '_send_all_data') as send_all:
+            plugin_obj._sync_topology(triggered_by_tenant='tenant')
+            send_all.assert_called_once_with(
+                send_ports=True, send_floating_ips=True, send_routers=True,
+                triggered_by_tenant='tenant')
+
+    def test_sync_topology_failure_sends_all_data(self):
+        plugin_obj = manager.NeutronManager.get_plugin()
+        with self.network():
+            plugin_obj.servers.synced_resources = {}
+            with contextlib.nested(
+                patch.object(plugin_obj.servers, 'rest_action',
+                             side_effect=servermanager.RemoteRestError(
+                                 reason='broken', status=500)),
+                patch.object(plugin_obj, '_send_all_data')
+            ) as (rest, send_all):
+                plugin_obj._sync_topology(triggered_by_tenant='tenant')
+                self.assertTrue(send_all.called)
+
 
 class TestBigSwitchAddressPairs(test_addr_pair.TestAllowedAddressPairs,
                                 BigSwitchProxyPluginV2TestCase):
@@ -192,7 +192,7 @@ class ServerManagerTests(test_rp.BigSwitchProxyPluginV2TestCase):
         with mock.patch(HTTPCON) as conmock:
             rv = conmock.return_value
             rv.getresponse.return_value.getheader.return_value = 'HASHHEADER'
-            sp.rest_create_network('tenant', 'network')
+            sp.rest_create_network('tenant', {'id': 'network'})
         callheaders = rv.request.mock_calls[0][1][3]
         self.assertIn('Authorization', callheaders)
         self.assertEqual(callheaders['Authorization'],
@@ -327,6 +327,66 @@ class ServerManagerTests(test_rp.BigSwitchProxyPluginV2TestCase):
             # 1 for the first call, 2 for the second with retry
             self.assertEqual(rv.request.call_count, 3)
 
+    def test_keep_alive_connection_reused(self):
+        sp = servermanager.ServerPool()
+        with mock.patch(HTTPCON) as conmock:
+            rv = conmock.return_value
+            rv.getresponse.return_value.getheader.return_value = 'HASH'
+            sp.servers[0].capabilities = ['keep-alive']
+            sp.servers[0].rest_call('GET', '/first')
+            sp.servers[0].rest_call('GET', '/second')
+        self.assertEqual(1, conmock.call_count)
+        self.assertEqual(2, rv.request.call_count)
+        self.assertFalse(rv.close.called)
+        self.assertEqual([rv], list(sp.servers[0].idle_connections))
+
+    def test_no_keep_alive_connection_closed(self):
+        sp = servermanager.ServerPool()
+        with mock.patch(HTTPCON) as conmock:
+            rv = conmock.return_value
+            rv.getresponse.return_value.getheader.return_value = 'HASH'
+            sp.servers[0].rest_call('GET', '/first')
+            sp.servers[0].rest_call('GET', '/second')
+        self.assertEqual(2, conmock.call_count)
+        self.assertEqual(2, rv.close.call_count)
+        self.assertFalse(sp.servers[0].idle_connections)
+
+    def test_socket_error_releases_connection_slot(self):
+        cfg.CONF.set_override('server_connection_pool_size', 1, 'RESTPROXY')
+        sp = servermanager.ServerPool()
+        with mock.patch(HTTPCON) as conmock:
+            rv = conmock.return_value
+            rv.getresponse.return_value.getheader.return_value = 'HASH'
+            rv.getresponse.return_value.status = 200
+            rv.getresponse.return_value.read.return_value = '{}'
+            sp.servers[0].capabilities = ['keep-alive']
+            sp.servers[0].rest_call('GET', '/first')
+            rv.request.side_effect = [socket.error(), mock.MagicMock()]
+            resp = sp.servers[0].rest_call('GET', '/second')
+            self.assertEqual((0, None, None, None), resp)
+            # the broken connection is not cached and its slot is free
+            self.assertFalse(sp.servers[0].idle_connections)
+            resp = sp.servers[0].rest_call('GET', '/third')
+            self.assertEqual(200, resp[0])
+
+    def test_hash_lock_released_before_body_read(self):
+        sp = servermanager.ServerPool()
+        handler = mock.Mock()
+        handler.read_for_update.return_value = 'OLDHASH'
+        with mock.patch(HTTPCON) as conmock:
+            response = conmock.return_value.getresponse.return_value
+            response.status = 200
+            response.getheader.return_value = 'NEWHASH'
+            response.read.return_value = '{}'
+            calls = mock.Mock()
+            calls.attach_mock(handler, 'handler')
+            calls.attach_mock(response.read, 'read')
+            sp.servers[0].rest_call('PUT', '/net', hash_handler=handler)
+        self.assertEqual([mock.call.handler.read_for_update(),
+                          mock.call.handler.put_hash('NEWHASH'),
+                          mock.call.read()],
+                         calls.mock_calls)
+
     def test_socket_error(self):
         sp = servermanager.ServerPool()
         with mock.patch(HTTPCON) as conmock:
@@ -441,6 +501,126 @@ class ServerManagerTests(test_rp.BigSwitchProxyPluginV2TestCase):
                           timeout=None)
             ])
 
+    def test_sync_topology_delta(self):
+        pl = manager.NeutronManager.get_plugin()
+        unchanged = servermanager.TopologyResource('/n/1', {'a': 1})
+        changed = servermanager.TopologyResource('/n/2', {'a': 2},
+                                                 create_path='/n')
+        new = servermanager.TopologyResource('/n/3', {'a': 3},
+                                             create_path='/n')
+        new_port = servermanager.TopologyResource('/n/3/p/1', {'b': 1})
+        intf = servermanager.TopologyResource('/r/1/i/1', {'c': 1},
+                                              create_path='/r/1/i',
+                                              update_by_create=True)
+        pl.servers.synced_resources = {'/n/1': unchanged.digest,
+                                       '/n/2': None,
+                                       '/r/1/i/1': None,
+                                       '/n/4': 'DIGEST',
+                                       '/n/4/p/2': 'DIGEST'}
+        with mock.patch.object(pl.servers, 'rest_action') as rest:
+            sent = pl.servers.sync_topology_delta(
+                [unchanged, changed, new, new_port, intf])
+        self.assertEqual(6, sent)
+        rest.assert_has_calls([
+            mock.call('PUT', '/n/2', {'a': 2}, mock.ANY),
+            mock.call('POST', '/n', {'a': 3}, mock.ANY),
+            mock.call('PUT', '/n/3/p/1', {'b': 1}, mock.ANY),
+            mock.call('POST', '/r/1/i', {'c': 1}, mock.ANY),
+            # children are deleted before their parents
+            mock.call('DELETE', '/n/4/p/2', errstr=mock.ANY),
+            mock.call('DELETE', '/n/4', errstr=mock.ANY)])
+        self.assertEqual(
+            dict((r.path, r.digest)
+                 for r in (unchanged, changed, new, new_port, intf)),
+            pl.servers.synced_resources)
+
+    def test_sync_topology_delta_keeps_concurrent_creates(self):
+        pl = manager.NeutronManager.get_plugin()
+        net = servermanager.TopologyResource('/n/1', {'a': 1})
+        pl.servers.synced_resources = {'/n/1': None,
+                                       '/n/1/p/1': 'DIGEST',
+                                       '/n/1/p/2': 'DIGEST'}
+        port = {'id': 'port', 'network_id': 'net', 'tenant_id': 'tenant',
+                'mac_address': 'mac', 'device_id': 'dev'}
+        port_path = servermanager.ATTACHMENT_PATH % ('tenant', 'net',
+                                                     'port')
+
+        def resources():
+            yield net
+            # API calls run while the sync waits for the backend
+            pl.servers.rest_create_port('tenant', 'net', port)
+            pl.servers._mark_synced('/n/1/p/2')
+
+        with mock.patch.object(pl.servers, 'rest_action') as rest:
+            pl.servers.sync_topology_delta(resources())
+        self.assertNotIn(mock.call('DELETE', port_path, errstr=mock.ANY),
+                         rest.mock_calls)
+        self.assertNotIn(mock.call('DELETE', '/n/1/p/2', errstr=mock.ANY),
+                         rest.mock_calls)
+        rest.assert_any_call('DELETE', '/n/1/p/1', errstr=mock.ANY)
+        self.assertIn(port_path, pl.servers.synced_resources)
+
+    def test_get_topology_resources(self):
+        port = {'id': 'port', 'mac_address': 'mac', 'device_id': 'dev',
+                'attachment': {'id': 'dev', 'mac': 'mac'}}
+        unbound_port = {'id': 'port2', 'mac_address': 'mac2',
+                        'device_id': '', 'attachment': {}}
+        topology = {
+            'networks': [{'id': 'net', 'tenant_id': 'tenant',
+                          'ports': [port, unbound_port]}],
+            'routers': [{'id': 'router', 'tenant_id': 'tenant',
+                         'interfaces': [{'id': 'net'}]}]}
+        resources = list(servermanager.get_topology_resources(topology))
+        self.assertEqual(
+            [servermanager.NETWORKS_PATH % ('tenant', 'net'),
+             servermanager.ATTACHMENT_PATH % ('tenant', 'net', 'port'),
+             servermanager.ROUTERS_PATH % ('tenant', 'router'),
+             servermanager.ROUTER_INTF_PATH % ('tenant', 'router', 'net')],
+            [resource.path for resource in resources])
+        self.assertEqual({'network': {'id': 'net', 'tenant_id': 'tenant'}},
+                         resources[0].data)
+        self.assertEqual({'port': {'id': 'port', 'mac_address': 'mac',
+                                   'device_id': 'dev'},
+                          'attachment': {'id': 'dev', 'mac': 'mac'}},
+                         resources[1].data)
+        self.assertTrue(resources[3].update_by_create)
+        # the topology itself is left untouched
+        self.assertIn('ports', topology['networks'][0])
+
+    def test_conflict_sync_records_baseline_from_topology(self):
+        pl = manager.NeutronManager.get_plugin()
+        topology = {'networks': [{'id': 'net', 'tenant_id': 'tenant'}],
+                    'routers': []}
+        with contextlib.nested(
+            mock.patch(SERVERMANAGER + '.ServerProxy.rest_call',
+                       side_effect=[(httplib.CONFLICT, 0, 0, 0),
+                                    (httplib.OK, 0, 0, 0)]),
+            mock.patch.object(pl.servers, 'get_topo_function',
+                              return_value=topology),
+            mock.patch.object(pl.servers, 'get_topo_resources_function')
+        ) as (srestmock, topo_mock, resources_mock):
+            pl.servers.rest_call('GET', '/', '', None, [])
+        # the digests come from the topology sent, without reading it again
+        self.assertFalse(resources_mock.called)
+        self.assertEqual(
+            [servermanager.NETWORKS_PATH % ('tenant', 'net')],
+            list(pl.servers.synced_resources))
+
+    def test_rest_calls_update_synced_resources(self):
+        pl = manager.NeutronManager.get_plugin()
+        pl.servers.synced_resources = {}
+        net_path = servermanager.NETWORKS_PATH % ('tenant', 'net')
+        port_path = servermanager.ATTACHMENT_PATH % ('tenant', 'net', 'port')
+        with mock.patch.object(pl.servers, 'rest_action'):
+            pl.servers.rest_create_network('tenant', {'id': 'net'})
+            pl.servers.rest_create_port('tenant', 'net',
+                                        {'id': 'port', 'mac_address': 'mac',
+                                         'device_id': 'dev'})
+            self.assertEqual({net_path: None, port_path: None},
+                             pl.servers.synced_resources)
+            pl.servers.rest_delete_network('tenant', 'net')
+            self.assertEqual({}, pl.servers.synced_resources)
+
     def test_conflict_sync_raises_error_without_topology(self):
         pl = manager.NeutronManager.get_plugin()
         pl.servers.get_topo_function = None
@@ -13,10 +13,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import mock
+
 from neutron.common import exceptions
 from neutron import context
 from neutron.db import db_base_plugin_v2 as base_plugin
+from neutron.db import models_v2
 from neutron.db import quota_db
+from neutron import quota as n_quota
 from neutron.tests.unit import testlib_api
 
 
@@ -144,3 +148,126 @@ class TestDbQuotaDriver(testlib_api.SqlTestCase):
         self.assertRaises(exceptions.QuotaResourceUnknown,
                           self.plugin.limit_check, context.get_admin_context(),
                           PROJECT, resources, values)
+
+
+class TestQuotaUsageTracking(testlib_api.SqlTestCase):
+    def setUp(self):
+        super(TestQuotaUsageTracking, self).setUp()
+        self.plugin = FakePlugin()
+        self.context = context.get_admin_context()
+        self.resource = n_quota.QUOTAS.resources['network']
+        quota_db.register_usage_tracking()
+
+    def _create_network(self, tenant_id=PROJECT):
+        return self.plugin.create_network(
+            self.context, {'network': {'name': 'net',
+                                       'admin_state_up': True,
+                                       'shared': False,
+                                       'tenant_id': tenant_id}})
+
+    def _get_usage(self):
+        return self.plugin.get_resource_usage(
+            self.context, self.resource, self.plugin, 'networks', PROJECT)
+
+    def test_usage_synced_when_missing(self):
+        self._create_network()
+        self._create_network()
+        self._create_network(tenant_id='other_prj')
+        self.assertEqual(2, self._get_usage())
+
+    def test_usage_tracked_on_create_and_delete(self):
+        self.assertEqual(0, self._get_usage())
+        net = self._create_network()
+        self._create_network()
+        self._create_network(tenant_id='other_prj')
+        self.plugin.delete_network(self.context, net['id'])
+        with mock.patch.object(self.resource, 'count') as count:
+            self.assertEqual(1, self._get_usage())
+        self.assertFalse(count.called)
+
+    def test_usage_not_updated_on_rollback(self):
+        self.assertEqual(0, self._get_usage())
+        try:
+            with self.context.session.begin():
+                self._create_network()
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual(0, self._get_usage())
+
+    def test_usage_resynced_after_bulk_delete(self):
+        self._create_network()
+        self.assertEqual(1, self._get_usage())
+        with self.context.session.begin():
+            self.context.session.query(models_v2.Network).filter_by(
+                tenant_id=PROJECT).delete()
+        self.assertEqual(0, self._get_usage())
+
+    def test_usage_resynced_after_delete_tenant_quota(self):
+        self._create_network()
+        self.assertEqual(1, self._get_usage())
+        self.plugin.delete_tenant_quota(self.context, PROJECT)
+        with mock.patch.object(self.resource, 'count',
+                               return_value=1) as count:
+            self.assertEqual(1, self._get_usage())
+        self.assertTrue(count.called)
+
+    def test_usage_dirty_after_create_racing_resync(self):
+        with self.context.session.begin():
+            self._create_network()
+            # A resync which did not see the uncommitted network records
+            # its count in the meantime
+            self.context.session.add(quota_db.QuotaUsage(
+                resource='network', tenant_id=PROJECT, in_use=0))
+        self.assertEqual(1, self._get_usage())
+
+    def test_usage_not_written_before_commit(self):
+        self.assertEqual(0, self._get_usage())
+        query = self.context.session.query(quota_db.QuotaUsage.in_use)
+        with self.context.session.begin():
+            self._create_network()
+            self.assertEqual(0, query.scalar())
+        self.assertEqual(1, query.scalar())
+
+    def test_usage_dirty_after_create_overlapping_resync(self):
+        self.assertEqual(0, self._get_usage())
+        with self.context.session.begin():
+            self._create_network()
+            # A resync which may have counted the network once committed
+            self.context.session.query(quota_db.QuotaUsage).update(
+                {'generation': quota_db.QuotaUsage.generation + 1})
+        usage = self.context.session.query(quota_db.QuotaUsage).one()
+        self.assertTrue(usage.dirty)
+        self.assertEqual(0, usage.in_use)
+        self.assertEqual(1, self._get_usage())
+
+    def test_dirty_usage_updated_on_create(self):
+        self.assertEqual(0, self._get_usage())
+        self.plugin.delete_tenant_quota(self.context, PROJECT)
+        self._create_network()
+        usage = self.context.session.query(quota_db.QuotaUsage).filter_by(
+            resource='network', tenant_id=PROJECT).one()
+        self.assertTrue(usage.dirty)
+        self.assertEqual(1, usage.in_use)
+
+    def test_usage_tracked_only_by_db_driver(self):
+        with mock.patch.object(quota_db, 'register_usage_tracking') as reg:
+            n_quota.QuotaEngine(
+                quota_driver_class=n_quota.QUOTA_CONF_DRIVER).get_driver()
+            self.assertFalse(reg.called)
+            n_quota.QuotaEngine(
+                quota_driver_class=n_quota.QUOTA_DB_DRIVER).get_driver()
+            self.assertTrue(reg.called)
+
+    def test_quota_engine_count_reads_usage(self):
+        engine = n_quota.QuotaEngine(quota_driver_class=self.plugin)
+        engine.register_resource(self.resource)
+        self._create_network()
+        self.assertEqual(1, engine.count(self.context, 'network',
+                                         self.plugin, 'networks', PROJECT))
+        self._create_network()
+        with mock.patch.object(self.resource, 'count') as count:
+            self.assertEqual(2, engine.count(self.context, 'network',
+                                             self.plugin, 'networks',
+                                             PROJECT))
+        self.assertFalse(count.called)
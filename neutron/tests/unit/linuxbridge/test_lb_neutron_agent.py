@@ -281,6 +281,64 @@ class TestLinuxBridgeAgent(base.BaseTestCase):
         self._test_scan_devices(previous, updated, fake_current, expected,
                                 sync=True)
 
+    def test_scan_device_events(self):
+        previous = {'current': set(['tap1', 'tap2']),
+                    'updated': set(['tap1']),
+                    'added': set(['tap2']),
+                    'removed': set()}
+        events = [('tap3', False), ('eth1', False), ('tap1', True),
+                  ('tap4', False), ('tap4', True), ('tap2', False)]
+        expected = {'current': set(['tap2', 'tap3']),
+                    'updated': set(),
+                    'added': set(['tap3']),
+                    'removed': set(['tap1'])}
+        self.assertEqual(expected,
+                         self.agent.scan_device_events(previous, events))
+
+    def test_process_device_events(self):
+        device_info = {'current': set(['tap1']),
+                       'updated': set(),
+                       'added': set(),
+                       'removed': set()}
+        self.agent.device_monitor = mock.Mock()
+        self.agent.device_monitor.get_events.side_effect = [
+            [('tap2', False)], []]
+        with contextlib.nested(
+            mock.patch.object(linuxbridge_neutron_agent, 'time'),
+            mock.patch.object(self.agent, 'process_network_devices',
+                              return_value=False)
+        ) as (time_mock, process_fn):
+            time_mock.time.side_effect = [0, 1, 2]
+            device_info, sync = self.agent._process_device_events(
+                device_info, 2)
+        self.assertFalse(sync)
+        self.assertEqual(set(['tap1', 'tap2']), device_info['current'])
+        process_fn.assert_called_once_with(
+            {'current': set(['tap1', 'tap2']),
+             'updated': set(),
+             'added': set(['tap2']),
+             'removed': set()})
+        self.agent.device_monitor.get_events.assert_has_calls(
+            [mock.call(timeout=2), mock.call(timeout=1)])
+
+    def test_process_device_events_sync_on_error(self):
+        device_info = {'current': set(),
+                       'updated': set(),
+                       'added': set(),
+                       'removed': set()}
+        self.agent.device_monitor = mock.Mock()
+        self.agent.device_monitor.get_events.return_value = [('tap2', False)]
+        with contextlib.nested(
+            mock.patch.object(linuxbridge_neutron_agent, 'time'),
+            mock.patch.object(self.agent, 'process_network_devices',
+                              side_effect=Exception())
+        ) as (time_mock, process_fn):
+            time_mock.time.return_value = 0
+            device_info, sync = self.agent._process_device_events(
+                device_info, 2)
+        self.assertTrue(sync)
+        self.assertEqual(1, self.agent.device_monitor.get_events.call_count)
+
     def test_process_network_devices(self):
         agent = self.agent
         device_info = {'current': set(),
@@ -1041,6 +1099,86 @@ class TestLinuxBridgeRpcCallbacks(base.BaseTestCase):
             ]
             execute_fn.assert_has_calls(expected)
 
+    def test_fdb_add_batch(self):
+        cfg.CONF.set_override('batch_fdb_updates', True, 'VXLAN')
+        fdb_entries = {'net_id':
+                       {'ports':
+                        {'agent_ip': [constants.FLOODING_ENTRY,
+                                      ['port_mac', 'port_ip'],
+                                      ['mac_2', 'ip_2']],
+                         LOCAL_IP: [['local_mac', 'local_ip']]},
+                        'network_type': 'vxlan',
+                        'segment_id': 1}}
+        fdb_show = ('mac_2 dst agent_ip self permanent\n'
+                    '00:00:00:00:00:00 dst other_ip self permanent\n')
+        neigh_show = 'ip_2 lladdr mac_2 PERMANENT\n'
+
+        with mock.patch.object(utils, 'execute',
+                               side_effect=[fdb_show, neigh_show, '', ''],
+                               ) as execute_fn:
+            self.lb_rpc.fdb_add(None, fdb_entries)
+
+            expected = [
+                mock.call(['bridge', 'fdb', 'show', 'dev', 'vxlan-1'],
+                          root_helper=self.root_helper),
+                mock.call(['ip', 'neigh', 'show', 'dev', 'vxlan-1'],
+                          root_helper=self.root_helper),
+                mock.call(['ip', '-force', '-batch', '-'],
+                          root_helper=self.root_helper,
+                          process_input='neigh replace port_ip lladdr '
+                                        'port_mac dev vxlan-1 nud '
+                                        'permanent\n',
+                          check_exit_code=False),
+                mock.call(['bridge', '-force', '-batch', '-'],
+                          root_helper=self.root_helper,
+                          process_input='fdb append %s dev vxlan-1 dst '
+                                        'agent_ip\n'
+                                        'fdb add port_mac dev vxlan-1 dst '
+                                        'agent_ip\n' %
+                                        constants.FLOODING_ENTRY[0],
+                          check_exit_code=False),
+            ]
+            self.assertEqual(expected, execute_fn.call_args_list)
+
+    def test_fdb_remove_batch(self):
+        cfg.CONF.set_override('batch_fdb_updates', True, 'VXLAN')
+        fdb_entries = {'net_id':
+                       {'ports':
+                        {'agent_ip': [constants.FLOODING_ENTRY,
+                                      ['port_mac', 'port_ip'],
+                                      ['mac_2', 'ip_2']]},
+                        'network_type': 'vxlan',
+                        'segment_id': 1}}
+        fdb_show = ('port_mac dst agent_ip self permanent\n'
+                    '00:00:00:00:00:00 dst agent_ip self permanent\n')
+        neigh_show = 'port_ip lladdr port_mac PERMANENT\n'
+
+        with mock.patch.object(utils, 'execute',
+                               side_effect=[fdb_show, neigh_show, '', ''],
+                               ) as execute_fn:
+            self.lb_rpc.fdb_remove(None, fdb_entries)
+
+            expected = [
+                mock.call(['bridge', 'fdb', 'show', 'dev', 'vxlan-1'],
+                          root_helper=self.root_helper),
+                mock.call(['ip', 'neigh', 'show', 'dev', 'vxlan-1'],
+                          root_helper=self.root_helper),
+                mock.call(['bridge', '-force', '-batch', '-'],
+                          root_helper=self.root_helper,
+                          process_input='fdb del %s dev vxlan-1 dst '
+                                        'agent_ip\n'
+                                        'fdb del port_mac dev vxlan-1 dst '
+                                        'agent_ip\n' %
+                                        constants.FLOODING_ENTRY[0],
+                          check_exit_code=False),
+                mock.call(['ip', '-force', '-batch', '-'],
+                          root_helper=self.root_helper,
+                          process_input='neigh del port_ip lladdr port_mac '
+                                        'dev vxlan-1\n',
+                          check_exit_code=False),
+            ]
+            self.assertEqual(expected, execute_fn.call_args_list)
+
     def test_fdb_update_chg_ip(self):
         fdb_entries = {'chg_ip':
                        {'net_id':
@@ -901,12 +901,25 @@ class TestL2PopulationMechDriver(base.BaseTestCase):
         mech_driver = l2pop_mech_driver.L2populationMechanismDriver()
         agent = mock.Mock()
         agent.host = HOST
-        network_ports = ((None, agent),)
-        with mock.patch.object(l2pop_db.L2populationDbMixin,
-                               'get_agent_ip',
-                               return_value=agent_ip):
-            excluded_host = HOST + '-EXCLUDE' if exclude_host else HOST
-            return mech_driver._get_tunnels(network_ports, excluded_host)
+        network_ports = mock.Mock()
+        network_ports.all.return_value = [(None, agent)]
+        excluded_host = mock.Mock()
+        excluded_host.host = HOST + '-EXCLUDE' if exclude_host else HOST
+        with contextlib.nested(
+                mock.patch.object(l2pop_db.L2populationDbMixin,
+                                  'get_agent_ip',
+                                  return_value=agent_ip),
+                mock.patch.object(l2pop_db.L2populationDbMixin,
+                                  'get_nondvr_active_network_ports',
+                                  return_value=mock.Mock(
+                                      all=mock.Mock(return_value=[]))),
+                mock.patch.object(l2pop_db.L2populationDbMixin,
+                                  'get_dvr_active_network_ports',
+                                  return_value=network_ports)):
+            segment = {'segmentation_id': 1, 'network_type': 'vxlan'}
+            agent_fdb = mech_driver._create_agent_fdb(
+                mock.Mock(), excluded_host, segment, 'network_id')
+        return agent_fdb['network_id']['ports']
 
     def test_get_tunnels(self):
         tunnels = self._test_get_tunnels('20.0.0.1')
@@ -917,7 +930,7 @@ class TestL2PopulationMechDriver(base.BaseTestCase):
         self.assertEqual(0, len(tunnels))
 
     def test_get_tunnels_dont_exclude_host(self):
-        tunnels = self._test_get_tunnels(None, exclude_host=False)
+        tunnels = self._test_get_tunnels('20.0.0.1', exclude_host=False)
         self.assertEqual(0, len(tunnels))
 
     def _test_create_agent_fdb(self, fdb_network_ports_query, agent_ips):
@@ -994,3 +1007,111 @@ class TestL2PopulationMechDriver(base.BaseTestCase):
                            {'10.0.0.1':
                             [constants.FLOODING_ENTRY]}}
         self.assertEqual(expected_result, result)
+
+    def test_create_agent_fdb_gets_agent_ip_once(self):
+        binding = mock.Mock()
+        binding.port = {'mac_address': '00:00:DE:AD:BE:EF',
+                        'fixed_ips': [{'ip_address': '1.1.1.1'}]}
+        fdb_network_ports_query, fdb_agent = (
+            self._mock_network_ports_query(HOST + '2', binding))
+        fdb_network_ports_query.return_value.all.return_value *= 3
+        mech_driver = l2pop_mech_driver.L2populationMechanismDriver()
+        with contextlib.nested(
+                mock.patch.object(l2pop_db.L2populationDbMixin,
+                                  'get_agent_ip',
+                                  return_value='20.0.0.1'),
+                mock.patch.object(l2pop_db.L2populationDbMixin,
+                                  'get_nondvr_active_network_ports',
+                                  new=fdb_network_ports_query),
+                mock.patch.object(l2pop_db.L2populationDbMixin,
+                                  'get_dvr_active_network_ports',
+                                  return_value=mock.Mock(
+                                      all=mock.Mock(return_value=[])))
+        ) as (get_agent_ip, _, _):
+            agent = mock.Mock()
+            agent.host = HOST
+            segment = {'segmentation_id': 1, 'network_type': 'vxlan'}
+            agent_fdb = mech_driver._create_agent_fdb(
+                mock.Mock(), agent, segment, 'network_id')
+        self.assertEqual(4, len(agent_fdb['network_id']['ports']['20.0.0.1']))
+        self.assertEqual(1, get_agent_ip.call_count)
+
+
+class TestL2PopulationAgentNotifyAPI(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestL2PopulationAgentNotifyAPI, self).setUp()
+        self.config(fanout_batch_interval=1, group='l2pop')
+        with mock.patch('neutron.common.rpc.get_client'):
+            self.notifier = l2pop_rpc.L2populationAgentNotifyAPI()
+        self.mock_fanout = mock.patch.object(
+            self.notifier, '_notification_fanout').start()
+        self.mock_spawn = mock.patch(
+            'eventlet.greenthread.spawn_after').start()
+        self.port1 = l2pop_rpc.PortInfo('00:00:DE:AD:BE:EF', '1.1.1.1')
+        self.port2 = l2pop_rpc.PortInfo('00:00:DE:AD:BE:FF', '1.1.1.2')
+
+    def _fdb_entries(self, network_id, agent_ip, port_infos):
+        return {network_id: {'segment_id': 1,
+                             'network_type': 'vxlan',
+                             'ports': {agent_ip: port_infos}}}
+
+    def test_fanouts_batched(self):
+        ctx = mock.Mock()
+        self.notifier.add_fdb_entries(
+            ctx, self._fdb_entries('net1', '20.0.0.1',
+                                   [constants.FLOODING_ENTRY, self.port1]))
+        self.notifier.add_fdb_entries(
+            ctx, self._fdb_entries('net2', '20.0.0.2', [self.port2]))
+        self.notifier.remove_fdb_entries(
+            ctx, self._fdb_entries('net1', '20.0.0.3', [self.port2]))
+        self.assertFalse(self.mock_fanout.called)
+        self.mock_spawn.assert_called_once_with(
+            1, self.notifier._flush_fanouts, ctx)
+
+        self.notifier._flush_fanouts(ctx)
+        expected_add = self._fdb_entries(
+            'net1', '20.0.0.1', [constants.FLOODING_ENTRY, self.port1])
+        expected_add.update(self._fdb_entries('net2', '20.0.0.2',
+                                              [self.port2]))
+        self.mock_fanout.assert_has_calls([
+            mock.call(ctx, 'remove_fdb_entries',
+                      self._fdb_entries('net1', '20.0.0.3', [self.port2])),
+            mock.call(ctx, 'add_fdb_entries', expected_add)])
+        self.assertEqual(2, self.mock_fanout.call_count)
+
+    def test_added_and_removed_entries_not_sent(self):
+        ctx = mock.Mock()
+        self.notifier.add_fdb_entries(
+            ctx, self._fdb_entries('net1', '20.0.0.1',
+                                   [constants.FLOODING_ENTRY, self.port1]))
+        self.notifier.remove_fdb_entries(
+            ctx, self._fdb_entries('net1', '20.0.0.1',
+                                   [constants.FLOODING_ENTRY, self.port1]))
+        self.notifier.add_fdb_entries(
+            ctx, self._fdb_entries('net1', '20.0.0.1', [self.port2]))
+        self.notifier._flush_fanouts(ctx)
+        self.mock_fanout.assert_called_once_with(
+            ctx, 'add_fdb_entries',
+            self._fdb_entries('net1', '20.0.0.1', [self.port2]))
+
+    def test_update_sends_pending_entries_first(self):
+        ctx = mock.Mock()
+        self.notifier.add_fdb_entries(
+            ctx, self._fdb_entries('net1', '20.0.0.1', [self.port1]))
+        chg_ip = {'chg_ip': {'net1': {'20.0.0.1': {'after': [self.port2]}}}}
+        self.notifier.update_fdb_entries(ctx, chg_ip)
+        self.assertTrue(self.mock_spawn.return_value.cancel.called)
+        self.mock_fanout.assert_has_calls([
+            mock.call(ctx, 'add_fdb_entries',
+                      self._fdb_entries('net1', '20.0.0.1', [self.port1])),
+            mock.call(ctx, 'update_fdb_entries', chg_ip)])
+
+    def test_fanouts_not_batched(self):
+        self.config(fanout_batch_interval=0, group='l2pop')
+        ctx = mock.Mock()
+        fdb_entries = self._fdb_entries('net1', '20.0.0.1', [self.port1])
+        self.notifier.add_fdb_entries(ctx, fdb_entries)
+        self.mock_fanout.assert_called_once_with(ctx, 'add_fdb_entries',
+                                                 fdb_entries)
+        self.assertFalse(self.mock_spawn.called)
@@ -660,6 +660,10 @@ class OvsAgentSchedulerTestCase(OvsAgentSchedulerTestCaseBase):
 
             plugin = manager.NeutronManager.get_service_plugins().get(
                 service_constants.L3_ROUTER_NAT)
+            # reschedule the router on its own
+            mock.patch.object(plugin.router_scheduler,
+                              'get_routers_placement',
+                              return_value={}).start()
             mock.patch.object(
                 plugin, 'reschedule_router',
                 side_effect=[
@@ -687,6 +691,9 @@ class OvsAgentSchedulerTestCase(OvsAgentSchedulerTestCaseBase):
             # schedule the routers to host A
             l3_rpc_cb.sync_routers(self.adminContext, host=L3_HOSTA)
 
+            mock.patch.object(plugin.router_scheduler,
+                              'get_routers_placement',
+                              return_value={}).start()
             rs_mock = mock.patch.object(
                 plugin, 'reschedule_router',
                 side_effect=l3agentscheduler.RouterReschedulingFailed(
@@ -724,6 +731,53 @@ class OvsAgentSchedulerTestCase(OvsAgentSchedulerTestCaseBase):
             ret_b = l3_rpc_cb.sync_routers(self.adminContext, host=L3_HOSTB)
         self.assertEqual(ret_b, ret_a)
 
+    def test_routers_rescheduled_at_once_from_dead_agent(self):
+        plugin = manager.NeutronManager.get_service_plugins().get(
+            service_constants.L3_ROUTER_NAT)
+        l3_rpc_cb = l3_rpc.L3RpcCallback()
+        self._register_agent_states()
+        with contextlib.nested(self.router(), self.router()) as (r1, r2):
+            # schedule the routers to host A
+            l3_rpc_cb.sync_routers(self.adminContext, host=L3_HOSTA)
+            notifier = mock.Mock()
+            with contextlib.nested(
+                mock.patch.dict(plugin.agent_notifiers,
+                                {constants.AGENT_TYPE_L3: notifier}),
+                mock.patch.object(plugin, 'reschedule_router'),
+                mock.patch.object(l3_agentschedulers_db.agentschedulers_db,
+                                  'RESCHEDULE_BATCH_SIZE', new=1)
+            ) as (_, rr, _):
+                self._take_down_agent_and_run_reschedule(L3_HOSTA)
+            self.assertFalse(rr.called)
+            router_ids = set([r1['router']['id'], r2['router']['id']])
+            notifier.router_added_to_agent.assert_called_once_with(
+                mock.ANY, mock.ANY, L3_HOSTB)
+            self.assertEqual(
+                router_ids,
+                set(notifier.router_added_to_agent.call_args[0][1]))
+            self.assertEqual(2, notifier.router_removed_from_agent.call_count)
+            hostb_id = self._get_agent_id(constants.AGENT_TYPE_L3, L3_HOSTB)
+            routers = plugin.list_routers_on_l3_agent(
+                self.adminContext, hostb_id)['routers']
+            self.assertEqual(router_ids,
+                             set(router['id'] for router in routers))
+
+    def test_routers_rescheduled_one_by_one_on_batch_failure(self):
+        plugin = manager.NeutronManager.get_service_plugins().get(
+            service_constants.L3_ROUTER_NAT)
+        l3_rpc_cb = l3_rpc.L3RpcCallback()
+        self._register_agent_states()
+        with self.router() as r:
+            # schedule the router to host A
+            l3_rpc_cb.sync_routers(self.adminContext, host=L3_HOSTA)
+            with contextlib.nested(
+                mock.patch.object(plugin, '_replace_router_bindings',
+                                  side_effect=db_exc.DBError),
+                mock.patch.object(plugin, 'reschedule_router')
+            ) as (_, rr):
+                self._take_down_agent_and_run_reschedule(L3_HOSTA)
+            rr.assert_called_once_with(mock.ANY, r['router']['id'])
+
     def test_router_no_reschedule_from_dead_admin_down_agent(self):
         with self.router() as r:
             l3_rpc_cb = l3_rpc.L3RpcCallback()
@@ -280,11 +280,35 @@ class TestOvsNeutronAgent(base.BaseTestCase):
             added=set([3]), current=vif_port_set,
             removed=set([2]), updated=set([1])
         )
-        with mock.patch.dict(self.agent.local_vlan_map, local_vlan_map):
+        with contextlib.nested(
+            mock.patch.dict(self.agent.local_vlan_map, local_vlan_map),
+            mock.patch.dict(self.agent.vif_net_uuids, {port.vif_id: '1'})
+        ):
             actual = self.mock_scan_ports(
                 vif_port_set, registered_ports, port_tags_dict=port_tags_dict)
         self.assertEqual(expected, actual)
 
+    def test_check_changed_vlans(self):
+        br = ovs_lib.OVSBridge('br-int', 'sudo')
+        port1 = ovs_lib.VifPort('tap1', 1, 'vif1', 'ca:fe:de:ad:be:e1', br)
+        port2 = ovs_lib.VifPort('tap2', 2, 'vif2', 'ca:fe:de:ad:be:e2', br)
+        local_vlan_map = {
+            'net1': ovs_neutron_agent.LocalVLANMapping(
+                1, 'vlan', None, 1, {port1.vif_id: port1}),
+            'net2': ovs_neutron_agent.LocalVLANMapping(
+                2, 'vlan', None, 2, {port2.vif_id: port2})}
+        vif_net_uuids = {'vif1': 'net1', 'vif2': 'net2'}
+        with contextlib.nested(
+            mock.patch.dict(self.agent.local_vlan_map, local_vlan_map),
+            mock.patch.dict(self.agent.vif_net_uuids, vif_net_uuids),
+            mock.patch.object(self.agent.int_br, 'get_port_tag_dict',
+                              return_value={'tap1': 1, 'tap2': 1})
+        ):
+            self.assertEqual(
+                set(['vif2']),
+                self.agent.check_changed_vlans(set(['vif1', 'vif2',
+                                                    'vif3'])))
+
     def test_treat_devices_added_returns_raises_for_missing_device(self):
         with contextlib.nested(
             mock.patch.object(self.agent.plugin_rpc,
@@ -655,17 +679,31 @@ class TestOvsNeutronAgent(base.BaseTestCase):
             self.agent.port_unbound("vif3", "netuid12345")
             self.assertEqual(reclvl_fn.call_count, 2)
 
+    def test_port_unbound_removes_vif_net_uuid(self):
+        with mock.patch.object(self.agent, "reclaim_local_vlan"):
+            lvm = mock.Mock()
+            lvm.vif_ports = {"vif1": mock.Mock(), "vif2": mock.Mock()}
+            self.agent.local_vlan_map["netuid12345"] = lvm
+            self.agent.vif_net_uuids = {"vif1": "netuid12345",
+                                        "vif2": "netuid12345"}
+            self.agent.port_unbound("vif1")
+            self.assertEqual({"vif2": "netuid12345"},
+                             self.agent.vif_net_uuids)
+            self.assertEqual("netuid12345", self.agent.get_net_uuid("vif2"))
+
     def _prepare_l2_pop_ofports(self):
         lvm1 = mock.Mock()
         lvm1.network_type = 'gre'
         lvm1.vlan = 'vlan1'
         lvm1.segmentation_id = 'seg1'
         lvm1.tun_ofports = set(['1'])
+        lvm1.vif_ports = {}
         lvm2 = mock.Mock()
         lvm2.network_type = 'gre'
         lvm2.vlan = 'vlan2'
         lvm2.segmentation_id = 'seg2'
         lvm2.tun_ofports = set(['1', '2'])
+        lvm2.vif_ports = {}
         self.agent.local_vlan_map = {'net1': lvm1, 'net2': lvm2}
         self.agent.tun_br_ofports = {'gre':
                                      {'1.1.1.1': '1', '2.2.2.2': '2'}}
@@ -792,6 +830,36 @@ class TestOvsNeutronAgent(base.BaseTestCase):
             ]
             do_action_flows_fn.assert_has_calls(expected_calls)
 
+    def test_fdb_del_flows_two_networks(self):
+        self._prepare_l2_pop_ofports()
+        self.agent.local_vlan_map['net1'].tun_ofports = set(['1', '2'])
+        fdb_entry = {'net1':
+                     {'network_type': 'gre',
+                      'segment_id': 'tun1',
+                      'ports': {'1.1.1.1': [n_const.FLOODING_ENTRY],
+                                '2.2.2.2': [n_const.FLOODING_ENTRY]}},
+                     'net2':
+                     {'network_type': 'gre',
+                      'segment_id': 'tun2',
+                      'ports': {'2.2.2.2': [n_const.FLOODING_ENTRY]}}}
+        with contextlib.nested(
+            mock.patch.object(self.agent.tun_br, 'deferred'),
+            mock.patch.object(self.agent.tun_br, 'do_action_flows'),
+            mock.patch.object(self.agent.tun_br, 'delete_port'),
+        ) as (deferred_fn, do_action_flows_fn, delete_port_fn):
+            deferred_fn.return_value = ovs_lib.DeferredOVSBridge(
+                self.agent.tun_br)
+            self.agent.fdb_remove(None, fdb_entry)
+            deferred_fn.assert_called_once_with()
+            self.assertEqual(
+                ['del', 'mod'],
+                sorted(c[0][0] for c in do_action_flows_fn.call_args_list))
+            delete_port_fn.assert_called_once_with('gre-02020202')
+        self.assertEqual(set(),
+                         self.agent.local_vlan_map['net1'].tun_ofports)
+        self.assertEqual(set(['1']),
+                         self.agent.local_vlan_map['net2'].tun_ofports)
+
     def test_fdb_add_port(self):
         self._prepare_l2_pop_ofports()
         fdb_entry = {'net1':
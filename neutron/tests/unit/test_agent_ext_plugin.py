@@ -14,8 +14,10 @@
 #    under the License.
 
 import copy
+import datetime
 import time
 
+import mock
 from oslo_config import cfg
 from oslo_utils import timeutils
 from webob import exc
@@ -27,6 +29,7 @@ from neutron import context
 from neutron.db import agents_db
 from neutron.db import db_base_plugin_v2
 from neutron.extensions import agent
+from neutron import manager
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import uuidutils
 from neutron.tests.unit import test_api_v2
@@ -251,3 +254,177 @@ class AgentDBTestCase(AgentDBTestMixIn,
         agents = self._list_agents(
             query_string='binary=neutron-l3-agent&host=' + L3_HOSTB)
         self.assertFalse(agents['agents'][0]['alive'])
+
+    def _report_heartbeat(self, callback, agent_state):
+        callback.report_state(self.adminContext,
+                              agent_state={'agent_state': agent_state},
+                              time=timeutils.strtime())
+
+    def _get_dhcp_agent(self, host=DHCP_HOST1):
+        plugin = manager.NeutronManager.get_plugin()
+        return plugin._get_agent_by_type_and_host(
+            self.adminContext, constants.AGENT_TYPE_DHCP, host)
+
+    def test_heartbeats_are_buffered(self):
+        dhcp_host = self._register_one_dhcp_agent()[0]
+        callback = agents_db.AgentExtRpcCallback()
+        plugin = manager.NeutronManager.get_plugin()
+        with mock.patch.object(agents_db.greenthread,
+                               'spawn_after') as spawn_after:
+            self._report_heartbeat(callback, dhcp_host)
+            heartbeat = timeutils.utcnow() + datetime.timedelta(seconds=10)
+            with mock.patch.object(plugin, 'create_or_update_agent') as cu:
+                with mock.patch.object(timeutils, 'utcnow',
+                                       return_value=heartbeat):
+                    self._report_heartbeat(callback, dhcp_host)
+                    self._report_heartbeat(callback, dhcp_host)
+                self.assertFalse(cu.called)
+            spawn_after.assert_called_once_with(
+                cfg.CONF.agent_heartbeat_flush_interval,
+                callback._flush_heartbeats)
+
+        callback._flush_heartbeats()
+        self.assertEqual(heartbeat,
+                         self._get_dhcp_agent().heartbeat_timestamp)
+        self.assertEqual({}, callback._heartbeats)
+
+    def test_changed_configurations_are_written(self):
+        dhcp_host = self._register_one_dhcp_agent()[0]
+        callback = agents_db.AgentExtRpcCallback()
+        self._report_heartbeat(callback, dhcp_host)
+        dhcp_host['configurations']['networks'] = 3
+        self._report_heartbeat(callback, dhcp_host)
+        self.assertEqual({}, callback._heartbeats)
+        self.assertIn('"networks": 3',
+                      self._get_dhcp_agent().configurations)
+
+    def test_heartbeats_with_new_stats_are_buffered(self):
+        dhcp_host = self._register_one_dhcp_agent()[0]
+        callback = agents_db.AgentExtRpcCallback()
+        plugin = manager.NeutronManager.get_plugin()
+        with mock.patch.object(agents_db.greenthread, 'spawn_after'):
+            dhcp_host['configurations']['command_stats'] = {'ip': 1}
+            self._report_heartbeat(callback, dhcp_host)
+            dhcp_host['configurations']['command_stats'] = {'ip': 2}
+            with mock.patch.object(plugin, 'create_or_update_agent') as cu:
+                self._report_heartbeat(callback, dhcp_host)
+                self.assertFalse(cu.called)
+                later = timeutils.utcnow() + datetime.timedelta(
+                    seconds=cfg.CONF.agent_stats_write_interval + 1)
+                with mock.patch.object(timeutils, 'utcnow',
+                                       return_value=later):
+                    self._report_heartbeat(callback, dhcp_host)
+                self.assertTrue(cu.called)
+
+    def test_heartbeats_not_buffered_when_disabled(self):
+        cfg.CONF.set_override('agent_heartbeat_flush_interval', 0)
+        dhcp_host = self._register_one_dhcp_agent()[0]
+        callback = agents_db.AgentExtRpcCallback()
+        self._report_heartbeat(callback, dhcp_host)
+        self._report_heartbeat(callback, dhcp_host)
+        self.assertEqual({}, callback._agents)
+        self.assertEqual({}, callback._heartbeats)
+
+    def test_flush_heartbeats_of_deleted_agent(self):
+        dhcp_host = self._register_one_dhcp_agent()[0]
+        callback = agents_db.AgentExtRpcCallback()
+        with mock.patch.object(agents_db.greenthread, 'spawn_after'):
+            self._report_heartbeat(callback, dhcp_host)
+            self._report_heartbeat(callback, dhcp_host)
+        self._delete('agents', self._get_dhcp_agent().id)
+
+        callback._flush_heartbeats()
+        self.assertEqual({}, callback._agents)
+        self._report_heartbeat(callback, dhcp_host)
+        self.assertTrue(self._get_dhcp_agent())
+
+    def test_flush_heartbeats_failure_retries(self):
+        dhcp_host = self._register_one_dhcp_agent()[0]
+        callback = agents_db.AgentExtRpcCallback()
+        plugin = manager.NeutronManager.get_plugin()
+        with mock.patch.object(agents_db.greenthread,
+                               'spawn_after') as spawn_after:
+            self._report_heartbeat(callback, dhcp_host)
+            self._report_heartbeat(callback, dhcp_host)
+            with mock.patch.object(plugin, 'update_agents_heartbeat',
+                                   side_effect=RuntimeError):
+                callback._flush_heartbeats()
+            self.assertEqual(2, spawn_after.call_count)
+        self.assertEqual([self._get_dhcp_agent().id],
+                         list(callback._heartbeats))
+
+    def _get_registered_dhcp_agents(self, **kwargs):
+        return agents_db.agent_registry.get_agents(
+            self.adminContext, constants.AGENT_TYPE_DHCP, **kwargs)
+
+    def test_registry_tracks_reports(self):
+        self._register_one_dhcp_agent()
+        entries = self._get_registered_dhcp_agents()
+        self.assertEqual([self._get_dhcp_agent().id],
+                         [entry['id'] for entry in entries])
+        self.assertEqual('dhcp_driver',
+                         entries[0]['configurations']['dhcp_driver'])
+
+    def test_registry_tracks_buffered_heartbeats(self):
+        dhcp_host = self._register_one_dhcp_agent()[0]
+        callback = agents_db.AgentExtRpcCallback()
+        self._report_heartbeat(callback, dhcp_host)
+        heartbeat = timeutils.utcnow() + datetime.timedelta(seconds=10)
+        with mock.patch.object(agents_db.greenthread, 'spawn_after'):
+            with mock.patch.object(timeutils, 'utcnow',
+                                   return_value=heartbeat):
+                self._report_heartbeat(callback, dhcp_host)
+        entry = self._get_registered_dhcp_agents()[0]
+        self.assertEqual(heartbeat, entry['heartbeat_timestamp'])
+        # reloading the registry keeps the heartbeat not written yet
+        agents_db.agent_registry.refresh(self.adminContext)
+        entry = self._get_registered_dhcp_agents()[0]
+        self.assertEqual(heartbeat, entry['heartbeat_timestamp'])
+
+    def test_registry_tracks_updates_and_deletes(self):
+        self._register_one_dhcp_agent()
+        agent_id = self._get_dhcp_agent().id
+        self._update('agents', agent_id,
+                     {'agent': {'admin_state_up': False}})
+        self.assertEqual([], self._get_registered_dhcp_agents())
+        self.assertEqual(
+            1, len(self._get_registered_dhcp_agents(admin_state_up=None)))
+        self._delete('agents', agent_id)
+        self.assertEqual(
+            [], self._get_registered_dhcp_agents(admin_state_up=None))
+
+    def test_registry_filters_dead_agents(self):
+        self._register_one_dhcp_agent()
+        with mock.patch.object(agents_db.AgentDbMixin, 'is_agent_down',
+                               return_value=True):
+            self.assertEqual([], self._get_registered_dhcp_agents())
+            self.assertEqual(
+                1, len(self._get_registered_dhcp_agents(alive=False)))
+
+    def test_registry_reuses_parsed_configurations(self):
+        self._register_one_dhcp_agent()
+        agent_db = self._get_dhcp_agent()
+        plugin = manager.NeutronManager.get_plugin()
+        conf = plugin.get_configuration_dict(agent_db)
+        with mock.patch.object(agents_db.jsonutils, 'loads') as loads:
+            agents_db.agent_registry.refresh(self.adminContext)
+            self.assertIs(conf, plugin.get_configuration_dict(agent_db))
+            self.assertFalse(loads.called)
+
+    def test_registry_sees_agents_of_other_workers(self):
+        self.assertEqual([], self._get_registered_dhcp_agents())
+        with mock.patch.object(agents_db.agent_registry, 'update'):
+            self._register_one_dhcp_agent()
+        # an empty lookup reloads the registry from the database
+        self.assertEqual(1, len(self._get_registered_dhcp_agents()))
+
+    def test_registry_reloaded_when_stale(self):
+        self._register_one_dhcp_agent()
+        registry = agents_db.agent_registry
+        registry.refresh(self.adminContext)
+        with mock.patch.object(registry, 'refresh') as refresh:
+            self._get_registered_dhcp_agents()
+            self.assertFalse(refresh.called)
+            cfg.CONF.set_override('agent_registry_refresh_interval', 0)
+            self._get_registered_dhcp_agents()
+            refresh.assert_called_once_with(self.adminContext)
@@ -327,6 +327,7 @@ class TestDhcpAgent(base.BaseTestCase):
             plug.return_value = mock_plugin
 
             dhcp = dhcp_agent.DhcpAgent(HOSTNAME)
+            dhcp._use_change_feed = False
 
             attrs_to_mock = dict(
                 [(a, mock.DEFAULT) for a in
@@ -334,6 +335,7 @@ class TestDhcpAgent(base.BaseTestCase):
 
             with mock.patch.multiple(dhcp, **attrs_to_mock) as mocks:
                 mocks['cache'].get_network_ids.return_value = known_networks
+                mocks['cache'].get_revisions.return_value = {}
                 dhcp.sync_state()
 
                 exp_refresh = [
@@ -371,10 +373,77 @@ class TestDhcpAgent(base.BaseTestCase):
             self._test_sync_state_helper(known_networks, active_networks)
             w.assert_called_once_with()
 
+    def test_sync_state_initial_uses_change_feed(self):
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            network = dhcp.NetModel(True, dict(id='a', revision='1'))
+            mock_plugin.get_active_networks_changed.return_value = (
+                [network], set(['a']))
+            plug.return_value = mock_plugin
+            dhcp_agent_ = dhcp_agent.DhcpAgent(HOSTNAME)
+            with mock.patch.object(
+                    dhcp_agent_,
+                    'safe_configure_dhcp_for_network') as configure:
+                dhcp_agent_.sync_state()
+            mock_plugin.get_active_networks_changed.assert_called_once_with(
+                {})
+            self.assertFalse(mock_plugin.get_active_networks_info.called)
+            configure.assert_called_once_with(network)
+
+    def _test_sync_state_change_feed(self, networks=None):
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            changed = dhcp.NetModel(True, dict(id='b', revision='2'))
+            mock_plugin.get_active_networks_changed.return_value = (
+                [changed], set(['a', 'b']))
+            plug.return_value = mock_plugin
+            dhcp_agent_ = dhcp_agent.DhcpAgent(HOSTNAME)
+            attrs_to_mock = dict(
+                [(a, mock.DEFAULT) for a in
+                 ['safe_configure_dhcp_for_network', 'disable_dhcp_helper',
+                  'cache']])
+            with mock.patch.multiple(dhcp_agent_, **attrs_to_mock) as mocks:
+                mocks['cache'].get_network_ids.return_value = ['a', 'b', 'c']
+                mocks['cache'].get_revisions.return_value = {'a': '1',
+                                                             'b': '1',
+                                                             'c': '1'}
+                dhcp_agent_.sync_state(networks)
+                self.assertFalse(mock_plugin.get_active_networks_info.called)
+                configure = mocks['safe_configure_dhcp_for_network']
+                configure.assert_called_once_with(changed)
+                mocks['disable_dhcp_helper'].assert_called_once_with('c')
+                return mock_plugin.get_active_networks_changed.call_args[0][0]
+
+    def test_sync_state_change_feed(self):
+        revisions = self._test_sync_state_change_feed()
+        self.assertEqual({'a': '1', 'b': '1', 'c': '1'}, revisions)
+
+    def test_sync_state_change_feed_refetches_resync_networks(self):
+        revisions = self._test_sync_state_change_feed(['b'])
+        self.assertEqual({'a': '1', 'c': '1'}, revisions)
+
+    def test_sync_state_change_feed_unsupported(self):
+        with mock.patch(DHCP_PLUGIN) as plug:
+            mock_plugin = mock.Mock()
+            mock_plugin.get_active_networks_changed.side_effect = (
+                oslo_messaging.UnsupportedVersion('1.2'))
+            mock_plugin.get_active_networks_info.return_value = []
+            plug.return_value = mock_plugin
+            dhcp_agent_ = dhcp_agent.DhcpAgent(HOSTNAME)
+            with mock.patch.object(dhcp_agent_, 'cache') as cache:
+                cache.get_network_ids.return_value = []
+                cache.get_revisions.return_value = {'a': '1'}
+                dhcp_agent_.sync_state()
+                dhcp_agent_.sync_state()
+            self.assertEqual(
+                1, mock_plugin.get_active_networks_changed.call_count)
+            self.assertEqual(
+                2, mock_plugin.get_active_networks_info.call_count)
+
     def test_sync_state_plugin_error(self):
         with mock.patch(DHCP_PLUGIN) as plug:
             mock_plugin = mock.Mock()
-            mock_plugin.get_active_networks_info.side_effect = Exception
+            mock_plugin.get_active_networks_changed.side_effect = Exception
             plug.return_value = mock_plugin
 
             with mock.patch.object(dhcp_agent.LOG, 'exception') as log:
@@ -940,6 +1009,36 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.call_driver.assert_has_calls(
             [mock.call.call_driver('reload_allocations', fake_network)])
 
+    def test_port_update_end_incremental(self):
+        cfg.CONF.set_override('dhcp_incremental_updates', True)
+        cfg.CONF.set_override('port_event_coalesce_interval', 0)
+        payload = dict(port=fake_port2)
+        self.cache.get_network_by_id.return_value = fake_network
+        self.dhcp.port_update_end(None, payload)
+        self.call_driver.assert_called_once_with(
+            'reload_port_allocations', fake_network,
+            port_ids=set([fake_port2.id]))
+        self.assertEqual({}, self.dhcp._pending_port_reloads)
+
+    def test_port_events_coalesced(self):
+        cfg.CONF.set_override('dhcp_incremental_updates', True)
+        cfg.CONF.set_override('port_event_coalesce_interval', 1)
+        self.cache.get_network_by_id.return_value = fake_network
+        self.cache.get_port_by_id.return_value = fake_port1
+        with mock.patch.object(dhcp_agent.eventlet,
+                               'spawn_after') as spawn_after:
+            self.dhcp.port_update_end(None, dict(port=fake_port2))
+            self.dhcp.port_delete_end(None, dict(port_id=fake_port1.id))
+        spawn_after.assert_called_once_with(1, self.dhcp._flush_port_reloads,
+                                            fake_network.id)
+        self.assertFalse(self.call_driver.called)
+
+        self.dhcp._flush_port_reloads(fake_network.id)
+        self.dhcp._network_work._pool.waitall()
+        self.call_driver.assert_called_once_with(
+            'reload_port_allocations', fake_network,
+            port_ids=set([fake_port1.id, fake_port2.id]))
+
     def test_port_delete_end_unknown_port(self):
         payload = dict(port_id='unknown')
         self.cache.get_port_by_id.return_value = None
@@ -983,6 +1082,27 @@ class TestDhcpPluginApiProxy(base.BaseTestCase):
         self._test_dhcp_api('get_network_info', network_id='fake_id',
                             return_value=None)
 
+    def test_get_active_networks_changed(self):
+        proxy = dhcp_agent.DhcpPluginApi('foo', {}, None)
+        with contextlib.nested(
+            mock.patch.object(proxy.client, 'call'),
+            mock.patch.object(proxy.client, 'prepare'),
+        ) as (
+            rpc_mock, prepare_mock
+        ):
+            prepare_mock.return_value = proxy.client
+            rpc_mock.return_value = {'networks': [{'id': 'a'}],
+                                     'active_network_ids': ['a', 'b']}
+            networks, active_ids = proxy.get_active_networks_changed(
+                {'a': '1'})
+            prepare_mock.assert_called_once_with(version='1.2')
+            rpc_mock.assert_called_once_with(
+                {}, 'get_active_networks_changed', revisions={'a': '1'},
+                host=proxy.host)
+            self.assertEqual(['a'], [network.id for network in networks])
+            self.assertIsInstance(networks[0], dhcp.NetModel)
+            self.assertEqual(set(['a', 'b']), active_ids)
+
     def test_get_dhcp_port(self):
         self._test_dhcp_api('get_dhcp_port', network_id='fake_id',
                             device_id='fake_id_2', return_value=None)
@@ -1004,6 +1124,47 @@ class TestDhcpPluginApiProxy(base.BaseTestCase):
                             device_id='fake_id_2', subnet_id='fake_id_3')
 
 
+class TestNetworkWorkQueue(base.BaseTestCase):
+    def setUp(self):
+        super(TestNetworkWorkQueue, self).setUp()
+        self.queue = dhcp_agent.NetworkWorkQueue(4)
+        self.log = []
+
+    def _work(self, name, blocker=None):
+        self.log.append(('start', name))
+        if blocker:
+            blocker.wait()
+        self.log.append(('end', name))
+        return name
+
+    def test_same_network_serialized_in_order(self):
+        blocker = eventlet.event.Event()
+        first = self.queue.add('net1', self._work, 'a', blocker)
+        second = self.queue.add('net1', self._work, 'b')
+        eventlet.sleep(0)
+        self.assertEqual([('start', 'a')], self.log)
+        blocker.send()
+        self.assertEqual('a', first.wait())
+        self.assertEqual('b', second.wait())
+        self.assertEqual([('start', 'a'), ('end', 'a'),
+                          ('start', 'b'), ('end', 'b')], self.log)
+
+    def test_other_network_not_blocked(self):
+        blocker = eventlet.event.Event()
+        self.queue.add('net1', self._work, 'a', blocker)
+        self.assertEqual('b', self.queue.add('net2', self._work, 'b').wait())
+        self.assertNotIn(('end', 'a'), self.log)
+        blocker.send()
+
+    def test_exception_reraised(self):
+        def fail():
+            raise RuntimeError()
+        done = self.queue.add('net1', fail)
+        self.assertRaises(RuntimeError, done.wait)
+        self.assertEqual('a', self.queue.add('net1', self._work, 'a').wait())
+        self.assertEqual({}, self.queue._queues)
+
+
 class TestNetworkCache(base.BaseTestCase):
     def test_put_network(self):
         nc = dhcp_agent.NetworkCache()
@@ -1113,6 +1274,71 @@ class TestNetworkCache(base.BaseTestCase):
         nc.put(fake_network)
         self.assertEqual(nc.get_port_by_id(fake_port1.id), fake_port1)
 
+    def test_remove_port_moves_last_port(self):
+        fake_port3 = dhcp.DictModel(
+            dict(id='12345678-1234-aaaa-123456789003',
+                 network_id='12345678-1234-5678-1234567890ab'))
+        fake_net = dhcp.NetModel(
+            True, dict(id='12345678-1234-5678-1234567890ab',
+                       tenant_id='aaaaaaaa-aaaa-aaaa-aaaaaaaaaaaa',
+                       subnets=[fake_subnet1],
+                       ports=[fake_port1, fake_port2, fake_port3]))
+        nc = dhcp_agent.NetworkCache()
+        nc.put(fake_net)
+        nc.remove_port(fake_port1)
+
+        self.assertEqual([fake_port3, fake_port2], fake_net.ports)
+        self.assertIsNone(nc.get_port_by_id(fake_port1.id))
+        self.assertEqual(fake_port2, nc.get_port_by_id(fake_port2.id))
+        self.assertEqual(fake_port3, nc.get_port_by_id(fake_port3.id))
+
+        nc.put_port(fake_port1)
+        self.assertEqual(fake_port1, nc.get_port_by_id(fake_port1.id))
+        self.assertEqual(3, len(fake_net.ports))
+
+    def test_get_state(self):
+        fake_net = dhcp.NetModel(
+            True, dict(id='12345678-1234-5678-1234567890ab',
+                       tenant_id='aaaaaaaa-aaaa-aaaa-aaaaaaaaaaaa',
+                       subnets=[fake_subnet1, fake_subnet2],
+                       ports=[fake_port1]))
+        nc = dhcp_agent.NetworkCache()
+        nc.put(fake_net)
+        nc.put_port(fake_port2)
+        self.assertEqual({'networks': 1, 'subnets': 2, 'ports': 2},
+                         nc.get_state())
+        nc.remove(fake_net)
+        self.assertEqual({'networks': 0, 'subnets': 0, 'ports': 0},
+                         nc.get_state())
+
+    def test_get_revisions(self):
+        fake_net = dhcp.NetModel(
+            True, dict(id='12345678-1234-5678-1234567890ab',
+                       tenant_id='aaaaaaaa-aaaa-aaaa-aaaaaaaaaaaa',
+                       subnets=[fake_subnet1],
+                       ports=[fake_port1],
+                       revision='1'))
+        nc = dhcp_agent.NetworkCache()
+        nc.put(fake_net)
+        nc.put(dhcp.NetModel(True, dict(id='other', subnets=[], ports=[])))
+        self.assertEqual({fake_net.id: '1'}, nc.get_revisions())
+
+    def test_port_changes_clear_revision(self):
+        fake_net = dhcp.NetModel(
+            True, dict(id='12345678-1234-5678-1234567890ab',
+                       tenant_id='aaaaaaaa-aaaa-aaaa-aaaaaaaaaaaa',
+                       subnets=[fake_subnet1],
+                       ports=[fake_port1, fake_port2],
+                       revision='1'))
+        nc = dhcp_agent.NetworkCache()
+        nc.put(fake_net)
+        nc.remove_port(fake_port2)
+        self.assertEqual({}, nc.get_revisions())
+
+        fake_net.revision = '2'
+        nc.put_port(fake_port2)
+        self.assertEqual({}, nc.get_revisions())
+
 
 class FakePort1(object):
     id = 'eeeeeeee-eeee-eeee-eeee-eeeeeeeeeeee'
@@ -1535,6 +1761,45 @@ class TestDictModel(base.BaseTestCase):
         self.assertEqual(m.a[0].b, 2)
         self.assertEqual(m.a[1].c, 3)
 
+    def test_dict_contains_list_of_mixed_items(self):
+        d = dict(a=[dhcp.DictModel(b=1), dict(b=2), dhcp.DictModel(b=3)])
+
+        m = dhcp.DictModel(d)
+        self.assertEqual([1, 2, 3], [item.b for item in m.a])
+
+    def test_sub_dicts_upgraded_on_access(self):
+        m = dhcp.DictModel(a=dict(b=dict(c=1)))
+        self.assertNotIsInstance(dict.__getitem__(m, 'a'), dhcp.DictModel)
+        self.assertIsInstance(m.a, dhcp.DictModel)
+        self.assertIs(m.a, m.a)
+        self.assertNotIsInstance(dict.__getitem__(m.a, 'b'), dhcp.DictModel)
+
+    def test_list_upgraded_once(self):
+        m = dhcp.DictModel(a=[dict(b=2)])
+        items = m.a
+        self.assertIsInstance(items, dhcp.ModelList)
+        self.assertIs(items, m.a)
+        items.append(dhcp.DictModel(b=3))
+        self.assertEqual(3, m.a[1].b)
+
+    def test_payload_not_modified(self):
+        items = [dict(b=2)]
+        sub = dict(c=3)
+        m = dhcp.DictModel(a=items, s=sub)
+        self.assertEqual(2, m.a[0].b)
+        self.assertEqual(3, m.s.c)
+        self.assertNotIsInstance(items[0], dhcp.DictModel)
+        self.assertIs(sub, dict.__getitem__(dhcp.DictModel(s=sub), 's'))
+        self.assertEqual([dict(b=2)], items)
+
+    def test_no_instance_dict(self):
+        m = dhcp.DictModel(a=1)
+        self.assertFalse(hasattr(m, '__dict__'))
+        self.assertFalse(hasattr(dhcp.NetModel(True, {'id': 'n'}),
+                                 '__dict__'))
+        m.b = 2
+        self.assertEqual({'a': 1, 'b': 2}, m)
+
 
 class TestNetModel(base.BaseTestCase):
     def test_ns_name(self):
@@ -59,8 +59,8 @@ class TestDhcpRpcCallback(base.BaseTestCase):
     def test_get_active_networks_info(self):
         plugin_retval = [{'id': 'a'}, {'id': 'b'}]
         self.plugin.get_networks.return_value = plugin_retval
-        port = {'network_id': 'a'}
-        subnet = {'network_id': 'b'}
+        port = {'id': 'p', 'network_id': 'a'}
+        subnet = {'id': 's', 'network_id': 'b'}
         self.plugin.get_ports.return_value = [port]
         self.plugin.get_subnets.return_value = [subnet]
         networks = self.callbacks.get_active_networks_info(mock.Mock(),
@@ -69,6 +69,44 @@ class TestDhcpRpcCallback(base.BaseTestCase):
                     {'id': 'b', 'subnets': [subnet], 'ports': []}]
         self.assertEqual(expected, networks)
 
+    def _get_active_networks_changed(self, revisions, ports):
+        self.plugin.get_networks.return_value = [{'id': 'a'}, {'id': 'b'}]
+        self.plugin.get_ports.return_value = ports
+        self.plugin.get_subnets.return_value = []
+        return self.callbacks.get_active_networks_changed(
+            mock.Mock(), host='host', revisions=revisions)
+
+    def test_get_active_networks_changed(self):
+        port = {'id': 'p', 'network_id': 'a', 'mac_address': 'aa'}
+        result = self._get_active_networks_changed({}, [port])
+        self.assertEqual(['a', 'b'], result['active_network_ids'])
+        self.assertEqual(['a', 'b'],
+                         [network['id'] for network in result['networks']])
+        self.assertNotEqual(result['networks'][0]['revision'],
+                            result['networks'][1]['revision'])
+        revisions = dict((network['id'], network['revision'])
+                         for network in result['networks'])
+
+        result = self._get_active_networks_changed(revisions, [port])
+        self.assertEqual(['a', 'b'], result['active_network_ids'])
+        self.assertEqual([], result['networks'])
+
+        port = dict(port, mac_address='bb')
+        result = self._get_active_networks_changed(revisions, [port])
+        self.assertEqual(['a'],
+                         [network['id'] for network in result['networks']])
+        self.assertEqual([port], result['networks'][0]['ports'])
+
+    def test_get_active_networks_changed_ignores_port_order(self):
+        ports = [{'id': 'p1', 'network_id': 'a'},
+                 {'id': 'p2', 'network_id': 'a'}]
+        result = self._get_active_networks_changed({}, ports)
+        revisions = dict((network['id'], network['revision'])
+                         for network in result['networks'])
+        result = self._get_active_networks_changed(revisions,
+                                                   list(reversed(ports)))
+        self.assertEqual([], result['networks'])
+
     def _test__port_action_with_failures(self, exc=None, action=None):
         port = {
             'network_id': 'foo_network_id',
@@ -140,8 +178,8 @@ class TestDhcpRpcCallback(base.BaseTestCase):
     def test_get_network_info(self):
         network_retval = dict(id='a')
 
-        subnet_retval = mock.Mock()
-        port_retval = mock.Mock()
+        subnet_retval = [dict(id='s', network_id='a')]
+        port_retval = [dict(id='p', network_id='a')]
 
         self.plugin.get_network.return_value = network_retval
         self.plugin.get_subnets.return_value = subnet_retval
@@ -151,6 +189,7 @@ class TestDhcpRpcCallback(base.BaseTestCase):
         self.assertEqual(retval, network_retval)
         self.assertEqual(retval['subnets'], subnet_retval)
         self.assertEqual(retval['ports'], port_retval)
+        self.assertIn('revision', retval)
 
     def _test_get_dhcp_port_helper(self, port_retval, other_expectations=[],
                                    update_port=None, create_port=None):
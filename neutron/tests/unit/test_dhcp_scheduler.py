@@ -17,6 +17,8 @@ import contextlib
 import datetime
 
 import mock
+from oslo_config import cfg
+from oslo_serialization import jsonutils
 from oslo_utils import timeutils
 import testscenarios
 
@@ -196,42 +198,71 @@ class TestAutoScheduleNetworks(TestDhcpSchedulerBaseTestCase):
 
 class TestNetworksFailover(TestDhcpSchedulerBaseTestCase,
                            sched_db.DhcpAgentSchedulerDbMixin):
+    def setUp(self):
+        super(TestNetworksFailover, self).setUp()
+        self.network_scheduler = dhcp_agent_scheduler.ChanceScheduler()
+
     def test_reschedule_network_from_down_agent(self):
         agents = self._create_and_set_agents_down(['host-a', 'host-b'], 1)
         self._test_schedule_bind_network([agents[0]], self.network_id)
         self._save_networks(["foo-network-2"])
         self._test_schedule_bind_network([agents[1]], "foo-network-2")
-        with contextlib.nested(
-            mock.patch.object(self, 'remove_network_from_dhcp_agent'),
-            mock.patch.object(self, 'schedule_network',
-                              return_value=[agents[1]]),
-            mock.patch.object(self, 'get_network', create=True,
-                              return_value={'id': self.network_id})
-        ) as (rn, sch, getn):
+        with mock.patch.object(self, 'remove_network_from_dhcp_agent') as rn:
             notifier = mock.MagicMock()
             self.agent_notifiers[constants.AGENT_TYPE_DHCP] = notifier
             self.remove_networks_from_down_agents()
             rn.assert_called_with(mock.ANY, agents[0].id, self.network_id)
-            sch.assert_called_with(mock.ANY, {'id': self.network_id})
-            notifier.network_added_to_agent.assert_called_with(
-                mock.ANY, self.network_id, agents[1].host)
+            notifier.networks_added_to_agent.assert_called_once_with(
+                mock.ANY, [self.network_id], agents[1].host)
 
     def test_reschedule_network_from_down_agent_failed(self):
         agents = self._create_and_set_agents_down(['host-a'], 1)
         self._test_schedule_bind_network([agents[0]], self.network_id)
+        with mock.patch.object(self, 'remove_network_from_dhcp_agent') as rn:
+            notifier = mock.MagicMock()
+            self.agent_notifiers[constants.AGENT_TYPE_DHCP] = notifier
+            self.remove_networks_from_down_agents()
+            rn.assert_called_with(mock.ANY, agents[0].id, self.network_id)
+            self.assertFalse(notifier.networks_added_to_agent.called)
+
+    def test_reschedule_many_networks_from_down_agent(self):
+        agents = self._create_and_set_agents_down(['host-a', 'host-b'], 1)
+        network_ids = ['foo-network-%d' % i for i in range(3)]
+        self._save_networks(network_ids)
+        for network_id in network_ids:
+            self._test_schedule_bind_network([agents[0]], network_id)
+        notifier = mock.MagicMock()
+        self.agent_notifiers[constants.AGENT_TYPE_DHCP] = notifier
         with contextlib.nested(
             mock.patch.object(self, 'remove_network_from_dhcp_agent'),
-            mock.patch.object(self, 'schedule_network',
-                              return_value=None),
-            mock.patch.object(self, 'get_network', create=True,
-                              return_value={'id': self.network_id})
-        ) as (rn, sch, getn):
+            mock.patch.object(sched_db, 'RESCHEDULE_BATCH_SIZE', new=2)
+        ):
+            self.remove_networks_from_down_agents()
+        notifier.networks_added_to_agent.assert_called_once_with(
+            mock.ANY, network_ids, agents[1].host)
+        bindings = self.ctx.session.query(
+            sched_db.NetworkDhcpAgentBinding).filter_by(
+            dhcp_agent_id=agents[1].id)
+        self.assertEqual(set(network_ids),
+                         set(binding.network_id for binding in bindings))
+
+    def test_reschedule_networks_batch_failure(self):
+        agents = self._create_and_set_agents_down(['host-a', 'host-b'], 1)
+        self._test_schedule_bind_network([agents[0]], self.network_id)
+        with contextlib.nested(
+            mock.patch.object(self, 'remove_network_from_dhcp_agent'),
+            mock.patch.object(self.ctx.session, 'add',
+                              side_effect=sched_db.db_exc.DBError),
+            mock.patch.object(sched_db.ncontext, 'get_admin_context',
+                              return_value=self.ctx),
+            mock.patch.object(self, '_schedule_network')
+        ) as (rn, add, ctx, schedule_network):
             notifier = mock.MagicMock()
             self.agent_notifiers[constants.AGENT_TYPE_DHCP] = notifier
             self.remove_networks_from_down_agents()
-            rn.assert_called_with(mock.ANY, agents[0].id, self.network_id)
-            sch.assert_called_with(mock.ANY, {'id': self.network_id})
-            self.assertFalse(notifier.network_added_to_agent.called)
+            schedule_network.assert_called_once_with(
+                self.ctx, self.network_id, notifier)
+            self.assertFalse(notifier.networks_added_to_agent.called)
 
     def test_filter_bindings(self):
         bindings = [
@@ -251,3 +282,67 @@ class TestNetworksFailover(TestDhcpSchedulerBaseTestCase,
             res_ids = [b.network_id for b in res]
             self.assertIn('foo3', res_ids)
             self.assertIn('foo4', res_ids)
+
+
+class TestWeightedScheduler(TestDhcpSchedulerBaseTestCase):
+
+    def setUp(self):
+        super(TestWeightedScheduler, self).setUp()
+        self.scheduler = dhcp_agent_scheduler.WeightedScheduler()
+
+    def _create_loaded_agents(self, networks, ports=None):
+        """Create agents hosting networks, and reporting no load."""
+        agents = self._get_agents(sorted(networks))
+        for agent in agents:
+            agent.configurations = jsonutils.dumps(
+                {'networks': 0, 'ports': 0})
+        self._save_agents(agents)
+        for agent in agents:
+            network_ids = ['%s-net-%d' % (agent.host, index)
+                           for index in range(networks[agent.host])]
+            self._save_networks(network_ids)
+            for network_id in network_ids:
+                with self.ctx.session.begin(subtransactions=True):
+                    self.ctx.session.add(sched_db.NetworkDhcpAgentBinding(
+                        network_id=network_id, dhcp_agent_id=agent.id))
+            for index in range((ports or {}).get(agent.host, 0)):
+                with self.ctx.session.begin(subtransactions=True):
+                    self.ctx.session.add(models_v2.Port(
+                        id='%s-port-%d' % (agent.host, index),
+                        network_id=network_ids[0], tenant_id='tenant',
+                        mac_address='fa:16:3e:00:00:%02x' % index,
+                        admin_state_up=True, status='ACTIVE',
+                        device_id='', device_owner=''))
+        return dict((agent.host, agent) for agent in agents)
+
+    def test_schedule_least_loaded_agent(self):
+        agents = self._create_loaded_agents(
+            {'host-a': 5, 'host-b': 1, 'host-c': 3})
+        plugin = mock.Mock()
+        plugin.get_dhcp_agents_hosting_networks.return_value = []
+        plugin.get_agents_db.return_value = [agents['host-b']]
+        self.scheduler.schedule(plugin, self.ctx, self.network)
+        plugin.get_agents_db.assert_called_once_with(
+            self.ctx, filters={'id': [agents['host-b'].id]})
+
+    def test_networks_placement_tracks_load(self):
+        self._create_loaded_agents({'host-a': 2, 'host-b': 0, 'host-c': 1})
+        network_ids = ['net-1', 'net-2', 'net-3']
+        placement = self.scheduler.get_networks_placement(
+            mock.Mock(), self.ctx, network_ids)
+        self.assertEqual('host-b', placement['net-1'][0].host)
+        hosts = [placement[network_id][0].host for network_id in network_ids]
+        self.assertNotIn('host-a', hosts)
+        self.assertIn('host-c', hosts)
+
+    def test_schedule_least_loaded_agent_on_ports(self):
+        cfg.CONF.set_override('dhcp_agent_weighers', ['ports'])
+        self.scheduler = dhcp_agent_scheduler.WeightedScheduler()
+        agents = self._create_loaded_agents(
+            {'host-a': 1, 'host-b': 1}, ports={'host-a': 1, 'host-b': 3})
+        plugin = mock.Mock()
+        plugin.get_dhcp_agents_hosting_networks.return_value = []
+        plugin.get_agents_db.return_value = [agents['host-a']]
+        self.scheduler.schedule(plugin, self.ctx, self.network)
+        plugin.get_agents_db.assert_called_once_with(
+            self.ctx, filters={'id': [agents['host-a'].id]})
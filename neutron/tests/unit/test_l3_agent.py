@@ -321,6 +321,31 @@ class TestBasicRouterOperations(BasicRouterOperationsFramework):
             agent.periodic_sync_routers_task(agent.context)
         self.assertTrue(f.called)
 
+    def _test_tune_router_workers(self, depth, expected_size):
+        self.conf.set_override('router_processing_workers', 4)
+        self.conf.set_override('router_processing_max_workers', 10)
+        self.conf.set_override('rpc_reserved_router_workers', 2)
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        pool = eventlet.GreenPool(size=4)
+        with contextlib.nested(
+            mock.patch.object(agent._queue, 'depth', return_value=depth),
+            mock.patch.object(agent._queue, 'set_low_priority_workers')
+        ) as (queue_depth, set_low_priority_workers):
+            agent._tune_router_workers(pool)
+        self.assertEqual(expected_size, pool.size)
+        if expected_size != 4:
+            set_low_priority_workers.assert_called_once_with(
+                expected_size - 2)
+
+    def test_tune_router_workers_no_backlog(self):
+        self._test_tune_router_workers(0, 4)
+
+    def test_tune_router_workers_grows_with_backlog(self):
+        self._test_tune_router_workers(7, 7)
+
+    def test_tune_router_workers_capped(self):
+        self._test_tune_router_workers(100, 10)
+
     def test_router_info_create(self):
         id = _uuid()
         ns = "ns-" + id
@@ -1720,6 +1745,30 @@ class TestBasicRouterOperations(BasicRouterOperationsFramework):
                                      [],
                                      other_namespaces)
 
+    def test_cleanup_namespace_continues_after_failure(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        stale_namespaces = set([l3_agent.NS_PREFIX + 'foo',
+                                l3_agent.NS_PREFIX + 'bar',
+                                l3_agent.NS_PREFIX + 'baz'])
+
+        def destroy(ns):
+            if ns.endswith('bar'):
+                raise RuntimeError()
+
+        with contextlib.nested(
+            mock.patch.object(agent, '_destroy_namespace',
+                              side_effect=destroy),
+            mock.patch.object(l3_agent, 'LOG')
+        ) as (destroy_namespace, log):
+            agent._cleanup_namespaces(stale_namespaces, [])
+
+            self.assertEqual(3, destroy_namespace.call_count)
+            self.assertEqual(1, log.exception.call_count)
+            summary = log.info.call_args[0][1]
+            self.assertEqual(2, summary['count'])
+            self.assertEqual(1, summary['failed'])
+        self.assertFalse(agent._clean_stale_namespaces)
+
     def test_cleanup_namespace_with_registered_router_ids(self):
         self.conf.set_override('router_id', None)
         stale_namespaces = [l3_agent.NS_PREFIX + 'cccc',
@@ -818,6 +818,107 @@ class L3AgentLeastRoutersSchedulerTestCase(L3SchedulerTestCase):
 
                         self.assertNotEqual(agent_id1, agent_id3)
 
+    def _get_routers_placement(self, count):
+        routers = [{'id': 'router-%d' % i, 'external_gateway_info': None}
+                   for i in range(count)]
+        with mock.patch.object(self.plugin,
+                               'get_l3_agent_with_min_routers') as min_r:
+            placement = self.plugin.router_scheduler.get_routers_placement(
+                self.plugin, self.adminContext, routers)
+            self.assertFalse(min_r.called)
+        return [agent.host for agent in placement.values()]
+
+    def test_routers_placement_spreads_load(self):
+        hosts = self._get_routers_placement(4)
+        self.assertEqual(2, hosts.count('host_1'))
+        self.assertEqual(2, hosts.count('host_2'))
+
+    def test_routers_placement_accounts_for_hosted_routers(self):
+        load = {self.agent_id1: 3, self.agent_id2: 0}
+        with mock.patch.object(self.plugin, 'get_l3_agents_router_count',
+                               return_value=load):
+            hosts = self._get_routers_placement(3)
+        self.assertEqual(['host_2'] * 3, hosts)
+
+    def test_get_l3_agents_router_count(self):
+        with self.router() as r:
+            self.plugin.router_scheduler.bind_router(
+                self.adminContext, r['router']['id'], self.agent1)
+            self.assertEqual(
+                {self.agent_id1: 1, self.agent_id2: 0},
+                self.plugin.get_l3_agents_router_count(
+                    self.adminContext, [self.agent_id1, self.agent_id2]))
+
+    def test_get_l3_agents_active_filters_admin_state(self):
+        self._set_l3_agent_admin_state(self.adminContext, self.agent_id2,
+                                       state=False)
+        active = self.plugin.get_l3_agents(self.adminContext, active=True)
+        self.assertEqual([self.agent_id1], [agent.id for agent in active])
+        inactive = self.plugin.get_l3_agents(self.adminContext, active=False)
+        self.assertEqual([self.agent_id2], [agent.id for agent in inactive])
+
+    def test_get_l3_agents_active_checks_stored_heartbeat(self):
+        self._set_l3_agent_dead(self.agent_id1)
+        with mock.patch.object(agents_db.agent_registry, 'get_agents',
+                               return_value=[{'id': self.agent_id1}]) as reg:
+            active = self.plugin.get_l3_agents(self.adminContext,
+                                               active=True)
+        reg.assert_called_once_with(
+            self.adminContext, constants.AGENT_TYPE_L3,
+            admin_state_up=True, alive=None)
+        self.assertEqual([], active)
+
+
+class L3AgentWeightedSchedulerTestCase(L3SchedulerTestCase):
+    def setUp(self):
+        super(L3AgentWeightedSchedulerTestCase, self).setUp()
+        self.plugin.router_scheduler = importutils.import_object(
+            'neutron.scheduler.l3_agent_scheduler.WeightedScheduler'
+        )
+
+    def _report_load(self, host, **load):
+        agent = {
+            'binary': 'neutron-l3-agent',
+            'host': host,
+            'topic': topics.L3_AGENT,
+            'configurations': dict(load, agent_mode='legacy'),
+            'agent_type': constants.AGENT_TYPE_L3,
+            'start_flag': True
+        }
+        callback = agents_db.AgentExtRpcCallback()
+        callback.report_state(self.adminContext,
+                              agent_state={'agent_state': agent},
+                              time=timeutils.strtime())
+
+    def _choose_router_agent(self):
+        candidates = self.plugin.get_l3_agents(self.adminContext)
+        return self.plugin.router_scheduler._choose_router_agent(
+            self.plugin, self.adminContext, candidates)
+
+    def test_choose_agent_with_least_floating_ips(self):
+        self._report_load('host_1', floating_ips=1)
+        self._report_load('host_2', floating_ips=10)
+        self.assertEqual('host_1', self._choose_router_agent().host)
+
+    def test_bound_routers_override_reported_routers(self):
+        self._report_load('host_1', routers=0)
+        self._report_load('host_2', routers=5)
+        with mock.patch.object(self.plugin, 'get_l3_agents_router_count',
+                               return_value={self.agent_id1: 4,
+                                             self.agent_id2: 1}):
+            self.assertEqual('host_2', self._choose_router_agent().host)
+
+    def test_routers_placement_tracks_load(self):
+        self._report_load('host_1', interfaces=0)
+        self._report_load('host_2', interfaces=0)
+        routers = [{'id': 'router-%d' % i, 'external_gateway_info': None}
+                   for i in range(4)]
+        placement = self.plugin.router_scheduler.get_routers_placement(
+            self.plugin, self.adminContext, routers)
+        hosts = [agent.host for agent in placement.values()]
+        self.assertEqual(2, hosts.count('host_1'))
+        self.assertEqual(2, hosts.count('host_2'))
+
 
 class L3DvrScheduler(l3_db.L3_NAT_db_mixin,
                      l3_dvrscheduler_db.L3_DVRsch_db_mixin):
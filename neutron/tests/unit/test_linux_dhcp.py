@@ -1227,6 +1227,95 @@ class TestDnsmasq(TestBase):
                 mock.call(exp_opt_name, exp_opt_data),
             ])
 
+    def _get_incremental_dnsmasq(self, process_monitor=None):
+        self.addCleanup(dhcp.Dnsmasq._host_tables.clear)
+        network = FakeDualNetwork()
+        network.ports = [FakePort1(), FakeDualPort(), FakeRouterPort()]
+        dm = self._get_dnsmasq(network, process_monitor)
+        dm._release_lease = mock.Mock()
+        dm._release_unused_leases = mock.Mock()
+        return dm
+
+    def test_reload_port_allocations_builds_host_table(self):
+        test_pm = mock.Mock()
+        dm = self._get_incremental_dnsmasq(test_pm)
+        dm.reload_allocations()
+        full_calls = self.safe.call_args_list
+        self.safe.reset_mock()
+        test_pm.reset_mock()
+
+        dm.reload_port_allocations(set([FakePort1.id]))
+
+        self.assertIn(dm.network.id, dhcp.Dnsmasq._host_tables)
+        self.assertEqual(full_calls, self.safe.call_args_list)
+        test_pm.enable.assert_called_once_with(uuid=mock.ANY,
+                                               cmd_callback=mock.ANY,
+                                               namespace=mock.ANY,
+                                               service=mock.ANY,
+                                               reload_cfg=True,
+                                               pid_file=mock.ANY)
+
+    def test_reload_port_allocations_changed_port(self):
+        test_pm = mock.Mock()
+        dm = self._get_incremental_dnsmasq(test_pm)
+        dm.reload_port_allocations(set([FakePort1.id]))
+        self.safe.reset_mock()
+        test_pm.reset_mock()
+
+        new_port = FakePort1()
+        new_port.fixed_ips = [FakeIPAllocation(
+            '192.168.0.9', 'dddddddd-dddd-dddd-dddd-dddddddddddd')]
+        dm.network.ports[0] = new_port
+        dm.reload_port_allocations(set([FakePort1.id]))
+
+        dm._release_lease.assert_called_once_with(FakePort1.mac_address,
+                                                  '192.168.0.2')
+        self.assertEqual(2, self.safe.call_count)
+        host_data = self.safe.call_args_list[0][0][1]
+        self.assertIn('00:00:80:aa:bb:cc,host-192-168-0-9.openstacklocal,'
+                      '192.168.0.9\n', host_data)
+        self.assertNotIn('192.168.0.2', host_data)
+        self.assertTrue(test_pm.enable.called)
+
+    def test_reload_port_allocations_deleted_port(self):
+        dm = self._get_incremental_dnsmasq()
+        dm.reload_port_allocations(set([FakePort1.id]))
+        self.safe.reset_mock()
+
+        del dm.network.ports[0]
+        dm.reload_port_allocations(set([FakePort1.id]))
+
+        dm._release_lease.assert_called_once_with(FakePort1.mac_address,
+                                                  '192.168.0.2')
+        self.assertNotIn(FakePort1.id,
+                         dhcp.Dnsmasq._host_tables[dm.network.id].ports)
+        self.assertEqual(2, self.safe.call_count)
+
+    def test_reload_port_allocations_unchanged_port(self):
+        test_pm = mock.Mock()
+        dm = self._get_incremental_dnsmasq(test_pm)
+        dm.reload_port_allocations(set([FakePort1.id]))
+        self.safe.reset_mock()
+        test_pm.reset_mock()
+
+        dm.reload_port_allocations(set([FakePort1.id]))
+
+        self.assertFalse(self.safe.called)
+        self.assertFalse(test_pm.enable.called)
+
+    def test_reload_port_allocations_router_port_rebuilds(self):
+        dm = self._get_incremental_dnsmasq()
+        dm.reload_port_allocations(set([FakePort1.id]))
+        with mock.patch.object(dm, '_rebuild_host_table') as rebuild:
+            dm.reload_port_allocations(set([FakeRouterPort.id]))
+        rebuild.assert_called_once_with()
+
+    def test_reload_allocations_drops_host_table(self):
+        dm = self._get_incremental_dnsmasq()
+        dm.reload_port_allocations(set([FakePort1.id]))
+        dm.reload_allocations()
+        self.assertNotIn(dm.network.id, dhcp.Dnsmasq._host_tables)
+
     def test_release_unused_leases(self):
         dnsmasq = self._get_dnsmasq(FakeDualNetwork())
 
@@ -22,6 +22,7 @@ import webob
 from neutron.agent.metadata import agent
 from neutron.agent import metadata_agent
 from neutron.common import constants
+from neutron.common import topics
 from neutron.common import utils
 from neutron.tests import base
 
@@ -43,7 +44,11 @@ class FakeConf(object):
     nova_metadata_insecure = True
     nova_client_cert = 'nova_cert'
     nova_client_priv_key = 'nova_priv_key'
+    nova_metadata_pool_size = 2
     cache_url = ''
+    cache_max_entries = 10000
+    cache_max_memory = 32
+    cache_negative_ttl = 2
 
 
 class FakeConfCache(FakeConf):
@@ -57,6 +62,8 @@ class TestMetadataProxyHandlerBase(base.BaseTestCase):
         super(TestMetadataProxyHandlerBase, self).setUp()
         self.log_p = mock.patch.object(agent, 'LOG')
         self.log = self.log_p.start()
+        self.create_consumers = mock.patch.object(
+            agent.agent_rpc, 'create_consumers').start()
         self.handler = agent.MetadataProxyHandler(self.fake_conf)
         self.handler.plugin_rpc = mock.Mock()
         self.handler.context = mock.Mock()
@@ -455,6 +462,43 @@ class TestMetadataProxyHandlerCache(TestMetadataProxyHandlerBase):
 
                 return retval
 
+    def _proxy_request(self, mock_http):
+        req = mock.Mock(path_info='/the_path', query_string='',
+                        headers={'X-Forwarded-For': '8.8.8.8'},
+                        method='GET', body='')
+        resp = mock.MagicMock(status=200)
+        req.response = resp
+        mock_http.return_value.request.return_value = (resp, 'content')
+        with mock.patch.object(self.handler, '_sign_instance_id'):
+            return self.handler._proxy_request('the_id', 'tenant_id', req)
+
+    def test_proxy_request_reuses_connections(self):
+        with mock.patch('httplib2.Http') as mock_http:
+            self._proxy_request(mock_http)
+            self._proxy_request(mock_http)
+            self.assertEqual(1, mock_http.call_count)
+            self.assertEqual(2, mock_http.return_value.request.call_count)
+
+    def test_proxy_request_pool_per_process(self):
+        with contextlib.nested(
+            mock.patch('httplib2.Http'),
+            mock.patch.object(agent.os, 'getpid')
+        ) as (mock_http, getpid):
+            getpid.return_value = 1
+            self._proxy_request(mock_http)
+            getpid.return_value = 2
+            self._proxy_request(mock_http)
+            self.assertEqual(2, mock_http.call_count)
+
+    def test_proxy_request_error_closes_connections(self):
+        with mock.patch('httplib2.Http') as mock_http:
+            conn = mock.Mock()
+            mock_http.return_value.connections = {'http:9.9.9.9': conn}
+            mock_http.return_value.request.side_effect = socket.error
+            self.assertRaises(socket.error, self._proxy_request, mock_http)
+            conn.close.assert_called_once_with()
+            self.assertEqual({}, mock_http.return_value.connections)
+
     def test_proxy_request_post(self):
         response = self._proxy_request_test_helper(method='POST')
         self.assertEqual(response.content_type, "text/plain")
@@ -496,6 +540,118 @@ class TestMetadataProxyHandlerCache(TestMetadataProxyHandlerBase):
         )
 
 
+class TestMetadataProxyHandlerMemoryCache(TestMetadataProxyHandlerBase):
+    fake_conf = FakeConfCache
+
+    def test_memory_cache_is_bounded(self):
+        self.assertIsInstance(self.handler._cache, agent.MetadataCache)
+        self.assertEqual(5, self.handler._cache.ttl)
+        self.assertEqual(2, self.handler._cache.negative_ttl)
+        self.assertEqual(10000, self.handler._cache.max_entries)
+
+    def test_call_consumes_notifications_once(self):
+        with mock.patch.object(self.handler,
+                               '_get_instance_and_tenant_id') as get_ids:
+            get_ids.return_value = None, None
+            self.handler(mock.Mock())
+            self.handler(mock.Mock())
+        self.assertEqual(1, self.create_consumers.call_count)
+        endpoint = self.create_consumers.call_args[0][0][0]
+        self.assertIs(self.handler._cache, endpoint.cache)
+        self.assertEqual(
+            [[topics.PORT, topics.UPDATE], [topics.NETWORK, topics.DELETE]],
+            self.create_consumers.call_args[0][2])
+
+    def test_port_update_invalidates_cached_lookup(self):
+        ip = '1.1.1.1'
+        networks = ('network_id1',)
+        self.handler.plugin_rpc.get_ports.return_value = []
+        self.handler._get_ports_for_remote_address(ip, networks)
+        self.handler._get_ports_for_remote_address(ip, networks)
+        self.assertEqual(1, self.handler.plugin_rpc.get_ports.call_count)
+
+        invalidator = agent.MetadataCacheInvalidator(self.handler._cache)
+        invalidator.port_update(
+            mock.Mock(), port={'id': 'port_id1', 'device_id': 'vm',
+                               'fixed_ips': [{'ip_address': ip}]})
+        self.handler._get_ports_for_remote_address(ip, networks)
+        self.assertEqual(2, self.handler.plugin_rpc.get_ports.call_count)
+
+
+class TestMetadataCache(base.BaseTestCase):
+    def setUp(self):
+        super(TestMetadataCache, self).setUp()
+        self.utcnow = mock.patch('oslo_utils.timeutils.utcnow_ts',
+                                 return_value=0).start()
+        self.cache = agent.MetadataCache(ttl=5, negative_ttl=1,
+                                         max_entries=3, max_memory=1000)
+
+    def test_get_missing(self):
+        self.assertIsNone(self.cache.get(('f', 'a')))
+        self.assertEqual('d', self.cache.get(('f', 'a'), 'd'))
+
+    def test_ttl(self):
+        self.cache.set(('f', 'a'), ['port'])
+        self.utcnow.return_value = 4
+        self.assertEqual(['port'], self.cache.get(('f', 'a')))
+        self.utcnow.return_value = 5
+        self.assertIsNone(self.cache.get(('f', 'a')))
+        self.assertEqual(0, len(self.cache._entries))
+        self.assertEqual(0, self.cache.memory)
+
+    def test_negative_ttl(self):
+        self.cache.set(('f', 'a'), [])
+        self.assertEqual([], self.cache.get(('f', 'a')))
+        self.utcnow.return_value = 1
+        self.assertIsNone(self.cache.get(('f', 'a')))
+
+    def test_negative_caching_disabled(self):
+        self.cache.negative_ttl = 0
+        self.cache.set(('f', 'a'), [])
+        self.assertIsNone(self.cache.get(('f', 'a')))
+
+    def test_zero_ttl_never_expires(self):
+        self.cache.ttl = 0
+        self.cache.set(('f', 'a'), ['port'])
+        self.utcnow.return_value = 10 ** 9
+        self.assertEqual(['port'], self.cache.get(('f', 'a')))
+
+    def test_lru_eviction_by_entries(self):
+        for name in ('a', 'b', 'c'):
+            self.cache.set(('f', name), [name])
+        # Using 'a' makes 'b' the least recently used entry
+        self.cache.get(('f', 'a'))
+        self.cache.set(('f', 'd'), ['d'])
+        self.assertIsNone(self.cache.get(('f', 'b')))
+        for name in ('a', 'c', 'd'):
+            self.assertEqual([name], self.cache.get(('f', name)))
+
+    def test_lru_eviction_by_memory(self):
+        self.cache.set(('f', 'a'), ['x' * 600])
+        self.cache.set(('f', 'b'), ['y' * 600])
+        self.assertIsNone(self.cache.get(('f', 'a')))
+        self.assertEqual(['y' * 600], self.cache.get(('f', 'b')))
+        self.assertTrue(self.cache.memory <= 1000)
+
+    def test_invalidate(self):
+        port = {'id': 'port_id', 'network_id': 'net1',
+                'fixed_ips': [{'ip_address': '1.1.1.1'}]}
+        self.cache.set(('ports', '1.1.1.1', ('net1', 'net2')), [port])
+        self.cache.set(('networks', 'router_id'), ('net1',))
+        self.cache.invalidate(['port_id'])
+        self.assertIsNone(self.cache.get(('ports', '1.1.1.1',
+                                          ('net1', 'net2'))))
+        self.assertEqual(('net1',), self.cache.get(('networks',
+                                                    'router_id')))
+        self.cache.invalidate(['net1'])
+        self.assertEqual(0, len(self.cache._entries))
+        self.assertEqual(0, self.cache.memory)
+        self.assertEqual({}, dict(self.cache._tags))
+
+    def test_unhashable_key(self):
+        self.assertRaises(TypeError, self.cache.get, ('f', ['a']))
+
+
 class TestMetadataProxyHandlerNoCache(TestMetadataProxyHandlerCache):
     fake_conf = FakeConf
 
@@ -13,6 +13,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+
+import eventlet
 import mock
 
 from neutron.agent.linux import interface
@@ -38,7 +41,11 @@ class TestNetnsCleanup(base.BaseTestCase):
 
         method_to_patch = 'oslo_utils.importutils.import_object'
 
-        with mock.patch(method_to_patch) as import_object:
+        # the real ProcessMonitor would leave a checking thread running
+        with contextlib.nested(
+            mock.patch(method_to_patch),
+            mock.patch.object(util, '_get_dhcp_process_monitor')
+        ) as (import_object, process_monitor):
             driver = mock.Mock()
             driver.active = dhcp_active
             import_object.return_value = driver
@@ -48,7 +55,8 @@ class TestNetnsCleanup(base.BaseTestCase):
             expected_params = {'conf': conf, 'network': mock.ANY,
                                'root_helper': conf.AGENT.root_helper,
                                'plugin': mock.ANY,
-                               'process_monitor': mock.ANY}
+                               'process_monitor':
+                               process_monitor.return_value}
             import_object.assert_called_once_with('driver', **expected_params)
 
             if dhcp_active:
@@ -196,14 +204,45 @@ class TestNetnsCleanup(base.BaseTestCase):
             ip_wrap.side_effect = Exception()
             util.destroy_namespace(conf, ns)
 
+    def test_destroy_namespace_returns_result(self):
+        ns = 'qrouter-6e322ac7-ab50-4f53-9cdc-d1d3c1164b6d'
+        conf = mock.Mock()
+        with mock.patch('neutron.agent.linux.ip_lib.IPWrapper') as ip_wrap:
+            self.assertTrue(util.destroy_namespace(conf, ns))
+            ip_wrap.side_effect = Exception()
+            self.assertFalse(util.destroy_namespace(conf, ns))
+
+    def test_destroy_namespaces(self):
+        conf = mock.Mock()
+        namespaces = ['ns%d' % i for i in range(5)]
+        pool = eventlet.GreenPool(size=2)
+        with contextlib.nested(
+            mock.patch.object(util, 'destroy_namespace',
+                              side_effect=lambda conf, ns, force: ns != 'ns3'),
+            mock.patch.object(util, 'PROGRESS_INTERVAL', 2),
+            mock.patch.object(util.LOG, 'info')
+        ) as (destroy_namespace, interval, info):
+            util.destroy_namespaces(conf, pool, namespaces, True)
+
+            destroy_namespace.assert_has_calls(
+                [mock.call(conf, ns, True) for ns in namespaces],
+                any_order=True)
+            # Start, two progress messages and the summary
+            self.assertEqual(4, info.call_count)
+            summary = info.call_args[0][1]
+            self.assertEqual(4, summary['count'])
+            self.assertEqual(1, summary['failed'])
+
     def test_main(self):
         namespaces = ['ns1', 'ns2']
         with mock.patch('neutron.agent.linux.ip_lib.IPWrapper') as ip_wrap:
             ip_wrap.get_namespaces.return_value = namespaces
 
-            with mock.patch('eventlet.sleep') as eventlet_sleep:
+            with mock.patch.object(util.eventlet,
+                                   'sleep') as eventlet_sleep:
                 conf = mock.Mock()
                 conf.force = False
+                conf.workers = 2
                 methods_to_mock = dict(
                     eligible_for_deletion=mock.DEFAULT,
                     destroy_namespace=mock.DEFAULT,
@@ -211,17 +250,20 @@ class TestNetnsCleanup(base.BaseTestCase):
 
                 with mock.patch.multiple(util, **methods_to_mock) as mocks:
                     mocks['eligible_for_deletion'].return_value = True
+                    mocks['destroy_namespace'].return_value = True
                     mocks['setup_conf'].return_value = conf
                     with mock.patch('neutron.common.config.setup_logging'):
                         util.main()
 
                         mocks['eligible_for_deletion'].assert_has_calls(
                             [mock.call(conf, 'ns1', False),
-                             mock.call(conf, 'ns2', False)])
+                             mock.call(conf, 'ns2', False)],
+                            any_order=True)
 
                         mocks['destroy_namespace'].assert_has_calls(
                             [mock.call(conf, 'ns1', False),
-                             mock.call(conf, 'ns2', False)])
+                             mock.call(conf, 'ns2', False)],
+                            any_order=True)
 
                         ip_wrap.assert_has_calls(
                             [mock.call.get_namespaces(conf.AGENT.root_helper)])
@@ -233,9 +275,11 @@ class TestNetnsCleanup(base.BaseTestCase):
         with mock.patch('neutron.agent.linux.ip_lib.IPWrapper') as ip_wrap:
             ip_wrap.get_namespaces.return_value = namespaces
 
-            with mock.patch('eventlet.sleep') as eventlet_sleep:
+            with mock.patch.object(util.eventlet,
+                                   'sleep') as eventlet_sleep:
                 conf = mock.Mock()
                 conf.force = False
+                conf.workers = 2
                 methods_to_mock = dict(
                     eligible_for_deletion=mock.DEFAULT,
                     destroy_namespace=mock.DEFAULT,
@@ -252,7 +296,8 @@ class TestNetnsCleanup(base.BaseTestCase):
 
                         mocks['eligible_for_deletion'].assert_has_calls(
                             [mock.call(conf, 'ns1', False),
-                             mock.call(conf, 'ns2', False)])
+                             mock.call(conf, 'ns2', False)],
+                            any_order=True)
 
                         self.assertFalse(mocks['destroy_namespace'].called)
 
@@ -608,3 +608,47 @@ class NeutronPolicyTestCase(base.BaseTestCase):
             policy.log_rule_list(common_policy.RuleCheck('rule', 'create_'))
             self.assertTrue(is_e.called)
             self.assertTrue(dbg.called)
+
+    def test_match_rule_built_once_for_repeated_checks(self):
+        target = {'tenant_id': 'fake'}
+        with mock.patch.object(policy, '_build_match_rule',
+                               wraps=policy._build_match_rule) as build:
+            for i in range(3):
+                policy.enforce(self.context, 'get_port', target)
+        self.assertEqual(1, build.call_count)
+
+    def test_match_rule_depends_on_explicitly_set_attributes(self):
+        action = "create_something"
+        target = {'tenant_id': 'fake', 'attr': {'sub_attr_1': 'x'}}
+        self.assertTrue(policy.enforce(self.context, action, target))
+        target['attr']['sub_attr_2'] = 'y'
+        self.assertRaises(common_policy.PolicyNotAuthorized, policy.enforce,
+                          self.context, action, target)
+        del target['attr']['sub_attr_2']
+        self.assertTrue(policy.enforce(self.context, action, target))
+
+    def test_match_rules_cleared_on_reset(self):
+        policy.enforce(self.context, 'get_port', {'tenant_id': 'fake'})
+        self.assertTrue(policy._MATCH_RULES)
+        policy.reset()
+        self.assertFalse(policy._MATCH_RULES)
+
+    def test_credentials_built_once_per_context(self):
+        target = {'tenant_id': 'fake'}
+        policy.init()
+        with contextlib.nested(
+            mock.patch.object(self.context, 'to_dict',
+                              wraps=self.context.to_dict),
+            mock.patch.object(policy._ENFORCER, 'load_rules')
+        ) as (to_dict, load_rules):
+            for i in range(3):
+                policy.enforce(self.context, 'get_port', target)
+        self.assertEqual(1, to_dict.call_count)
+        self.assertEqual(1, load_rules.call_count)
+
+    def test_credentials_rebuilt_when_roles_change(self):
+        target = {'tenant_id': 'somebody_else'}
+        self.assertRaises(common_policy.PolicyNotAuthorized, policy.enforce,
+                          self.context, 'get_port', target)
+        self.context.roles.append('admin')
+        self.assertTrue(policy.enforce(self.context, 'get_port', target))
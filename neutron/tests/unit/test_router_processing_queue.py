@@ -100,3 +100,59 @@ class TestExclusiveRouterProcessor(base.BaseTestCase):
             raise Exception("Only the master should process a router")
 
         self.assertEqual(2, len([i for i in master.updates()]))
+
+
+class TestRouterProcessingQueue(base.BaseTestCase):
+    def _sync_update(self, router_id):
+        return l3_queue.RouterUpdate(router_id,
+                                     l3_queue.PRIORITY_SYNC_ROUTERS_TASK)
+
+    def test_rpc_update_not_starved_by_sync_updates(self):
+        q = l3_queue.RouterProcessingQueue(low_priority_workers=1)
+        q.add(self._sync_update(_uuid()))
+        q.add(self._sync_update(_uuid()))
+
+        first = q._get()
+        # The only low priority slot is busy so the next sync update has to
+        # wait, but an RPC update can still be started.
+        self.assertFalse(q._can_start(q._queue[0]))
+        rpc_id = _uuid()
+        q.add(l3_queue.RouterUpdate(rpc_id, l3_queue.PRIORITY_RPC))
+        self.assertEqual(rpc_id, q._get().id)
+
+        q._done(first, first.enqueued_at)
+        self.assertNotEqual(first.id, q._get().id)
+
+    def test_set_low_priority_workers(self):
+        q = l3_queue.RouterProcessingQueue(low_priority_workers=0)
+        q.add(self._sync_update(_uuid()))
+        self.assertFalse(q._can_start(q._queue[0]))
+        q.set_low_priority_workers(None)
+        self.assertTrue(q._can_start(q._queue[0]))
+
+    def test_get_stats(self):
+        q = l3_queue.RouterProcessingQueue()
+        q.add(self._sync_update(_uuid()))
+        q.add(self._sync_update(_uuid()))
+        q.add(l3_queue.RouterUpdate(_uuid(), l3_queue.PRIORITY_RPC))
+
+        for rp, update in q.each_update_to_next_router():
+            pass
+
+        stats = q.get_stats()
+        self.assertEqual(2, stats['queue_depth'])
+        self.assertEqual(0, stats['low_priority_workers_busy'])
+        self.assertEqual(1, stats['priorities']['rpc']['processed'])
+        self.assertEqual(0, stats['priorities']['rpc']['queue_depth'])
+        sync_stats = stats['priorities']['sync_routers_task']
+        self.assertEqual(0, sync_stats['processed'])
+        self.assertEqual(2, sync_stats['queue_depth'])
+
+    def test_each_update_to_next_router_releases_slot(self):
+        q = l3_queue.RouterProcessingQueue(low_priority_workers=1)
+        q.add(self._sync_update(_uuid()))
+        q.add(self._sync_update(_uuid()))
+
+        processed = [u.id for rp, u in q.each_update_to_next_router()]
+        self.assertEqual(1, len(processed))
+        self.assertTrue(q._can_start(q._queue[0]))
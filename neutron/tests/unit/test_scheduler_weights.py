@@ -0,0 +1,84 @@
+# Copyright (c) 2015 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from neutron.scheduler import weights
+from neutron.tests import base
+
+
+class ConstantWeigher(weights.BaseAgentWeigher):
+    def weigh(self, configurations):
+        return configurations.get('constant', 0)
+
+
+class TestWeights(base.BaseTestCase):
+
+    def _agents(self, *ids):
+        return [{'id': agent_id} for agent_id in ids]
+
+    def test_load_weighers(self):
+        weighers = weights.load_weighers(
+            ['networks', 'ports:0.5', '%s.ConstantWeigher:-2' % __name__])
+        self.assertIsInstance(weighers[0], weights.NetworksWeigher)
+        self.assertEqual(1.0, weighers[0].multiplier)
+        self.assertIsInstance(weighers[1], weights.PortsWeigher)
+        self.assertEqual(0.5, weighers[1].multiplier)
+        self.assertIsInstance(weighers[2], ConstantWeigher)
+        self.assertEqual(-2.0, weighers[2].multiplier)
+
+    def test_load_weighers_invalid_multiplier(self):
+        self.assertRaises(ValueError, weights.load_weighers, ['ports:many'])
+
+    def test_reported_load_weigher(self):
+        weigher = weights.RoutersWeigher()
+        self.assertEqual(-3, weigher.weigh({'routers': 3}))
+        self.assertEqual(0, weigher.weigh({}))
+        self.assertEqual(0, weigher.weigh({'routers': 'many'}))
+
+    def test_weigh_agents_prefers_least_loaded(self):
+        configurations = {'a': {'networks': 10}, 'b': {'networks': 2},
+                          'c': {'networks': 5}}
+        ordered = weights.weigh_agents(
+            weights.load_weighers(['networks']),
+            self._agents('a', 'b', 'c'), configurations)
+        self.assertEqual(['b', 'c', 'a'], [agent['id'] for agent in ordered])
+
+    def test_weigh_agents_normalizes_weighers(self):
+        # 'a' hosts a few more networks but far less ports than 'b'
+        configurations = {'a': {'networks': 11, 'ports': 100},
+                          'b': {'networks': 10, 'ports': 1000}}
+        weighers = weights.load_weighers(['networks', 'ports:2'])
+        ordered = weights.weigh_agents(
+            weighers, self._agents('a', 'b'), configurations)
+        self.assertEqual('a', ordered[0]['id'])
+        weighers = weights.load_weighers(['networks:3', 'ports:2'])
+        ordered = weights.weigh_agents(
+            weighers, self._agents('a', 'b'), configurations)
+        self.assertEqual('b', ordered[0]['id'])
+
+    def test_weigh_agents_negative_multiplier(self):
+        configurations = {'a': {'routers': 1}, 'b': {'routers': 4}}
+        ordered = weights.weigh_agents(
+            weights.load_weighers(['routers:-1']),
+            self._agents('a', 'b'), configurations)
+        self.assertEqual('b', ordered[0]['id'])
+
+    def test_weigh_agents_without_configurations(self):
+        ordered = weights.weigh_agents(
+            weights.load_weighers(['routers']), self._agents('a', 'b'), {})
+        self.assertEqual(set(['a', 'b']),
+                         set(agent['id'] for agent in ordered))
+        self.assertEqual(
+            [], weights.weigh_agents(weights.load_weighers(['routers']),
+                                     [], {}))
@@ -15,6 +15,7 @@
 
 import testtools
 
+from neutron.db import agents_db
 from neutron.db import api as db_api
 # Import all data models
 from neutron.db.migration.models import head  # noqa
@@ -70,6 +71,7 @@ class SqlTestCase(base.BaseTestCase):
                 for table in reversed(
                         model_base.BASEV2.metadata.sorted_tables):
                     conn.execute(table.delete())
+            agents_db.agent_registry.reset()
 
         self.addCleanup(clear_tables)
 
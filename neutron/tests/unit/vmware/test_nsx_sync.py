@@ -62,19 +62,19 @@ class CacheTestCase(base.BaseTestCase):
                 self.nsx_cache._lswitches)
             self.nsx_cache._lswitches[lswitch['uuid']] = (
                 {'data': lswitch,
-                 'hash': hash(jsonutils.dumps(lswitch))})
+                 'hash': sync._hash_resource(lswitch)})
         for lswitchport in LSWITCHPORTS:
             self.nsx_cache._uuid_dict_mappings[lswitchport['uuid']] = (
                 self.nsx_cache._lswitchports)
             self.nsx_cache._lswitchports[lswitchport['uuid']] = (
                 {'data': lswitchport,
-                 'hash': hash(jsonutils.dumps(lswitchport))})
+                 'hash': sync._hash_resource(lswitchport)})
         for lrouter in LROUTERS:
             self.nsx_cache._uuid_dict_mappings[lrouter['uuid']] = (
                 self.nsx_cache._lrouters)
             self.nsx_cache._lrouters[lrouter['uuid']] = (
                 {'data': lrouter,
-                 'hash': hash(jsonutils.dumps(lrouter))})
+                 'hash': sync._hash_resource(lrouter)})
         super(CacheTestCase, self).setUp()
 
     def test_get_lswitches(self):
@@ -173,6 +173,19 @@ class CacheTestCase(base.BaseTestCase):
         for resource in LSWITCHES + LROUTERS + LSWITCHPORTS:
             self._verify_update(resource, changed=False)
 
+    def test_hash_resource_ignores_key_order(self):
+        tags = [{'scope': 'quantum', 'tag': 'xxx'},
+                {'scope': 'os_tid', 'tag': 'yyy'}]
+        resource = {'uuid': 'zzz', 'tags': tags, 'status': True}
+        reordered = dict(reversed(list(resource.items())))
+        reordered['tags'] = [dict(reversed(list(tag.items())))
+                             for tag in tags]
+        self.assertEqual(sync._hash_resource(resource),
+                         sync._hash_resource(reordered))
+        reordered['status'] = False
+        self.assertNotEqual(sync._hash_resource(resource),
+                            sync._hash_resource(reordered))
+
     def test_process_updates_with_changes(self):
         LSWITCHES[0]['name'] = 'altered'
         self.nsx_cache.process_updates(LSWITCHES, LROUTERS, LSWITCHPORTS)
@@ -507,20 +520,26 @@ class SyncTestCase(testlib_api.SqlTestCase):
                 self.fc.handle_get('/ws.v1/lrouter'))['results']
             fake_lswitchports = jsonutils.loads(
                 self.fc.handle_get('/ws.v1/lswitch/*/lport'))['results']
-            return_values = [
-                # Chunk 0 - lswitches
-                (fake_lswitches, None, 4),
-                # Chunk 0 - lrouters
-                (fake_lrouters[:2], 'xxx', 4),
-                # Chunk 0 - lports (size only)
-                ([], 'start', 4),
-                # Chunk 1 - lrouters (2 more) (lswitches are skipped)
-                (fake_lrouters[2:], None, None),
-                # Chunk 1 - lports
-                (fake_lswitchports, None, 4)]
-
-            def fake_fetch_data(*args, **kwargs):
-                return return_values.pop(0)
+            synchronizer = self._plugin._synchronizer
+            # Chunk 1 fetches resource types concurrently, so return
+            # values are dispatched by URI rather than by call order
+            return_values = {
+                synchronizer.LS_URI: [
+                    # Chunk 0 - lswitches
+                    (fake_lswitches, None, 4)],
+                synchronizer.LR_URI: [
+                    # Chunk 0 - lrouters
+                    (fake_lrouters[:2], 'xxx', 4),
+                    # Chunk 1 - lrouters (2 more)
+                    (fake_lrouters[2:], None, None)],
+                synchronizer.LP_URI: [
+                    # Chunk 0 - lports (size only)
+                    ([], 'start', 4),
+                    # Chunk 1 - lports
+                    (fake_lswitchports, None, 4)]}
+
+            def fake_fetch_data(uri, cursor, page_size):
+                return return_values[uri].pop(0)
 
             # 2 Chunks, with 6 resources each.
             # 1st chunk lswitches and lrouters
@@ -544,6 +563,20 @@ class SyncTestCase(testlib_api.SqlTestCase):
                 do_chunk(0, None, None, None)
                 # Chunk size should have stayed the same
                 self.assertEqual(sp.chunk_size, 6)
+                # lswitches were not fetched in the 2nd chunk
+                for uri_values in return_values.values():
+                    self.assertEqual([], uri_values)
+
+    def test_get_chunk_size_grows_with_fetch_time(self):
+        synchronizer = self._plugin._synchronizer
+        sp = sync.SyncParameters(10)
+        sp.total_size = 10
+        sp.fetch_time = synchronizer._req_delay * 3
+        self.assertEqual(30, synchronizer._get_chunk_size(sp))
+        with mock.patch.object(sync, 'MAX_PAGE_SIZE', 15):
+            self.assertEqual(15, synchronizer._get_chunk_size(sp))
+        sp.fetch_time = 0
+        self.assertEqual(10, synchronizer._get_chunk_size(sp))
 
     def test_synchronize_network(self):
         ctx = context.get_admin_context()